@@ -1,8 +1,12 @@
 """등장인물 관계 그래프 웹 서버"""
 import os
-import sys
 import json
-from flask import Flask, request, jsonify, render_template
+import gc
+import time
+import queue
+import threading
+from functools import wraps
+from flask import Flask, Response, request, jsonify, render_template, redirect
 from flask_cors import CORS
 
 # 현재 프로젝트 폴더의 데이터 경로
@@ -11,38 +15,162 @@ DEFAULT_DATA_PATH = os.path.join(BASE_DIR, 'data')
 DATASET_PATH = os.environ.get('DATA_DIR', DEFAULT_DATA_PATH)
 
 # 인덱스 파일 경로도 DATASET_PATH를 기준으로 설정
-INDEX_CACHE_FILE = os.path.join(DATASET_PATH, 'title_index_cache.pkl')
+INDEX_CACHE_FILE = os.path.join(DATASET_PATH, 'title_index_cache.idx')
+
+# 문서별 이미지 인덱스 (지정하면 데이터셋 로드 후 없거나 버전이 다를 때 한 번 만들어 사용, 빈 값이면 요청마다 본문을 훑음)
+IMAGE_INDEX_PATH = os.environ.get('IMAGE_INDEX_PATH', '')
+
+# 데이터셋이 필요한 요청이 로드 완료를 기다리는 최대 시간 (초, 넘으면 503)
+DATASET_WAIT_TIMEOUT = float(os.environ.get('DATASET_WAIT_TIMEOUT', '10'))
+
+# 인물 문서 크롤링 동시 요청 수와 전체 제한 시간 (초)
+CRAWL_MAX_WORKERS = int(os.environ.get('CRAWL_MAX_WORKERS', '8'))
+CRAWL_DEADLINE = float(os.environ.get('CRAWL_DEADLINE', '25'))
+
+# 관계 그래프 생성 방식 (single: 프롬프트 하나, map_reduce: 인물 묶음별 동시 요청 후 합침)
+GRAPH_EXTRACTION_MODE = os.environ.get('GRAPH_EXTRACTION_MODE', 'single')
+GRAPH_MAP_WORKERS = int(os.environ.get('GRAPH_MAP_WORKERS', '4'))  # map_reduce 방식의 요청당 동시 AI 호출 수
+
+# 스트리밍 응답(/api/graph/stream)에서 이벤트가 없을 때 연결 유지용 주석을 보내는 간격 (초)
+SSE_KEEPALIVE_INTERVAL = float(os.environ.get('SSE_KEEPALIVE_INTERVAL', '15'))
+
+# 관계도 생성 작업 큐 (JOB_QUEUE_PATH를 빈 값으로 두면 메모리 큐, 재시작하면 대기 작업이 사라짐)
+JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', os.path.join(DATASET_PATH, 'jobs.sqlite'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))  # 프로세스당 동시에 실행할 작업 수
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '600'))  # 진행 없이 이 시간이 지나면 다른 워커가 다시 실행
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', '3600'))  # 끝난 작업 보관 시간
+
+# 완성된 관계도 저장소 (GRAPH_STORE_PATH를 빈 값으로 두면 사용 안 함)
+GRAPH_STORE_PATH = os.environ.get('GRAPH_STORE_PATH', os.path.join(DATASET_PATH, 'graph_store.sqlite'))
+GRAPH_STORE_TTL = float(os.environ.get('GRAPH_STORE_TTL', str(30 * 24 * 3600)))
+GRAPH_STORE_MAX_MB = int(os.environ.get('GRAPH_STORE_MAX_MB', '64'))
+
+# 크롤링 결과 디스크 캐시 (PAGE_CACHE_PATH를 빈 값으로 두면 사용 안 함)
+PAGE_CACHE_PATH = os.environ.get('PAGE_CACHE_PATH', os.path.join(DATASET_PATH, 'namuwiki_page_cache.sqlite'))
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', str(24 * 3600)))
+PAGE_CACHE_MAX_MB = int(os.environ.get('PAGE_CACHE_MAX_MB', '256'))
+
+# AI 응답 캐시 (메모리 LRU + SQLite, LLM_CACHE_PATH를 빈 값으로 두면 메모리만 사용)
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', os.path.join(DATASET_PATH, 'llm_cache.sqlite'))
+LLM_CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.environ.get('LLM_CACHE_MAX_MB', '128'))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get('LLM_CACHE_MEMORY_ENTRIES', '256'))
+
+# 관계도 노드 이미지 프록시 + 썸네일 캐시 (/img/<키>, IMAGE_PROXY_PATH를 빈 값으로 두면 원본 주소를 그대로 사용)
+IMAGE_PROXY_PATH = os.environ.get('IMAGE_PROXY_PATH', os.path.join(DATASET_PATH, 'image_cache.sqlite'))
+IMAGE_PROXY_MAX_MB = int(os.environ.get('IMAGE_PROXY_MAX_MB', '128'))
+IMAGE_THUMBNAIL_SIZE = int(os.environ.get('IMAGE_THUMBNAIL_SIZE', '100'))  # 썸네일 최대 가로/세로 (px)
+IMAGE_PROXY_MAX_AGE = 365 * 24 * 3600  # 키가 원본 URL의 해시라 내용이 바뀌지 않으므로 브라우저에 오래 캐시
+
+# 나무위키 문법을 정리한 문서 본문/섹션 (문서마다 한 번만 정리, 메모리 LRU)
+PREPROCESS_CACHE_ENTRIES = int(os.environ.get('PREPROCESS_CACHE_ENTRIES', '2048'))
+PREPROCESS_CACHE_MAX_MB = int(os.environ.get('PREPROCESS_CACHE_MAX_MB', '64'))
+
+# 프로세스 시작 시각 (콜드 스타트 측정용)
+PROCESS_START_TIME = time.time()
+
+# gunicorn --preload 모드: 마스터 프로세스에서 동기로 로드한 뒤 워커들이 fork로 상속
+# (백그라운드 스레드는 fork 후 워커에 남지 않으므로 사용하지 않음, gunicorn.conf.py 참고)
+DATASET_PRELOAD = os.environ.get('DATASET_PRELOAD') == '1'
 
 # 현재 프로젝트의 modules 사용
 from modules.namuwiki_dataset import (
     load_namuwiki_dataset,
     get_data_from_dataset,
     build_title_index,
+    get_dataset_version,
 )
-from modules.document_search import (
-    find_document_by_exact_title_indexed,
-    find_document_by_keyword_included,
-    find_most_similar_document,
-)
-from modules.image_extractor import extract_all_image_urls
+from modules.document_search import find_most_similar_document
 from modules.character_extractor import extract_character_names_with_ai
 from modules.graph_generator import extract_character_relationships_with_ai
-from modules.ai_service import reset_ai_request_stats
-from modules.namuwiki_web import fetch_namuwiki_page
+from modules.ai_service import (
+    configure_llm_cache,
+    get_ai_cache_report,
+    get_ai_client_stats,
+    get_ai_metrics,
+    get_ai_timings,
+    get_llm_cache_stats,
+    reset_ai_request_stats,
+)
+from modules.namuwiki_web import (
+    configure_page_cache,
+    crawl_namuwiki_pages,
+    get_page_cache_stats,
+)
+from modules.graph_pipeline import (
+    SUPPORTED_MODELS,
+    GraphPipelineError,
+    build_source_document_entries,
+    find_missing_character_documents,
+    find_source_documents,
+    normalize_keyword,
+    pipeline_prompt_version,
+    run_graph_pipeline,
+    validate_model,
+)
+from modules.graph_store import GraphStore
+from modules.job_queue import JobQueue, MemoryJobBackend, SQLiteJobBackend
+from modules.single_flight import get_single_flight_stats
+from modules.token_budget import get_token_budget_stats
+from modules.document_preprocessor import configure_document_preprocessor, get_preprocess_stats
+from modules.image_index import configure_image_index, get_image_index_stats, load_image_index
+from modules.image_proxy import (
+    configure_image_proxy,
+    get_image_proxy,
+    get_image_proxy_stats,
+    is_valid_image_key,
+    proxy_image_url,
+)
+from modules.memory_stats import get_memory_usage
 
 app = Flask(__name__)
 CORS(app)
 
+try:
+    configure_page_cache(PAGE_CACHE_PATH or None, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_MAX_MB * 1024 * 1024)
+except Exception as e:
+    print(f"⚠️  크롤링 캐시를 사용할 수 없습니다: {e}")
+
+try:
+    configure_llm_cache(
+        LLM_CACHE_PATH or None,
+        ttl=LLM_CACHE_TTL,
+        max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+        memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+    )
+except Exception as e:
+    print(f"⚠️  AI 응답 디스크 캐시를 사용할 수 없습니다: {e} (메모리 캐시만 사용)")
+    configure_llm_cache(None, ttl=LLM_CACHE_TTL, memory_entries=LLM_CACHE_MEMORY_ENTRIES)
+
+try:
+    configure_image_proxy(
+        IMAGE_PROXY_PATH or None, max_bytes=IMAGE_PROXY_MAX_MB * 1024 * 1024, thumbnail_size=IMAGE_THUMBNAIL_SIZE
+    )
+except Exception as e:
+    print(f"⚠️  이미지 프록시를 사용할 수 없습니다: {e} (원본 이미지 주소 사용)")
+
+configure_document_preprocessor(
+    max_entries=PREPROCESS_CACHE_ENTRIES, max_chars=PREPROCESS_CACHE_MAX_MB * 1024 * 1024
+)
+
+graph_store = None
+if GRAPH_STORE_PATH:
+    try:
+        graph_store = GraphStore(GRAPH_STORE_PATH, ttl=GRAPH_STORE_TTL, max_bytes=GRAPH_STORE_MAX_MB * 1024 * 1024)
+    except Exception as e:
+        print(f"⚠️  관계도 저장소를 사용할 수 없습니다: {e}")
+
 # 전역 변수: 서버 시작 시 로드된 데이터셋과 인덱스
 dataset = None
 data = None
 title_to_indices = None
 title_list = None
+dataset_version = None  # 저장된 관계도의 키에 사용
 
 
 def load_dataset_and_index():
     """서버 시작 시 데이터셋과 인덱스를 메모리에 로드"""
-    global dataset, data, title_to_indices, title_list
+    global dataset, data, title_to_indices, title_list, dataset_version
     
     print(f"데이터셋 경로: {DATASET_PATH}")
     print(f"인덱스 캐시 파일: {INDEX_CACHE_FILE}")
@@ -51,22 +179,242 @@ def load_dataset_and_index():
     dataset_abs_path = os.path.abspath(DATASET_PATH)
     dataset = load_namuwiki_dataset(dataset_abs_path)
     data = get_data_from_dataset(dataset)
-    print(f"총 문서 수: {len(data)}")
+    dataset_version = get_dataset_version(data)
+    print(f"총 문서 수: {len(data)} (버전: {dataset_version})")
     
     print("인덱스 생성 중...")
     index_cache_abs_path = os.path.abspath(INDEX_CACHE_FILE)
     title_to_indices, title_list = build_title_index(
         data, cache_file=index_cache_abs_path, force_rebuild=False
     )
+    if IMAGE_INDEX_PATH:
+        try:
+            configure_image_index(load_image_index(data, os.path.abspath(IMAGE_INDEX_PATH), dataset_version))
+        except Exception as e:
+            print(f"⚠️  이미지 인덱스를 사용할 수 없습니다: {e} (문서 본문에서 이미지를 찾습니다)")
     print("데이터셋 및 인덱스 로드 완료!")
 
+# 데이터셋 로드 상태 (백그라운드 스레드에서 갱신)
+dataset_ready = threading.Event()
+dataset_status = {
+    'state': 'not_started',  # not_started / loading / ready / failed
+    'error': None,
+    'load_seconds': None,
+    'cold_start_seconds': None,
+}
+_loader_lock = threading.Lock()
+_loader_thread = None
+
+
+def _load_dataset_with_status():
+    """데이터셋과 인덱스를 로드하고 상태를 기록"""
+    dataset_status['state'] = 'loading'
+    load_start = time.time()
+    try:
+        load_dataset_and_index()
+    except Exception as e:
+        dataset_status['state'] = 'failed'
+        dataset_status['error'] = str(e)
+        print(f"🚨🚨 치명적인 에러: 데이터셋 로드 실패! {e}")
+        import traceback
+        traceback.print_exc()
+        return
+    
+    finished = time.time()
+    dataset_status['load_seconds'] = round(finished - load_start, 3)
+    dataset_status['cold_start_seconds'] = round(finished - PROCESS_START_TIME, 3)
+    dataset_status['state'] = 'ready'
+    dataset_ready.set()
+    print(f"⏱️  콜드 스타트 완료: 로드 {dataset_status['load_seconds']:.2f}초, "
+          f"프로세스 시작부터 {dataset_status['cold_start_seconds']:.2f}초")
+
+
+def start_background_loading():
+    """데이터셋 로드를 백그라운드 스레드로 시작 (이미 시작했으면 무시)"""
+    global _loader_thread
+    with _loader_lock:
+        if _loader_thread is not None:
+            return
+        _loader_thread = threading.Thread(
+            target=_load_dataset_with_status, name='dataset-loader', daemon=True
+        )
+        _loader_thread.start()
+
+
+def requires_dataset(view):
+    """
+    데이터셋이 필요한 엔드포인트용 데코레이터
+    로드 중이면 DATASET_WAIT_TIMEOUT초까지 기다리고, 그래도 준비되지 않으면 503 반환
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not dataset_ready.is_set() and dataset_status['state'] != 'failed':
+            dataset_ready.wait(DATASET_WAIT_TIMEOUT)
+        if not dataset_ready.is_set():
+            if dataset_status['state'] == 'failed':
+                message = f"데이터셋 로드에 실패했습니다: {dataset_status['error']}"
+            else:
+                message = '데이터셋을 불러오는 중입니다. 잠시 후 다시 시도해주세요.'
+            response = jsonify({'error': message, 'status': dataset_status['state']})
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def preload_dataset():
+    """
+    데이터셋과 인덱스를 현재 프로세스에서 동기로 로드 (gunicorn 마스터에서 fork 전에 호출)
+    
+    인덱스와 Arrow 데이터는 mmap이라 워커들이 같은 페이지를 공유하고, 로드 후 gc.freeze()로
+    기존 객체를 GC 추적에서 제외해 워커의 GC가 상속받은 페이지를 건드려 복사되지 않도록 한다.
+    """
+    _load_dataset_with_status()
+    gc.freeze()
+    print(f"📊 preload 후 마스터 메모리: {get_memory_usage()}")
+
+
+def find_stored_graph(keyword: str, model: str):
+    """저장된 관계도 (저장소를 사용하지 않거나 없으면 None)"""
+    if graph_store is None or dataset_version is None:
+        return None
+    return graph_store.get(normalize_keyword(keyword), model, dataset_version, pipeline_prompt_version(GRAPH_EXTRACTION_MODE))
+
+
+def stored_graph_response(stored):
+    """저장된 관계도를 /api/graph 응답 형식으로"""
+    return {
+        'success': True,
+        **stored.result,
+        'stored': {
+            'created_at': stored.created_at,
+            'dataset_version': stored.dataset_version,
+            'prompt_version': stored.prompt_version,
+        },
+        'ai_cache': get_ai_cache_report(),
+        'timings': get_ai_timings()
+    }
+
+
+def proxied_node(node):
+    """노드 이미지 주소를 서버 이미지 프록시(/img/<키>) 주소로 바꾼 복사본 (원래 노드는 바꾸지 않음)"""
+    if isinstance(node, dict) and node.get('image_src'):
+        return dict(node, image_src=proxy_image_url(node['image_src']))
+    return node
+
+
+def proxied_graph(graph_data):
+    """관계도 노드 이미지를 프록시 주소로 바꾼 복사본 (저장소와 작업 큐에는 원본 주소를 남기고 응답할 때만 바꿈)"""
+    if not graph_data:
+        return graph_data
+    return dict(graph_data, characters=[proxied_node(node) for node in graph_data.get('characters', [])])
+
+
+def proxied_response(body):
+    """/api/graph 응답 본문의 관계도 이미지를 프록시 주소로"""
+    if isinstance(body, dict) and body.get('graph'):
+        return dict(body, graph=proxied_graph(body['graph']))
+    return body
+
+
+def proxied_event(event: str, payload):
+    """진행 이벤트(graph_item 인물, result)의 이미지를 프록시 주소로"""
+    if event == 'graph_item' and payload.get('kind') == 'character':
+        return dict(payload, item=proxied_node(payload['item']))
+    if event == 'result':
+        return proxied_response(payload)
+    return payload
+
+
+def generate_graph_response(keyword: str, model: str, bypass_cache: bool = False, refresh: bool = False, on_event=None):
+    """
+    관계도 생성 (/api/graph, /api/graph/stream, 작업 큐 공통)
+    
+    저장된 관계도가 있으면 바로 반환하고, 없거나 refresh면 파이프라인을 실행해 저장합니다.
+    
+    Args:
+        bypass_cache: True면 AI 응답 캐시를 사용하지 않음
+        refresh: True면 저장된 관계도와 AI 응답 캐시를 사용하지 않고 새로 생성
+        on_event: 파이프라인 진행 이벤트 콜백
+    
+    Returns:
+        /api/graph 응답 본문 (이미지는 원본 주소, 응답할 때 proxied_response로 바꿈)
+    """
+    # 이 요청의 AI 호출 기록 시작 (다른 요청과 섞이지 않음)
+    reset_ai_request_stats()
+    keyword = normalize_keyword(keyword)
+    # 지원하지 않는 모델은 저장소를 조회하기 전에 거절
+    validate_model(model)
+    
+    if not refresh:
+        stored = find_stored_graph(keyword, model)
+        if stored is not None:
+            print(f"💾 저장된 관계도 사용: {keyword} ({model})")
+            return stored_graph_response(stored)
+    
+    result = run_graph_pipeline(
+        title_list, title_to_indices, data, keyword,
+        model=model,
+        crawl_max_workers=CRAWL_MAX_WORKERS,
+        crawl_deadline=CRAWL_DEADLINE,
+        use_cache=not (bypass_cache or refresh),
+        graph_mode=GRAPH_EXTRACTION_MODE,
+        map_max_workers=GRAPH_MAP_WORKERS,
+        on_event=on_event,
+    )
+    print(f"⏱️  단계별 소요 시간: {result['stages']}")
+    
+    if result['graph'].get('partial'):
+        # 응답이 끊겨 일부만 만든 관계도는 저장하지 않음 (다음 요청에서 다시 생성)
+        print(f"⚠️  일부만 생성된 관계도입니다: {keyword} ({model})")
+    elif graph_store is not None and dataset_version is not None:
+        try:
+            graph_store.put(keyword, model, dataset_version, pipeline_prompt_version(GRAPH_EXTRACTION_MODE), result)
+        except Exception as e:
+            print(f"⚠️  관계도 저장 실패: {e}")
+    
+    return {
+        'success': True,
+        **result,
+        'stored': None,
+        'ai_cache': get_ai_cache_report(),
+        'timings': get_ai_timings()
+    }
+
+
+def run_graph_job(params, on_event):
+    """작업 큐 워커에서 관계도 생성 실행 (데이터셋 로드가 끝날 때까지 기다림)"""
+    while not dataset_ready.wait(1):
+        if dataset_status['state'] == 'failed':
+            raise GraphPipelineError('데이터셋을 불러오지 못했습니다.', 503)
+    
+    print(f"\n[관계도 생성 (작업 큐)] 키워드: {params['keyword']}, 모델: {params['model']}")
+    return generate_graph_response(
+        params['keyword'], params['model'],
+        bypass_cache=params.get('bypass_cache', False),
+        refresh=params.get('refresh', False),
+        on_event=on_event,
+    )
+
+
 try:
-    load_dataset_and_index()
+    job_backend = SQLiteJobBackend(JOB_QUEUE_PATH) if JOB_QUEUE_PATH else MemoryJobBackend()
 except Exception as e:
-    # 데이터 로드 실패 시 서버를 종료하거나 경고를 출력합니다.
-    print(f"🚨🚨 치명적인 에러: 데이터셋 로드 실패! {e}")
-    # 프로덕션 환경에서는 sys.exit(1)로 서버 부팅을 막을 수 있습니다.
-    # sys.exit(1)
+    print(f"⚠️  작업 큐 디스크 저장소를 사용할 수 없습니다: {e} (메모리 큐 사용)")
+    job_backend = MemoryJobBackend()
+job_queue = JobQueue(
+    job_backend, run_graph_job,
+    max_workers=JOB_WORKERS, lease=JOB_LEASE_SECONDS, result_ttl=JOB_RESULT_TTL,
+)
+
+
+if DATASET_PRELOAD:
+    # 작업 큐 워커 스레드는 fork 후 워커 프로세스에서 시작 (gunicorn.conf.py 참고)
+    preload_dataset()
+else:
+    # 서버 부팅을 막지 않도록 데이터셋은 백그라운드에서 로드
+    start_background_loading()
+    job_queue.start()
 
 @app.route('/')
 def index():
@@ -74,19 +422,83 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/img/<key>')
+def proxied_image(key):
+    """관계도 노드 이미지 썸네일 (처음 요청이면 원본을 받아 줄여 저장, 받지 못하면 원본 주소로 이동)"""
+    proxy = get_image_proxy()
+    if proxy is None or not is_valid_image_key(key):
+        return jsonify({'error': '이미지를 찾을 수 없습니다.'}), 404
+    
+    headers = {'Cache-Control': f'public, max-age={IMAGE_PROXY_MAX_AGE}, immutable', 'ETag': proxy.etag(key)}
+    if request.headers.get('If-None-Match') == headers['ETag']:
+        return Response(status=304, headers=headers)
+    
+    image = proxy.fetch(key)
+    if image is None:
+        source_url = proxy.source_url(key)
+        if source_url is None:
+            return jsonify({'error': '이미지를 찾을 수 없습니다.'}), 404
+        return redirect(source_url)
+    body, content_type = image
+    return Response(body, mimetype=content_type, headers=headers)
+
+
+@app.route('/healthz')
+def healthz():
+    """프로세스 생존 확인 (데이터셋 로드 여부와 무관)"""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readyz():
+    """데이터셋과 인덱스 로드 완료 여부 (준비 전이면 503)"""
+    body = dict(dataset_status)
+    body['uptime_seconds'] = round(time.time() - PROCESS_START_TIME, 3)
+    return jsonify(body), (200 if dataset_ready.is_set() else 503)
+
+
+@app.route('/metrics')
+def metrics():
+    """캐시 hit/miss, OpenAI 연결 재사용, 모델별 AI 지연 시간 히스토그램, 작업 큐 상태, 중복 요청 합치기, 관계도 저장소, 입력 토큰, 문서 전처리, 이미지 인덱스, 이미지 프록시 등 운영 지표"""
+    return jsonify({
+        'page_cache': get_page_cache_stats(),
+        'llm_cache': get_llm_cache_stats(),
+        'ai_client': get_ai_client_stats(),
+        'ai_latency': get_ai_metrics(),
+        'jobs': job_queue.stats(),
+        'single_flight': get_single_flight_stats(),
+        'graph_store': graph_store.stats() if graph_store else None,
+        'token_budget': get_token_budget_stats(),
+        'preprocessed_documents': get_preprocess_stats(),
+        'image_index': get_image_index_stats(),
+        'image_proxy': get_image_proxy_stats(),
+    })
+
+
+@app.route('/memoryz')
+def memoryz():
+    """
+    요청을 처리한 워커 프로세스의 메모리 사용량 (MB)
+    uss가 워커 하나당 추가로 필요한 메모리, shared가 워커 간 공유되는 메모리
+    """
+    return jsonify(get_memory_usage())
+
+
 @app.route('/api/extract-characters', methods=['POST'])
+@requires_dataset
 def extract_characters():
     """작품명을 받아서 인물명 추출"""
     try:
         req_data = request.get_json()
         keyword = req_data.get('keyword')
+        bypass_cache = bool(req_data.get('bypass_cache', False))  # True면 AI 응답 캐시를 사용하지 않음
         
         if not keyword:
             return jsonify({'error': 'keyword가 필요합니다.'}), 400
         
         print(f"\n[인물 추출] 키워드: {keyword}")
         
-        # AI 요청 통계 초기화
+        # 이 요청의 AI 호출 기록 시작 (다른 요청과 섞이지 않음)
         reset_ai_request_stats()
         
         # 1. 두 개의 독립적인 프로세스로 가장 유사한 문서 찾기
@@ -114,7 +526,8 @@ def extract_characters():
         char_list_doc_text = char_doc.get('text', '')
         
         character_names = extract_character_names_with_ai(
-            keyword, main_doc_text, char_list_doc_text, max_characters=20
+            keyword, main_doc_text, char_list_doc_text, max_characters=20, use_cache=not bypass_cache,
+            main_doc_index=main_doc_idx, character_list_doc_index=char_doc_idx,
         )
         
         if not character_names:
@@ -132,7 +545,9 @@ def extract_characters():
             'character_list_document': {
                 'title': char_doc.get('title', ''),
                 'index': char_doc_idx if char_doc_idx else None
-            }
+            },
+            'ai_cache': get_ai_cache_report(),
+            'timings': get_ai_timings()
         })
         
     except Exception as e:
@@ -143,6 +558,7 @@ def extract_characters():
 
 
 @app.route('/api/search-document', methods=['POST'])
+@requires_dataset
 def search_document():
     """
     keyword로 가장 유사한 나무위키 문서를 찾아
@@ -207,21 +623,21 @@ def crawl_documents():
         
         print(f"\n[문서 크롤링] 인물 수: {len(character_names)}")
         
-        documents = []
-        for i, char_name in enumerate(character_names, 1):
-            print(f"  [{i}/{len(character_names)}] '{char_name}' 크롤링 중...")
-            doc = fetch_namuwiki_page(char_name)
-            if doc:
-                doc['type'] = 'character'
-                doc['source'] = 'web'
-                documents.append(doc)
-                print(f"    ✅ 크롤링 성공: '{doc['title']}'")
-            else:
-                print(f"    ⚠️  크롤링 실패: '{char_name}'")
+        # 동시 크롤링 (제한 시간이 지나면 끝난 문서만 반환)
+        documents, statuses = crawl_namuwiki_pages(
+            character_names, max_workers=CRAWL_MAX_WORKERS, deadline=CRAWL_DEADLINE
+        )
+        for doc in documents:
+            doc['type'] = 'character'
+            doc['source'] = 'web'
+        for status in statuses:
+            if status['status'] != 'ok':
+                print(f"    ⚠️  크롤링 실패 ({status['status']}): '{status['title']}'")
         
         return jsonify({
             'success': True,
             'documents': documents,
+            'statuses': statuses,
             'crawled_count': len(documents),
             'failed_count': len(character_names) - len(documents)
         })
@@ -234,6 +650,7 @@ def crawl_documents():
 
 
 @app.route('/api/generate-graph', methods=['POST'])
+@requires_dataset
 def generate_graph():
     """문서들을 받아서 관계도 생성"""
     try:
@@ -242,53 +659,23 @@ def generate_graph():
         character_documents = req_data.get('character_documents', [])  # 클라이언트에서 크롤링한 문서들
         character_names = req_data.get('character_names', [])
         model = req_data.get('model', 'gpt-4o-mini')  # 기본값: gpt-4o-mini
+        bypass_cache = bool(req_data.get('bypass_cache', False))  # True면 AI 응답 캐시를 사용하지 않음
         
         # 모델 검증
-        if model not in ['gpt-4o-mini', 'gpt-5']:
-            return jsonify({'error': '지원하지 않는 모델입니다. gpt-4o-mini 또는 gpt-5만 사용 가능합니다.'}), 400
+        if model not in SUPPORTED_MODELS:
+            return jsonify({'error': f"지원하지 않는 모델입니다. {' 또는 '.join(SUPPORTED_MODELS)}만 사용 가능합니다."}), 400
         
         if not keyword:
             return jsonify({'error': 'keyword가 필요합니다.'}), 400
         
         print(f"\n[관계도 생성] 키워드: {keyword}, 문서 수: {len(character_documents)}")
         
-        # AI 요청 통계 초기화
+        # 이 요청의 AI 호출 기록 시작 (다른 요청과 섞이지 않음)
         reset_ai_request_stats()
         
-        all_documents = []
-        
         # 메인 문서와 등장인물 목록 문서 찾기 (유사도 기반)
-        # 프로세스 1: 메인 문서 찾기
-        main_doc_idx, main_doc, matched_main_title, main_similarity = find_most_similar_document(
-            title_list, title_to_indices, data, keyword, suffix=None, verbose=False
-        )
-        
-        if main_doc:
-            main_doc_text = main_doc.get('text', '')
-            main_image_urls = extract_all_image_urls(main_doc_text)
-            all_documents.append({
-                'title': main_doc.get('title', ''),
-                'text': main_doc_text,
-                'image_urls': main_image_urls,
-                'type': 'main'
-            })
-        else:
-            print(f"⚠️  메인 문서를 찾을 수 없습니다.")
-        
-        # 프로세스 2: 등장인물 목록 문서 찾기
-        char_doc_idx, char_list_doc, matched_char_title, char_similarity = find_most_similar_document(
-            title_list, title_to_indices, data, keyword, suffix="/등장인물", verbose=False
-        )
-        
-        if char_list_doc and char_list_doc.get('text'):
-            char_list_doc_text = char_list_doc.get('text', '')
-            char_list_image_urls = extract_all_image_urls(char_list_doc_text)
-            all_documents.append({
-                'title': char_list_doc.get('title', ''),
-                'text': char_list_doc_text,
-                'image_urls': char_list_image_urls,
-                'type': 'character_list'
-            })
+        main, char_list = find_source_documents(title_list, title_to_indices, data, keyword)
+        all_documents = build_source_document_entries(main['doc'], char_list['doc'], main['index'], char_list['index'])
         
         # 클라이언트에서 크롤링한 문서들 추가
         found_characters = []
@@ -298,41 +685,27 @@ def generate_graph():
         
         # 웹 크롤링 실패한 인물 문서를 데이터셋에서 찾기
         crawled_titles = {doc.get('title', '') for doc in character_documents}
-        missing_characters = [name for name in character_names if name not in crawled_titles]
-        
-        if missing_characters:
-            print(f"⚠️  웹 크롤링 실패한 인물 ({len(missing_characters)}명): {missing_characters}")
-            print("데이터셋에서 찾는 중...")
-            
-            for char_name in missing_characters:
-                char_doc_idx, char_doc = find_document_by_exact_title_indexed(
-                    title_to_indices, data, char_name
-                )
-                
-                if char_doc_idx is not None and char_doc:
-                    char_doc_text = char_doc.get('text', '')
-                    char_image_urls = extract_all_image_urls(char_doc_text)
-                    all_documents.append({
-                        'title': char_doc.get('title', ''),
-                        'text': char_doc_text,
-                        'image_urls': char_image_urls,
-                        'type': 'character',
-                        'source': 'dataset'
-                    })
-                    found_characters.append(char_doc.get('title', ''))
-                    print(f"✅ 데이터셋에서 찾음: {char_doc.get('title', '')}")
+        for doc in find_missing_character_documents(title_to_indices, data, character_names, crawled_titles):
+            all_documents.append(doc)
+            found_characters.append(doc['title'])
         
         print(f"\n✅ 총 {len(all_documents)}개의 문서를 수집했습니다.")
         
         # 4. 모든 문서 합쳐서 AI에게 관계 그래프 요청
         print(f"AI를 사용한 관계 그래프 생성 중... (모델: {model})")
-        graph_data = extract_character_relationships_with_ai(keyword, all_documents, model=model)
+        graph_data = extract_character_relationships_with_ai(
+            keyword, all_documents, model=model, use_cache=not bypass_cache,
+            character_names=character_names or None,
+            mode=GRAPH_EXTRACTION_MODE, map_max_workers=GRAPH_MAP_WORKERS
+        )
         
         return jsonify({
             'success': True,
-            'graph': graph_data,
+            'graph': proxied_graph(graph_data),
             'found_characters': found_characters,
-            'total_documents': len(all_documents)
+            'total_documents': len(all_documents),
+            'ai_cache': get_ai_cache_report(),
+            'timings': get_ai_timings()
         })
         
     except Exception as e:
@@ -342,10 +715,299 @@ def generate_graph():
         return jsonify({'error': str(e)}), 500
 
 
-if __name__ == '__main__':
-    # 서버 시작 시 데이터셋과 인덱스 로드
-    load_dataset_and_index()
+@app.route('/api/graph', methods=['POST'])
+@requires_dataset
+def graph():
+    """
+    작품명만 받아서 서버에서 전체 과정(인물 추출 -> 문서 크롤링 -> 관계도 생성)을 실행
+    
+    크롤링한 문서를 클라이언트로 보냈다가 다시 받지 않고, 메인/등장인물 목록 문서 검색도 한 번만 합니다.
+    이미 만든 관계도는 저장소에서 바로 반환합니다 (응답의 stored, 새로 만들려면 refresh: true).
+    """
+    try:
+        req_data = request.get_json() or {}
+        keyword = req_data.get('keyword')
+        model = req_data.get('model', 'gpt-4o-mini')  # 기본값: gpt-4o-mini
+        bypass_cache = bool(req_data.get('bypass_cache', False))  # True면 AI 응답 캐시를 사용하지 않음
+        refresh = bool(req_data.get('refresh', False))  # True면 저장된 관계도를 사용하지 않고 새로 생성
+        
+        if not keyword:
+            return jsonify({'error': 'keyword가 필요합니다.'}), 400
+        
+        print(f"\n[관계도 생성 (서버 파이프라인)] 키워드: {keyword}, 모델: {model}")
+        
+        return jsonify(proxied_response(
+            generate_graph_response(keyword, model, bypass_cache=bypass_cache, refresh=refresh)
+        ))
+        
+    except GraphPipelineError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        print(f"에러 발생: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+def format_sse(event: str, payload) -> str:
+    """Server-Sent Events 메시지 한 개 (data는 한 줄짜리 JSON)"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/graph/stream', methods=['GET', 'POST'])
+@requires_dataset
+def graph_stream():
+    """
+    /api/graph와 같은 과정을 실행하면서 진행 상황을 Server-Sent Events로 전송
+    
+    EventSource용 GET(쿼리 문자열) 또는 POST(JSON)로 keyword, model, bypass_cache, refresh를 받습니다.
+    이벤트: documents, characters, character_crawled, crawled, graph_delta, graph_item, graph_chunk,
+           result(최종 결과, /api/graph 응답과 같음), failed(에러)
+    클라이언트 연결이 끊기면 다음 이벤트에서 파이프라인을 중단합니다.
+    """
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    keyword = params.get('keyword')
+    model = params.get('model', 'gpt-4o-mini')  # 기본값: gpt-4o-mini
+    bypass_cache = str(params.get('bypass_cache', '')).lower() in ('1', 'true')  # True면 AI 응답 캐시를 사용하지 않음
+    refresh = str(params.get('refresh', '')).lower() in ('1', 'true')  # True면 저장된 관계도를 사용하지 않음
+    
+    if not keyword:
+        return jsonify({'error': 'keyword가 필요합니다.'}), 400
+    
+    print(f"\n[관계도 생성 (스트리밍)] 키워드: {keyword}, 모델: {model}")
+    
+    events = queue.Queue()
+    finished = object()  # 파이프라인 종료 표시
+    disconnected = threading.Event()
+    
+    def on_event(event, payload):
+        if disconnected.is_set():
+            raise ConnectionAbortedError('클라이언트 연결이 끊어졌습니다.')
+        events.put((event, payload))
+    
+    def run():
+        try:
+            # AI 호출 기록은 파이프라인 스레드의 컨텍스트에 남음
+            events.put(('result', generate_graph_response(
+                keyword, model, bypass_cache=bypass_cache, refresh=refresh, on_event=on_event
+            )))
+        except GraphPipelineError as e:
+            events.put(('failed', {'error': str(e), 'status': e.status_code}))
+        except Exception as e:
+            if disconnected.is_set():
+                print(f"⚠️  클라이언트 연결이 끊어져 관계도 생성을 중단했습니다: {keyword}")
+            else:
+                print(f"에러 발생: {str(e)}")
+                import traceback
+                traceback.print_exc()
+            events.put(('failed', {'error': str(e), 'status': 500}))
+        finally:
+            events.put(finished)
     
+    def stream():
+        worker = threading.Thread(target=run, name='graph-stream', daemon=True)
+        worker.start()
+        pending = None
+        try:
+            while True:
+                if pending is not None:
+                    item, pending = pending, None
+                else:
+                    try:
+                        item = events.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                    except queue.Empty:
+                        yield ': keep-alive\n\n'
+                        continue
+                if item is finished:
+                    return
+                event, payload = item
+                if event == 'graph_delta':
+                    # 이미 쌓인 응답 조각은 메시지 하나로 합쳐서 전송
+                    texts = [payload['text']]
+                    while True:
+                        try:
+                            pending = events.get_nowait()
+                        except queue.Empty:
+                            pending = None
+                            break
+                        if pending is finished or pending[0] != 'graph_delta':
+                            break
+                        texts.append(pending[1]['text'])
+                    payload = {'text': ''.join(texts)}
+                yield format_sse(event, proxied_event(event, payload))
+        finally:
+            # 클라이언트가 끊었거나 응답이 끝남 (파이프라인 스레드는 다음 이벤트에서 중단)
+            disconnected.set()
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx 등 프록시가 버퍼링하지 않도록
+    })
+
+
+@app.route('/api/graphs')
+def stored_graphs():
+    """
+    저장된 관계도 조회
+    
+    ?keyword=...&model=...: 현재 데이터셋/프롬프트 버전으로 저장된 관계도 (없으면 404)
+    keyword가 없으면 최근에 사용한 관계도 목록 (?limit=N, 기본 50)
+    """
+    if graph_store is None:
+        return jsonify({'error': '관계도 저장소를 사용하지 않습니다.'}), 404
+    
+    keyword = normalize_keyword(request.args.get('keyword', ''))
+    if not keyword:
+        return jsonify({
+            'success': True,
+            'dataset_version': dataset_version,
+            'prompt_version': pipeline_prompt_version(GRAPH_EXTRACTION_MODE),
+            'graphs': graph_store.list(limit=request.args.get('limit', 50, type=int)),
+        })
+    
+    model = request.args.get('model', 'gpt-4o-mini')
+    reset_ai_request_stats()
+    stored = find_stored_graph(keyword, model)
+    if stored is None:
+        return jsonify({'error': f"'{keyword}' ({model})의 저장된 관계도가 없습니다."}), 404
+    return jsonify(proxied_response(stored_graph_response(stored)))
+
+
+def format_job(job, include_result: bool = True):
+    """작업 조회 API 응답 형식"""
+    body = {
+        'job_id': job['id'],
+        'status': job['status'],  # queued / running / done / failed
+        'keyword': job['params']['keyword'],
+        'model': job['params']['model'],
+        'submissions': job['submissions'],
+        'attempts': job['attempts'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'events': [dict(item, data=proxied_event(item['event'], item['data'])) for item in job.get('events', [])],
+    }
+    if job['status'] == 'done' and include_result:
+        body['result'] = proxied_response(job['result'])
+    if job['status'] == 'failed':
+        body['error'] = job['error']
+        body['error_status'] = job['error_status']
+    return body
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_graph_job():
+    """
+    관계도 생성 작업 제출 (바로 작업 id를 반환하고 백그라운드 워커가 실행)
+    
+    같은 작품명, 모델, 옵션(refresh, bypass_cache)의 작업이 대기/실행 중이면 그 작업 id를 반환합니다 (coalesced: true).
+    결과는 GET /api/jobs/<job_id>로 폴링하거나 GET /api/jobs/<job_id>/events로 구독합니다.
+    이미 만든 관계도면 작업을 만들지 않고 status: done과 result를 바로 반환합니다 (refresh: true면 새로 생성).
+    """
+    try:
+        req_data = request.get_json() or {}
+        keyword = normalize_keyword(req_data.get('keyword') or '')
+        model = req_data.get('model', 'gpt-4o-mini')  # 기본값: gpt-4o-mini
+        bypass_cache = bool(req_data.get('bypass_cache', False))  # True면 AI 응답 캐시를 사용하지 않음
+        refresh = bool(req_data.get('refresh', False))  # True면 저장된 관계도를 사용하지 않고 새로 생성
+        
+        if not keyword:
+            return jsonify({'error': 'keyword가 필요합니다.'}), 400
+        if model not in SUPPORTED_MODELS:
+            return jsonify({'error': f"지원하지 않는 모델입니다. {' 또는 '.join(SUPPORTED_MODELS)}만 사용 가능합니다."}), 400
+        
+        # 이미 만든 관계도면 작업 없이 바로 결과 반환
+        if not refresh:
+            stored = find_stored_graph(keyword, model)
+            if stored is not None:
+                print(f"\n[작업 제출] 키워드: {keyword}, 모델: {model} -> 저장된 관계도 반환")
+                reset_ai_request_stats()
+                return jsonify({
+                    'success': True,
+                    'job_id': None,
+                    'status': 'done',
+                    'coalesced': False,
+                    'result': proxied_response(stored_graph_response(stored)),
+                })
+        
+        # 옵션이 다르면 결과도 다르므로 합치지 않음 (새로 생성 요청이 진행 중인 일반 작업에 합류하지 않도록)
+        options = ''.join(flag for flag, on in (('R', refresh), ('B', bypass_cache)) if on)
+        job, coalesced = job_queue.submit(
+            f"{model}:{options}:{keyword}",
+            {'keyword': keyword, 'model': model, 'bypass_cache': bypass_cache, 'refresh': refresh},
+        )
+        print(f"\n[작업 제출] 키워드: {keyword}, 모델: {model}, 작업: {job['id']}"
+              f"{' (진행 중인 작업에 합류)' if coalesced else ''}")
+        
+        response = jsonify({
+            'success': True,
+            'job_id': job['id'],
+            'status': job['status'],
+            'coalesced': coalesced,
+            'poll_url': f"/api/jobs/{job['id']}",
+            'events_url': f"/api/jobs/{job['id']}/events",
+        })
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response, 202
+        
+    except Exception as e:
+        print(f"에러 발생: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>')
+def get_graph_job(job_id):
+    """
+    작업 상태 조회 (폴링용)
+    
+    ?after=N: N번째 이후의 진행 이벤트만 반환 (이전 응답의 마지막 events[].seq를 넘기면 됨)
+    """
+    job = job_queue.get(job_id, after=request.args.get('after', 0, type=int))
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify(format_job(job))
+
+
+@app.route('/api/jobs/<job_id>/events')
+def stream_graph_job(job_id):
+    """
+    작업 진행 이벤트를 Server-Sent Events로 구독 (끝나면 result 또는 failed 이벤트 후 종료)
+    
+    구독 중에는 요청 스레드를 하나 사용하므로, 스레드를 비워 두려면 GET /api/jobs/<job_id> 폴링을 사용합니다.
+    """
+    after = request.args.get('after', 0, type=int)
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    
+    def stream():
+        seq = after
+        while True:
+            job = job_queue.wait(job_id, after=seq, timeout=SSE_KEEPALIVE_INTERVAL)
+            if job is None:
+                yield format_sse('failed', {'error': '작업을 찾을 수 없습니다.', 'status': 404})
+                return
+            for item in job['events']:
+                seq = item['seq']
+                yield format_sse(item['event'], proxied_event(item['event'], item['data']))
+            if job['status'] == 'done':
+                yield format_sse('result', proxied_response(job['result']))
+                return
+            if job['status'] == 'failed':
+                yield format_sse('failed', {'error': job['error'], 'status': job['error_status']})
+                return
+            if not job['events']:
+                yield ': keep-alive\n\n'
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # nginx 등 프록시가 버퍼링하지 않도록
+    })
+
+
+if __name__ == '__main__':
+    # 데이터셋과 인덱스는 import 시 백그라운드에서 로드가 시작됨
     # Flask 서버 실행
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,41 @@
+"""gunicorn 설정
+
+환경변수:
+    PORT: 바인드할 포트 (기본 8080)
+    WEB_CONCURRENCY: 워커 프로세스 수 (기본 1)
+    GUNICORN_THREADS: 워커당 스레드 수 (기본 8). 관계도 생성은 작업 큐(JOB_WORKERS)에서 실행되므로
+                      /api/jobs를 쓰면 요청 스레드는 제출/폴링에만 잠깐 사용된다.
+    GUNICORN_TIMEOUT: 요청 타임아웃 초 (기본 300)
+    DATASET_PRELOAD: 1이면 마스터에서 데이터셋/인덱스를 한 번 로드한 뒤 워커를 fork
+                     (기본: 워커가 2개 이상이면 1)
+
+preload 모드에서 워커들은 mmap된 인덱스와 Arrow 데이터, 마스터가 만든 객체를
+copy-on-write로 공유하므로 워커를 늘려도 워커당 추가 메모리(USS)만 늘어난다.
+워커별 메모리는 기동 로그와 /memoryz 엔드포인트로 확인할 수 있다.
+"""
+import os
+
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+
+preload_app = os.environ.get('DATASET_PRELOAD', '1' if workers > 1 else '0') == '1'
+# app.py가 import 시 백그라운드 스레드 대신 동기로 로드하도록 전달
+os.environ['DATASET_PRELOAD'] = '1' if preload_app else '0'
+
+
+def post_worker_init(worker):
+    """워커별 메모리 사용량 기록 (인스턴스 크기 산정용), 작업 큐 워커 스레드 시작"""
+    from modules.memory_stats import get_memory_usage
+    worker.log.info("워커 메모리 (MB): %s", get_memory_usage())
+
+    # preload 모드에서는 마스터가 만든 스레드가 fork 후 남지 않으므로 워커마다 시작
+    from app import job_queue
+    job_queue.start()
+
+
+def worker_exit(server, worker):
+    """워커 종료 시 OpenAI 연결 풀 정리"""
+    from modules.ai_service import close_openai_client
+    close_openai_client()
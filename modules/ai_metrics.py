@@ -0,0 +1,146 @@
+"""AI 호출 시간 측정 모듈
+
+- 요청별 기록: contextvars로 현재 요청(스레드/컨텍스트)의 AI 호출만 모은다.
+  동시에 처리되는 요청끼리 섞이지 않고, 요청이 끝나면 함께 사라진다.
+- 프로세스 전체 집계: 모델/응답 출처(api, cache, shared)별 지연 시간 히스토그램과 프롬프트/응답 크기 합계
+"""
+import bisect
+import contextvars
+import threading
+from typing import Optional, Dict, Any, List
+
+# 지연 시간 히스토그램 구간 (초, 마지막은 +Inf)
+LATENCY_BUCKETS = (0.005, 0.05, 0.25, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+class AIRequestMetrics:
+    """요청 하나에서 발생한 AI 호출 기록 (하위 스레드에서 기록해도 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: List[Dict[str, Any]] = []
+
+    def record(self, call: Dict[str, Any]):
+        with self._lock:
+            self.calls.append(call)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(call) for call in self.calls]
+
+
+class LatencyHistogram:
+    """고정 구간 지연 시간 히스토그램 (Prometheus처럼 누적 개수로 출력)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.prompt_chars = 0
+        self.response_chars = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def observe(self, call: Dict[str, Any]):
+        elapsed = call['elapsed']
+        self.counts[bisect.bisect_left(self.buckets, elapsed)] += 1
+        self.count += 1
+        self.sum += elapsed
+        self.max = max(self.max, elapsed)
+        self.prompt_chars += call.get('prompt_chars') or 0
+        self.response_chars += call.get('response_chars') or 0
+        self.prompt_tokens += call.get('prompt_tokens') or 0
+        self.completion_tokens += call.get('completion_tokens') or 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'average': round(self.sum / self.count, 4) if self.count else 0.0,
+            'max': round(self.max, 4),
+            'buckets': buckets,
+            'prompt_chars': self.prompt_chars,
+            'response_chars': self.response_chars,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+        }
+
+
+_current_request: contextvars.ContextVar[Optional[AIRequestMetrics]] = contextvars.ContextVar(
+    'ai_request_metrics', default=None
+)
+_histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+_histograms_lock = threading.Lock()
+
+
+def start_ai_request_metrics() -> AIRequestMetrics:
+    """현재 컨텍스트에서 새 요청 기록 시작 (이전 기록은 버림)"""
+    metrics = AIRequestMetrics()
+    _current_request.set(metrics)
+    return metrics
+
+
+def current_ai_request_metrics() -> Optional[AIRequestMetrics]:
+    """현재 요청의 기록 (start_ai_request_metrics를 호출하지 않았으면 None)"""
+    return _current_request.get()
+
+
+def record_ai_call(call: Dict[str, Any]):
+    """
+    AI 호출 하나를 현재 요청 기록과 프로세스 전체 히스토그램에 추가
+
+    Args:
+        call: {'model', 'source': 'api'/'cache'/'shared'(진행 중인 같은 요청의 응답), 'status': 'ok'/'error', 'elapsed',
+               'prompt_chars', 'response_chars', 'prompt_tokens', 'completion_tokens', 'cache'}
+    """
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.record(call)
+
+    with _histograms_lock:
+        by_source = _histograms.setdefault(call['model'], {})
+        key = call['source'] if call.get('status', 'ok') == 'ok' else 'error'
+        histogram = by_source.get(key)
+        if histogram is None:
+            histogram = by_source[key] = LatencyHistogram()
+        histogram.observe(call)
+
+
+def get_ai_latency_histograms() -> Dict[str, Dict[str, Any]]:
+    """모델별, 출처별(api, cache, shared, error) 지연 시간 히스토그램"""
+    with _histograms_lock:
+        return {
+            model: {source: histogram.to_dict() for source, histogram in by_source.items()}
+            for model, by_source in _histograms.items()
+        }
+
+
+def summarize_ai_calls(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    요청 하나의 AI 호출 기록 요약 (API 응답의 timings 블록)
+
+    Returns:
+        총 호출 수, 실제 API 호출 수, 캐시 응답 수, 진행 중인 같은 요청과 합친 수, 총/평균/최소/최대 시간, 호출별 기록
+    """
+    api_times = [call['elapsed'] for call in calls if call['source'] == 'api']
+    total_time = sum(call['elapsed'] for call in calls)
+    return {
+        'total_calls': len(calls),
+        'api_calls': len(api_times),
+        'cache_hits': sum(1 for call in calls if call['source'] == 'cache'),
+        'shared': sum(1 for call in calls if call['source'] == 'shared'),
+        'errors': sum(1 for call in calls if call.get('status') == 'error'),
+        'total_time': round(total_time, 4),
+        'api_time': round(sum(api_times), 4),
+        'average_api_time': round(sum(api_times) / len(api_times), 4) if api_times else 0.0,
+        'min_api_time': round(min(api_times), 4) if api_times else 0.0,
+        'max_api_time': round(max(api_times), 4) if api_times else 0.0,
+        'calls': calls,
+    }
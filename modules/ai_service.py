@@ -1,25 +1,79 @@
 """AI 서비스 모듈"""
+import atexit
 import os
+import threading
 import time
-from typing import List, Dict, Optional, Any
+from types import SimpleNamespace
+from typing import List, Dict, Optional, Any, Callable
+import httpx
 import openai
 from dotenv import load_dotenv
+from .ai_metrics import (
+    current_ai_request_metrics,
+    get_ai_latency_histograms,
+    record_ai_call,
+    start_ai_request_metrics,
+    summarize_ai_calls,
+)
+from .llm_cache import LLMResponseCache, MemoryCacheBackend, SQLiteCacheBackend, make_cache_key
+from .single_flight import get_single_flight
+from .token_budget import count_tokens, measure_messages, record_completion_tokens, use_tiktoken
 
 # 환경변수 로드
 load_dotenv()
 
-# AI 요청 시간 추적을 위한 전역 변수
-_ai_request_times = []
+# OpenAI 연결 풀 설정
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None  # OpenAI 호환 서버 주소 (기본: api.openai.com)
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '10'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+
+# 모델별 응답 타임아웃 (초). OPENAI_MODEL_TIMEOUTS="gpt-4o-mini=120,gpt-4o=300"
+OPENAI_DEFAULT_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '300'))
+OPENAI_MODEL_TIMEOUTS = {
+    model.strip(): float(seconds)
+    for model, _, seconds in (
+        item.partition('=') for item in os.getenv('OPENAI_MODEL_TIMEOUTS', '').split(',') if '=' in item
+    )
+}
+
+# 입력 토큰 예산. OPENAI_INPUT_TOKEN_BUDGETS="gpt-4o-mini=24000,gpt-5=12000"
+OPENAI_DEFAULT_INPUT_TOKEN_BUDGET = int(os.getenv('OPENAI_INPUT_TOKEN_BUDGET', '24000'))
+OPENAI_MODEL_INPUT_TOKEN_BUDGETS = {
+    model.strip(): int(tokens)
+    for model, _, tokens in (
+        item.partition('=') for item in os.getenv('OPENAI_INPUT_TOKEN_BUDGETS', '').split(',') if '=' in item
+    )
+}
+# 토큰 수 계산 방법 (estimate: 문자 종류별 추정, tiktoken: 설치되어 있으면 실제 토크나이저)
+if os.getenv('TOKENIZER', 'estimate') == 'tiktoken':
+    use_tiktoken()
+
+# AI 응답 캐시 (configure_llm_cache로 설정, None이면 사용 안 함)
+_llm_cache: Optional[LLMResponseCache] = None
+# 같은 (모델, 메시지, 온도) 요청을 동시에 보내면 한 번만 호출
+_llm_flight = get_single_flight('llm')
+
+# 프로세스 공용 OpenAI 클라이언트 (keep-alive 연결 재사용)
+_client: Optional[openai.OpenAI] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+_client_stats = {'requests': 0, 'connections_opened': 0, 'tls_handshakes': 0, 'total_latency': 0.0, 'max_latency': 0.0}
 
 
 def get_ai_request_stats() -> Dict[str, Any]:
     """
-    AI 요청 통계 반환
+    현재 요청의 AI 요청 통계 반환 (실제 API 호출만, 캐시 응답 제외)
     
     Returns:
         통계 딕셔너리 (총 요청 수, 총 시간, 평균 시간, 최소/최대 시간 등)
     """
-    if not _ai_request_times:
+    metrics = current_ai_request_metrics()
+    calls = metrics.snapshot() if metrics else []
+    request_times = [call['elapsed'] for call in calls if call['source'] == 'api']
+    if not request_times:
         return {
             'total_requests': 0,
             'total_time': 0.0,
@@ -29,21 +83,93 @@ def get_ai_request_stats() -> Dict[str, Any]:
             'requests': []
         }
     
-    total_time = sum(_ai_request_times)
+    total_time = sum(request_times)
     return {
-        'total_requests': len(_ai_request_times),
+        'total_requests': len(request_times),
         'total_time': total_time,
-        'average_time': total_time / len(_ai_request_times),
-        'min_time': min(_ai_request_times),
-        'max_time': max(_ai_request_times),
-        'requests': _ai_request_times.copy()
+        'average_time': total_time / len(request_times),
+        'min_time': min(request_times),
+        'max_time': max(request_times),
+        'requests': request_times
     }
 
 
+def get_ai_timings() -> Dict[str, Any]:
+    """
+    현재 요청의 AI 호출 기록 (API 응답의 timings 블록)
+    
+    Returns:
+        호출 수, 총/평균 시간, 호출별 모델/소요 시간/프롬프트·응답 크기/캐시 여부
+    """
+    metrics = current_ai_request_metrics()
+    return summarize_ai_calls(metrics.snapshot() if metrics else [])
+
+
+def get_ai_metrics() -> Dict[str, Any]:
+    """프로세스 전체 AI 호출 지연 시간 히스토그램 (모델별, 출처별)"""
+    return get_ai_latency_histograms()
+
+
 def reset_ai_request_stats():
-    """AI 요청 통계 초기화"""
-    global _ai_request_times
-    _ai_request_times = []
+    """
+    AI 요청 통계 초기화 (요청 시작 시 호출)
+    
+    기록은 현재 컨텍스트(요청을 처리하는 스레드)에만 저장되므로 동시에 처리되는 다른 요청에 영향을 주지 않습니다.
+    """
+    start_ai_request_metrics()
+
+
+def configure_llm_cache(
+    path: Optional[str],
+    ttl: float = 7 * 24 * 3600,
+    max_bytes: int = 128 * 1024 * 1024,
+    memory_entries: int = 256,
+):
+    """
+    AI 응답 캐시 설정 (메모리 LRU -> SQLite 순으로 조회)
+    
+    Args:
+        path: SQLite 캐시 파일 경로 (None이면 메모리 캐시만 사용)
+        ttl: 응답을 재사용할 시간 (초)
+        max_bytes: SQLite 캐시 최대 크기 (압축 기준, 넘으면 LRU 삭제)
+        memory_entries: 메모리 캐시 최대 항목 수 (0이면 메모리 캐시 사용 안 함)
+    """
+    global _llm_cache
+    backends = []
+    if memory_entries > 0:
+        backends.append(MemoryCacheBackend(max_entries=memory_entries))
+    if path:
+        backends.append(SQLiteCacheBackend(path, max_bytes=max_bytes))
+    _llm_cache = LLMResponseCache(backends, ttl=ttl) if backends else None
+
+
+def get_llm_cache_stats() -> Optional[Dict[str, Any]]:
+    """AI 응답 캐시 hit/miss 통계 (캐시를 사용하지 않으면 None)"""
+    return _llm_cache.stats() if _llm_cache else None
+
+
+def get_ai_cache_report() -> Dict[str, Any]:
+    """
+    현재 요청에서 AI 응답 캐시를 사용한 내역
+    
+    Returns:
+        {'hit': 모든 AI 호출이 캐시에서 응답했는지, 'hits', 'misses', 'bypassed'}
+    """
+    metrics = current_ai_request_metrics()
+    calls = metrics.snapshot() if metrics else []
+    report = {
+        'hits': sum(1 for call in calls if call.get('cache') == 'hit'),
+        'misses': sum(1 for call in calls if call.get('cache') == 'miss'),
+        'bypassed': sum(1 for call in calls if call.get('cache') == 'bypass'),
+    }
+    report['hit'] = report['hits'] > 0 and report['misses'] == 0 and report['bypassed'] == 0
+    return report
+
+
+def invalidate_ai_response(messages: List[Dict[str, str]], model: str = "gpt-4o-mini", temperature: Optional[float] = None):
+    """캐시된 응답 삭제 (응답을 파싱하지 못했을 때 다음 요청에서 다시 호출하도록)"""
+    if _llm_cache:
+        _llm_cache.delete(make_cache_key(model, messages, temperature))
 
 
 def print_ai_request_stats():
@@ -75,26 +201,285 @@ def print_ai_request_stats():
     print("="*50)
 
 
-def call_ai_api(messages: List[Dict[str, str]], model: str = "gpt-4o-mini", temperature: Optional[float] = None) -> str:
+def get_model_input_budget(model: str) -> int:
+    """모델의 입력 토큰 예산"""
+    return OPENAI_MODEL_INPUT_TOKEN_BUDGETS.get(model, OPENAI_DEFAULT_INPUT_TOKEN_BUDGET)
+
+
+def get_model_timeout(model: str) -> float:
+    """모델별 응답 타임아웃 (OPENAI_MODEL_TIMEOUTS에 없으면 OPENAI_TIMEOUT)"""
+    return OPENAI_MODEL_TIMEOUTS.get(model, OPENAI_DEFAULT_TIMEOUT)
+
+
+def _trace_connection(event_name: str, info: Dict[str, Any]):
+    """httpcore trace 콜백: 새 연결/TLS 핸드셰이크 수 집계"""
+    if event_name == 'connection.connect_tcp.complete':
+        with _client_lock:
+            _client_stats['connections_opened'] += 1
+    elif event_name == 'connection.start_tls.complete':
+        with _client_lock:
+            _client_stats['tls_handshakes'] += 1
+
+
+def _on_request(request: httpx.Request):
+    request.extensions['trace'] = _trace_connection
+    request.extensions['ai_start_time'] = time.perf_counter()
+
+
+def _on_response(response: httpx.Response):
+    start_time = response.request.extensions.get('ai_start_time')
+    if start_time is None:
+        return
+    latency = time.perf_counter() - start_time
+    with _client_lock:
+        _client_stats['requests'] += 1
+        _client_stats['total_latency'] += latency
+        _client_stats['max_latency'] = max(_client_stats['max_latency'], latency)
+
+
+def get_openai_client() -> openai.OpenAI:
+    """
+    프로세스 공용 OpenAI 클라이언트 반환 (처음 호출 시 생성)
+    
+    httpx 연결 풀을 공유하므로 요청마다 TCP/TLS 연결을 새로 맺지 않습니다.
+    gunicorn preload 후 fork된 워커에서는 부모의 연결을 쓰지 않도록 새로 만듭니다.
+    """
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY 환경변수가 설정되지 않았습니다. .env 파일에 설정하거나 환경변수로 설정해주세요.")
+    
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            # httpx 0.28.1에서는 proxies 파라미터가 제거되었으므로 http_client를 직접 생성
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(OPENAI_DEFAULT_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                event_hooks={'request': [_on_request], 'response': [_on_response]},
+            )
+            _client = openai.OpenAI(
+                api_key=api_key,
+                base_url=OPENAI_BASE_URL,
+                http_client=http_client,
+                max_retries=OPENAI_MAX_RETRIES,
+            )
+            _client_pid = os.getpid()
+            print(f"🔌 OpenAI 클라이언트 생성 (최대 연결 {OPENAI_MAX_CONNECTIONS}개, keep-alive {OPENAI_MAX_KEEPALIVE_CONNECTIONS}개)")
+    return _client
+
+
+def close_openai_client():
+    """공용 OpenAI 클라이언트와 연결 풀 종료 (프로세스 종료 시 자동 호출)"""
+    global _client, _client_pid
+    with _client_lock:
+        client, owner_pid = _client, _client_pid
+        _client = None
+        _client_pid = None
+    # fork된 자식은 부모의 소켓을 닫지 않음
+    if client is not None and owner_pid == os.getpid():
+        client.close()
+
+
+atexit.register(close_openai_client)
+
+
+def get_ai_client_stats() -> Dict[str, Any]:
+    """
+    OpenAI 연결 풀 통계
+    
+    Returns:
+        요청 수, 새로 맺은 연결 수, 연결 재사용률, 평균/최대 HTTP 지연 시간 등
+    """
+    with _client_lock:
+        stats = dict(_client_stats)
+        client = _client if _client_pid == os.getpid() else None
+    
+    requests_count = stats.pop('requests')
+    total_latency = stats.pop('total_latency')
+    stats['requests'] = requests_count
+    stats['connection_reuse_rate'] = (
+        round(1 - stats['connections_opened'] / requests_count, 3) if requests_count else 0.0
+    )
+    stats['average_latency'] = round(total_latency / requests_count, 4) if requests_count else 0.0
+    stats['max_latency'] = round(stats['max_latency'], 4)
+    stats['pool'] = {
+        'max_connections': OPENAI_MAX_CONNECTIONS,
+        'max_keepalive_connections': OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        'keepalive_expiry': OPENAI_KEEPALIVE_EXPIRY,
+        'open_connections': _open_connection_count(client),
+    }
+    return stats
+
+
+def _open_connection_count(client: Optional[openai.OpenAI]) -> Optional[int]:
+    """연결 풀에 열려 있는 연결 수 (httpx 내부 구조가 다르면 None)"""
+    if client is None:
+        return 0
+    try:
+        return len(client._client._transport._pool.connections)
+    except AttributeError:
+        return None
+
+
+def call_ai_api(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-4o-mini",
+    temperature: Optional[float] = None,
+    use_cache: bool = True,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> str:
     """
     OpenAI API 호출
     
+    같은 (model, messages, temperature) 요청의 응답은 캐시에서 반환하고,
+    같은 요청이 동시에 진행 중이면 새로 호출하지 않고 그 응답을 함께 사용합니다.
+    호출마다 소요 시간, 모델, 프롬프트/응답 크기를 현재 요청 기록(get_ai_timings)과
+    프로세스 전체 히스토그램(get_ai_metrics)에 남깁니다.
+    메시지는 받은 그대로 보내고 캐시 키도 그 메시지로 만듭니다 (나무위키 문법 압축은 문서 전처리에서,
+    입력 토큰 예산은 프롬프트를 만들 때 document_token_budget으로 맞춤). 예산을 넘으면 경고만 출력합니다.
+    
     Args:
         messages: 메시지 리스트 (role, content)
         model: 사용할 모델 (기본: gpt-4o-mini)
         temperature: 온도 설정 (None이면 API 호출에 포함하지 않음)
+        use_cache: False면 캐시를 조회하지 않고 API를 호출 (응답은 캐시에 갱신)
+        on_delta: 지정하면 스트리밍으로 요청하고 받은 응답 조각마다 호출
+                  (캐시나 진행 중인 같은 요청의 응답을 쓰면 전체 응답으로 한 번 호출)
     
     Returns:
         AI 응답 텍스트
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY 환경변수가 설정되지 않았습니다. .env 파일에 설정하거나 환경변수로 설정해주세요.")
+    start_time = time.perf_counter()
+    budget = measure_messages(messages, model, get_model_input_budget(model))
+    if budget['over_budget']:
+        print(f"  ⚠️  입력 토큰(~{budget['tokens']})이 예산({budget['budget']})을 넘습니다 (모델: {model})")
+    call = {
+        'model': model,
+        'source': 'api',
+        'status': 'ok',
+        'cache': None,
+        'prompt_chars': sum(len(message.get('content') or '') for message in messages),
+        'prompt_tokens_estimated': budget['tokens'],
+    }
+    
+    cache = _llm_cache
+    cache_key = make_cache_key(model, messages, temperature)
+    if cache:
+        if use_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"  💾 AI 응답 캐시 사용 (모델: {model})")
+                call.update(source='cache', cache='hit', response_chars=len(cached))
+                _finish_ai_call(call, start_time)
+                if on_delta:
+                    on_delta(cached)
+                return cached
+            call['cache'] = 'miss'
+        else:
+            cache.record_bypass()
+            call['cache'] = 'bypass'
+    
+    def request():
+        content, usage = _request_chat_completion(messages, model, temperature, on_delta=on_delta)
+        if cache and content is not None:
+            cache.put(cache_key, content)
+        return content, usage
+    
+    try:
+        # 같은 요청이 이미 진행 중이면 그 응답을 함께 사용
+        # (먼저 보낸 쪽의 클라이언트 연결이 끊겨 중단되면 직접 다시 요청)
+        (content, usage), shared = _llm_flight.do(cache_key, request, retry_errors=(ConnectionAbortedError,))
+    except Exception:
+        call['status'] = 'error'
+        _finish_ai_call(call, start_time)
+        raise
+    
+    call['response_chars'] = len(content or '')
+    if shared:
+        # 토큰 사용량은 실제로 요청한 호출에만 기록
+        print(f"  🔗 진행 중인 같은 AI 요청의 응답 사용 (모델: {model})")
+        call['source'] = 'shared'
+        if on_delta and content:
+            on_delta(content)
+    elif usage is not None:
+        call['prompt_tokens'] = getattr(usage, 'prompt_tokens', None)
+        call['completion_tokens'] = getattr(usage, 'completion_tokens', None)
+    _log_tokens(call, budget, content)
+    _finish_ai_call(call, start_time)
+    return content
+
+
+def _log_tokens(call: Dict[str, Any], budget: Dict[str, Any], content: Optional[str]):
+    """입력/출력 토큰 출력 (API가 사용량을 주지 않으면 추정값, ~ 표시)"""
+    prompt_tokens = call.get('prompt_tokens')
+    completion_tokens = call.get('completion_tokens')
+    estimated = prompt_tokens is None or completion_tokens is None
+    if prompt_tokens is None:
+        prompt_tokens = budget['tokens']
+    if completion_tokens is None:
+        completion_tokens = count_tokens(content or '', call['model'])
+    record_completion_tokens(call['model'], completion_tokens)
+    print(f"  🔢 토큰: 입력 {'~' if estimated else ''}{prompt_tokens} / 출력 {'~' if estimated else ''}{completion_tokens}"
+          f" (모델: {call['model']})")
+
+
+def _finish_ai_call(call: Dict[str, Any], start_time: float):
+    call['elapsed'] = round(time.perf_counter() - start_time, 4)
+    record_ai_call(call)
+
+
+def _request_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: Optional[float],
+    on_delta: Optional[Callable[[str], None]] = None,
+):
+    """
+    캐시 없이 OpenAI API 호출 (temperature 미지원 모델은 temperature 없이 재시도)
+    
+    Args:
+        on_delta: 지정하면 stream=True로 요청하고 응답 조각마다 호출
+            (조각을 하나라도 전달한 뒤에는 재시도하지 않음 - 같은 내용을 두 번 받지 않도록)
+    
+    Returns:
+        (응답 텍스트, 토큰 사용량 또는 None)
+    """
+    client = get_openai_client()
+    timeout = get_model_timeout(model)
+    delivered = []  # on_delta로 전달한 조각 (있으면 재시도 불가)
     
-    # httpx 0.28.1에서는 proxies 파라미터가 제거되었으므로 http_client를 직접 생성
-    import httpx
-    http_client = httpx.Client()
-    client = openai.OpenAI(api_key=api_key, http_client=http_client)
+    def create(params):
+        if not on_delta:
+            response = client.chat.completions.create(**params)
+            return response.choices[0].message.content, response.usage
+        
+        chunks = []
+        usage = None
+        # 마지막 조각으로 토큰 사용량을 받음 (openai 1.3.0에는 stream_options 인자가 없어 extra_body로 전달)
+        stream = client.chat.completions.create(stream=True, extra_body={"stream_options": {"include_usage": True}}, **params)
+        try:
+            for chunk in stream:
+                chunk_usage = getattr(chunk, 'usage', None)
+                if chunk_usage:
+                    usage = SimpleNamespace(**chunk_usage) if isinstance(chunk_usage, dict) else chunk_usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    delivered.append(delta)
+                    on_delta(delta)
+        finally:
+            # 콜백이 예외를 던지면(클라이언트 연결 끊김 등) 남은 응답은 받지 않음
+            stream.response.close()
+        return ''.join(chunks), usage
     
     # 시간 측정 시작
     start_time = time.time()
@@ -103,47 +488,39 @@ def call_ai_api(messages: List[Dict[str, str]], model: str = "gpt-4o-mini", temp
         # temperature가 None이 아니면 포함, None이면 제외
         params = {
             "model": model,
-            "messages": messages
+            "messages": messages,
+            "timeout": timeout
         }
         if temperature is not None:
             params["temperature"] = temperature
         
-        response = client.chat.completions.create(**params)
+        result = create(params)
         elapsed_time = time.time() - start_time
-        
-        # 시간 기록
-        _ai_request_times.append(elapsed_time)
-        
-        # 요청 정보 출력
-        user_message_preview = messages[-1].get('content', '')[:50] if messages else ''
         print(f"  ⏱️  AI 요청 완료: {elapsed_time:.2f}초 (모델: {model})")
         
-        return response.choices[0].message.content
+        return result
     except Exception as e:
         # 시간 측정 종료 (에러 발생 시에도)
         elapsed_time = time.time() - start_time
         
         # temperature 관련 에러인 경우 temperature 없이 조용히 재시도
         error_str = str(e)
-        if "temperature" in error_str.lower() and temperature is not None:
+        if "temperature" in error_str.lower() and temperature is not None and not delivered:
             try:
                 # 재시도 시간 측정 시작
                 retry_start_time = time.time()
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=messages
-                )
+                result = create({
+                    "model": model,
+                    "messages": messages,
+                    "timeout": timeout
+                })
                 retry_elapsed_time = time.time() - retry_start_time
-                
-                # 재시도 시간 기록
-                _ai_request_times.append(retry_elapsed_time)
                 print(f"  ⏱️  AI 요청 완료 (재시도): {retry_elapsed_time:.2f}초 (모델: {model})")
                 
-                return response.choices[0].message.content
+                return result
             except Exception as retry_error:
                 print(f"❌ AI API 호출 실패: {retry_error}")
                 raise
         else:
             print(f"❌ AI API 호출 실패: {e} (소요 시간: {elapsed_time:.2f}초)")
             raise
-
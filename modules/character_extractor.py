@@ -2,11 +2,53 @@
 import json
 import re
 import time
-from typing import List
-from .ai_service import call_ai_api
+from typing import List, Optional
+from .ai_service import call_ai_api, get_model_input_budget, invalidate_ai_response
+from .document_preprocessor import preprocess_document
+from .token_budget import document_token_budget, truncate_to_tokens
 
+# 프롬프트나 응답 처리 방식을 바꾸면 올릴 것 (저장된 관계도를 다시 생성하도록)
+PROMPT_VERSION = 3
 
-def extract_character_names_with_ai(keyword: str, main_doc_text: str, character_list_doc_text: str, max_characters: int = 20) -> List[str]:
+# 인물 추출은 gpt-4o-mini 고정
+EXTRACTION_MODEL = "gpt-4o-mini"
+# 문서 하나에 넣을 최대 토큰 (나무위키 문법을 압축한 뒤 자름, 모델의 입력 예산이 더 작으면 그에 맞춤)
+DOC_TOKEN_BUDGET = 5000
+
+SYSTEM_MESSAGE = "당신은 나무위키 문서에서 등장인물 이름을 정확히 추출하는 전문가입니다. JSON 배열 형태로만 응답합니다."
+
+
+def _build_messages(keyword: str, main_doc_text: str, character_list_doc_text: str, max_characters: int) -> List[dict]:
+    """인물 추출 요청 메시지 (문서 다음에 지시문)"""
+    prompt = f"""다음은 "{keyword}"에 대한 나무위키 문서 두 개입니다.
+
+[메인 문서]
+{main_doc_text}
+
+[등장인물 목록 문서]
+{character_list_doc_text}
+
+위 두 문서에서 "{keyword}"에 정확히 속하는 등장인물의 이름만 추출해주세요.
+- 지역명, 기관명, 팀명 등은 제외하고 실제 인물 이름만 추출
+- 문서에 링크로 등장하는 인물명을 우선적으로 추출
+- 최대 {max_characters}명까지만 추출해주세요
+- JSON 배열 형태로만 응답해주세요 (예: ["인물1", "인물2", "인물3"])
+- 설명이나 다른 텍스트는 포함하지 마세요."""
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def extract_character_names_with_ai(
+    keyword: str,
+    main_doc_text: str,
+    character_list_doc_text: str,
+    max_characters: int = 20,
+    use_cache: bool = True,
+    main_doc_index: Optional[int] = None,
+    character_list_doc_index: Optional[int] = None,
+) -> List[str]:
     """
     AI를 사용하여 두 문서에서 keyword에 속할만한 인물 이름 추출
     
@@ -15,6 +57,8 @@ def extract_character_names_with_ai(keyword: str, main_doc_text: str, character_
         main_doc_text: 메인 문서 텍스트
         character_list_doc_text: 등장인물 목록 문서 텍스트
         max_characters: 최대 추출할 인물 수 (기본값: 20)
+        use_cache: False면 AI 응답 캐시를 사용하지 않음
+        main_doc_index, character_list_doc_index: 데이터셋 문서 인덱스 (전처리 결과 저장소의 키)
     
     Returns:
         인물 이름 리스트 (최대 max_characters개)
@@ -22,29 +66,20 @@ def extract_character_names_with_ai(keyword: str, main_doc_text: str, character_
     print("\n🤖 AI에게 인물 추출 요청 중...")
     start_time = time.time()
     
-    prompt = f"""다음은 "{keyword}"에 대한 나무위키 문서 두 개입니다.
-
-[메인 문서]
-{main_doc_text[:8000]}
-
-[등장인물 목록 문서]
-{character_list_doc_text[:8000]}
-
-위 두 문서에서 "{keyword}"에 정확히 속하는 등장인물의 이름만 추출해주세요.
-- 지역명, 기관명, 팀명 등은 제외하고 실제 인물 이름만 추출
-- 문서에 링크로 등장하는 인물명을 우선적으로 추출
-- 최대 {max_characters}명까지만 추출해주세요
-- JSON 배열 형태로만 응답해주세요 (예: ["인물1", "인물2", "인물3"])
-- 설명이나 다른 텍스트는 포함하지 마세요."""
-
-    messages = [
-        {"role": "system", "content": "당신은 나무위키 문서에서 등장인물 이름을 정확히 추출하는 전문가입니다. JSON 배열 형태로만 응답합니다."},
-        {"role": "user", "content": prompt}
-    ]
+    # 나무위키 문법을 정리한 본문 (문서마다 한 번만 정리)
+    main_doc_text = preprocess_document(main_doc_text, main_doc_index)['text']
+    character_list_doc_text = preprocess_document(character_list_doc_text, character_list_doc_index)['text']
+    # 지시문이 잘리지 않도록 입력 예산에서 지시문을 뺀 나머지를 두 문서가 나눠 씀
+    available = document_token_budget(
+        _build_messages(keyword, '', '', max_characters), EXTRACTION_MODEL, get_model_input_budget(EXTRACTION_MODEL)
+    )
+    doc_token_budget = DOC_TOKEN_BUDGET if available is None else min(DOC_TOKEN_BUDGET, available // 2)
+    main_doc_text = truncate_to_tokens(main_doc_text, doc_token_budget, EXTRACTION_MODEL)
+    character_list_doc_text = truncate_to_tokens(character_list_doc_text, doc_token_budget, EXTRACTION_MODEL)
+    messages = _build_messages(keyword, main_doc_text, character_list_doc_text, max_characters)
     
     try:
-        # 인물 추출은 gpt-4o-mini 고정
-        response = call_ai_api(messages, model="gpt-4o-mini")
+        response = call_ai_api(messages, model=EXTRACTION_MODEL, use_cache=use_cache)
         # JSON 배열 파싱
         response = response.strip()
         
@@ -78,6 +113,7 @@ def extract_character_names_with_ai(keyword: str, main_doc_text: str, character_
     except json.JSONDecodeError as e:
         print(f"⚠️  JSON 파싱 실패: {e}")
         print(f"응답 내용: {response[:500]}")
+        invalidate_ai_response(messages, model=EXTRACTION_MODEL)
         # 응답에서 따옴표로 감싸진 이름들 추출 시도
         names = re.findall(r'["\']([^"\']+)["\']', response)
         if names:
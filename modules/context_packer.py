@@ -0,0 +1,219 @@
+"""관계도 프롬프트용 문맥 패킹 모듈
+
+문서마다 앞부분만 자르고 전체를 다시 자르는 대신,
+문서를 섹션/문단 단위로 나누고 인물 이름 언급으로 점수를 매겨 토큰 예산 안에서 고른다.
+1. 인물마다 자기 문서의 첫 문단(없으면 그 인물을 가장 많이 언급한 문단)을 먼저 넣어 모든 인물을 포함
+2. 남은 예산은 인물별로 돌아가며 가치가 높은 문단을 넣음 (여러 인물이 함께 나오는 문단일수록 높음)
+나무위키 문법 정리와 섹션 나누기는 document_preprocessor가 문서마다 한 번만 하고,
+목차, 틀 같은 내용은 점수가 없어 예산을 차지하지 않는다.
+"""
+from typing import List, Dict, Any, Optional, Tuple
+
+from .document_preprocessor import preprocess_document, split_sections
+from .token_budget import count_tokens
+
+# 문단 최대 길이 (자) - 긴 섹션은 줄 단위로 나눔
+PASSAGE_MAX_CHARS = 600
+# 예산이 이보다 적게 남으면 문단을 잘라 넣지 않음
+MIN_PASSAGE_TOKENS = 40
+
+# 관계 정보가 없는 섹션
+SKIPPED_HEADINGS = ('각주', '외부 링크', '둘러보기', '같이 보기', '관련 문서', '틀', '목차')
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """토큰 수 추정 (model의 토크나이저 기준, 없으면 token_budget의 기본 모델)"""
+    return count_tokens(text, model)
+
+
+def clean_character_name(name: str) -> str:
+    """'홍길동(배우)/작중 행적' -> '홍길동'"""
+    return name.split('(')[0].split('/')[0].strip()
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_MAX_CHARS) -> List[Dict[str, Any]]:
+    """
+    문서 텍스트를 섹션으로 나눈 뒤 max_chars 이하의 문단으로 나눔
+
+    Returns:
+        [{'heading', 'text', 'order'}, ...] (order는 문서 안의 순서)
+    """
+    return passages_from_sections(split_sections(text), max_chars)
+
+
+def passages_from_sections(
+    sections: List[Tuple[str, str]], max_chars: int = PASSAGE_MAX_CHARS
+) -> List[Dict[str, Any]]:
+    """
+    이미 나눈 (섹션 제목, 본문) 리스트를 max_chars 이하의 문단으로 나눔
+
+    Returns:
+        [{'heading', 'text', 'order'}, ...] (order는 문서 안의 순서)
+    """
+    passages = []
+    for heading, body in sections:
+        if heading.strip() in SKIPPED_HEADINGS:
+            continue
+        chunk: List[str] = []
+        length = 0
+        for line in body.split('\n'):
+            while len(line) > max_chars:
+                if chunk:
+                    passages.append({'heading': heading, 'text': '\n'.join(chunk)})
+                    chunk, length = [], 0
+                passages.append({'heading': heading, 'text': line[:max_chars]})
+                line = line[max_chars:]
+            if chunk and length + len(line) > max_chars:
+                passages.append({'heading': heading, 'text': '\n'.join(chunk)})
+                chunk, length = [], 0
+            chunk.append(line)
+            length += len(line) + 1
+        if chunk:
+            passages.append({'heading': heading, 'text': '\n'.join(chunk)})
+    for order, passage in enumerate(passages):
+        passage['order'] = order
+    return passages
+
+
+def _passage_value(mentions: Dict[str, int]) -> float:
+    """문단 점수 - 함께 언급된 인물 쌍이 많을수록 높고, 언급 횟수는 적게 반영"""
+    distinct = len(mentions)
+    if distinct == 0:
+        return 0.0
+    pairs = distinct * (distinct - 1) / 2
+    return pairs * 2 + distinct + 0.2 * min(sum(mentions.values()), 10)
+
+
+def _truncate_to_tokens(text: str, tokens: int, model: Optional[str] = None) -> str:
+    """text를 대략 tokens 토큰 이하가 되도록 줄 단위로 자름 (첫 줄이 넘치면 글자 단위)"""
+    if estimate_tokens(text, model) <= tokens:
+        return text
+    kept: List[str] = []
+    used = 0
+    for line in text.split('\n'):
+        line_tokens = estimate_tokens(line, model)
+        if used + line_tokens > tokens:
+            if not kept:
+                # 한 줄도 못 넣으면 글자 수로 비례해 자름
+                kept.append(line[:max(1, int(len(line) * tokens / line_tokens))])
+            break
+        kept.append(line)
+        used += line_tokens
+    return '\n'.join(kept)
+
+
+def pack_documents(
+    documents: List[Dict[str, Any]],
+    character_names: List[str],
+    token_budget: int,
+    focus_names: Optional[List[str]] = None,
+    model: Optional[str] = None,
+) -> Tuple[Dict[int, List[Dict[str, Any]]], Dict[str, Any]]:
+    """
+    문서들에서 토큰 예산 안에 들어갈 문단을 고름
+
+    Args:
+        documents: 문서 리스트 (각각 title, text, 데이터셋 문서면 index)
+        character_names: 인물 이름 리스트 (언급 점수와 인물별 포함에 사용)
+        token_budget: 고른 문단 본문의 토큰 합 상한
+        focus_names: 지정하면 이 인물들의 문단만 고름 (점수는 전체 인물 기준, 관계도를 나눠 만들 때 사용)
+        model: 토큰 수를 셀 모델 (프롬프트를 보낼 모델)
+
+    Returns:
+        (selected, stats)
+        - selected: {문서 인덱스: 고른 문단 리스트 (문서 안 순서대로)}
+        - stats: {'passages', 'selected', 'tokens', 'budget', 'covered', 'characters'}
+    """
+    names = []
+    for name in character_names:
+        clean = clean_character_name(name)
+        if clean and clean not in names:
+            names.append(clean)
+    focus = names if focus_names is None else [name for name in map(clean_character_name, focus_names) if name in names]
+
+    passages = []
+    for doc_index, doc in enumerate(documents):
+        # 나무위키 문법 정리와 섹션 나누기는 문서마다 한 번만 (document_preprocessor가 기억)
+        sections = preprocess_document(doc.get('text', ''), doc.get('index'))['sections']
+        for passage in passages_from_sections(sections):
+            passage['doc_index'] = doc_index
+            passage['mentions'] = {name: passage['text'].count(name) for name in names if name in passage['text']}
+            passage['value'] = _passage_value(passage['mentions'])
+            passage['tokens'] = estimate_tokens(passage['text'], model)
+            passages.append(passage)
+
+    own_doc_index = {}
+    for doc_index, doc in enumerate(documents):
+        if doc.get('type') == 'character':
+            own_doc_index.setdefault(clean_character_name(doc.get('title', '')), doc_index)
+
+    chosen: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    remaining = token_budget
+
+    def id_of(passage: Dict[str, Any]) -> Tuple[int, int]:
+        return passage['doc_index'], passage['order']
+
+    def take(passage: Dict[str, Any], max_tokens: Optional[int] = None) -> bool:
+        nonlocal remaining
+        limit = remaining if max_tokens is None else min(remaining, max_tokens)
+        if limit < MIN_PASSAGE_TOKENS and passage['tokens'] > limit:
+            return False
+        if passage['tokens'] > limit:
+            passage = dict(passage, text=_truncate_to_tokens(passage['text'], limit, model))
+            passage['tokens'] = estimate_tokens(passage['text'], model)
+            passage['mentions'] = {name: n for name, n in passage['mentions'].items() if name in passage['text']}
+        chosen[id_of(passage)] = passage
+        remaining -= passage['tokens']
+        return True
+
+    # 인물별 후보 (가치 높은 순, 같으면 문서 순서)
+    candidates = {
+        name: sorted(
+            (p for p in passages if name in p['mentions']),
+            key=lambda p: (-p['value'], -p['mentions'][name], p['doc_index'], p['order']),
+        )
+        for name in focus
+    }
+
+    # 1. 메인 문서의 첫 문단(작품 개요)과 인물마다 한 문단씩 (자기 문서의 첫 문단 우선)
+    #    - 예산을 인물 수로 나눈 만큼까지만
+    share = max(MIN_PASSAGE_TOKENS, token_budget // (len(focus) + 1))
+    main_first = next((p for p in passages if documents[p['doc_index']].get('type') == 'main'), None)
+    if main_first is not None:
+        take(main_first, share)
+    for name in focus:
+        own = own_doc_index.get(name)
+        first = next((p for p in passages if p['doc_index'] == own), None) if own is not None else None
+        if first is None and candidates[name]:
+            first = candidates[name][0]
+        if first is not None and id_of(first) not in chosen:
+            take(first, share)
+
+    # 2. 인물별로 돌아가며 남은 후보 중 가장 가치 높은 문단
+    queues = {name: iter(candidates[name]) for name in focus}
+    while queues and remaining >= MIN_PASSAGE_TOKENS:
+        for name in list(queues):
+            for passage in queues[name]:
+                if id_of(passage) in chosen:
+                    continue
+                if passage['tokens'] <= remaining:
+                    take(passage)
+                    break
+            else:
+                del queues[name]
+
+    selected: Dict[int, List[Dict[str, Any]]] = {}
+    for passage in sorted(chosen.values(), key=lambda p: (p['doc_index'], p['order'])):
+        selected.setdefault(passage['doc_index'], []).append(passage)
+
+    covered = {name for p in chosen.values() for name in p['mentions'] if name in focus}
+    covered.update(name for name, doc_index in own_doc_index.items() if doc_index in selected and name in focus)
+    stats = {
+        'passages': len(passages),
+        'selected': len(chosen),
+        'tokens': token_budget - remaining,
+        'budget': token_budget,
+        'covered': len(covered),
+        'characters': len(focus),
+    }
+    return selected, stats
@@ -0,0 +1,152 @@
+"""문서 전처리 모듈
+
+데이터셋 문서의 나무위키 문법을 정리하고 섹션으로 나누는 작업을 문서마다 한 번만 하도록 결과를 기억한다.
+- 키: (데이터셋 문서 인덱스, 본문 해시) - 같은 본문이면 요청이 달라도 다시 정리하지 않음
+  (웹에서 가져온 문서처럼 인덱스가 없으면 None)
+- 정리: token_budget.compact_wiki_markup (틀 포함, 표 서식, 각주, 파일 링크, 매크로 제거, 문서 링크는 유지)
+- 섹션: 나무위키 문법(== 제목 ==)과 웹 문서 텍스트(번호 줄 다음 줄이 제목)를 모두 처리
+- 전체 문자 수 제한을 넘으면 가장 오래 사용하지 않은 문서부터 삭제 (LRU)
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .token_budget import compact_wiki_markup
+
+# == 제목 == (나무위키 문법), 1. / 2.3. (웹 문서의 문단 번호 줄)
+_MARKUP_HEADING = re.compile(r'^(=+)#?\s*(.+?)\s*#?\1\s*$')
+_NUMBER_HEADING = re.compile(r'^\d+(?:\.\d+)*\.$')
+# 내용이 없는 줄 (목차, 편집 링크, 틀 포함, 분류, 표 구분선 등)
+_NOISE_LINE = re.compile(
+    r'^(?:\[편집\]|\[목차\]|\[\s*펼치기\s*·\s*접기\s*\]|\[include\(.*|\[\[분류:.*|\|\|[\s|]*|#[a-zA-Z]+.*|-{4,})$'
+)
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    문서 텍스트를 (섹션 제목, 본문) 리스트로 분리
+
+    나무위키 문법(== 제목 ==)과 웹 문서 텍스트(번호 줄 다음 줄이 제목)를 모두 처리한다.
+    첫 제목 앞의 내용은 제목 ''의 섹션이 되고, 본문이 없는 섹션(목차 등)은 제외한다.
+    """
+    sections = []
+    heading = ''
+    body: List[str] = []
+    lines = text.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        i += 1
+        new_heading = None
+        match = _MARKUP_HEADING.match(line)
+        if match:
+            new_heading = match.group(2)
+        elif _NUMBER_HEADING.match(line) and i < len(lines):
+            new_heading = lines[i].strip()
+            i += 1
+        if new_heading is not None:
+            if body:
+                sections.append((heading, '\n'.join(body)))
+            heading, body = new_heading, []
+            continue
+        if line and not _NOISE_LINE.match(line):
+            body.append(line)
+    if body:
+        sections.append((heading, '\n'.join(body)))
+    return sections
+
+
+def content_hash(text: str) -> str:
+    """본문 해시 (전처리 결과의 키)"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class PreprocessedDocumentStore:
+    """(문서 인덱스, 본문 해시) -> 전처리 결과 메모리 LRU (정리한 본문 문자 수 합으로 제한)"""
+
+    def __init__(self, max_entries: int = 2048, max_chars: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._items: 'OrderedDict[Tuple[Optional[int], str], Dict[str, Any]]' = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'original_chars': 0, 'cleaned_chars': 0, 'seconds': 0.0}
+
+    def get(self, text: str, doc_index: Optional[int] = None) -> Dict[str, Any]:
+        """
+        문서의 전처리 결과 (처음이면 정리하고 섹션으로 나눠 기억)
+
+        Args:
+            text: 문서 본문 (나무위키 문법 또는 웹 문서 텍스트)
+            doc_index: 데이터셋 문서 인덱스 (없으면 None)
+
+        Returns:
+            {'hash', 'text', 'sections', 'original_chars'}
+            (여러 요청이 같은 결과를 공유하므로 수정하지 말 것)
+        """
+        key = (doc_index, content_hash(text))
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry
+
+        # 정리는 잠금 밖에서 (동시에 같은 문서가 들어오면 두 번 정리할 수 있지만 결과는 같음)
+        start = time.perf_counter()
+        cleaned = compact_wiki_markup(text)
+        entry = {
+            'hash': key[1],
+            'text': cleaned,
+            'sections': split_sections(cleaned),
+            'original_chars': len(text),
+        }
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats['misses'] += 1
+            self._stats['seconds'] += elapsed
+            self._stats['original_chars'] += len(text)
+            self._stats['cleaned_chars'] += len(cleaned)
+            if key not in self._items:
+                self._items[key] = entry
+                self._chars += len(cleaned)
+            while self._items and (len(self._items) > self.max_entries or self._chars > self.max_chars):
+                _, evicted = self._items.popitem(last=False)
+                self._chars -= len(evicted['text'])
+                self._stats['evictions'] += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._items), chars=self._chars)
+        stats['seconds'] = round(stats['seconds'], 4)
+        stats['reduction'] = round(1 - stats['cleaned_chars'] / stats['original_chars'], 3) if stats['original_chars'] else 0.0
+        return stats
+
+
+_store = PreprocessedDocumentStore()
+
+
+def configure_document_preprocessor(max_entries: int = 2048, max_chars: int = 64 * 1024 * 1024):
+    """전처리 결과 저장소 크기 설정 (기존 결과는 버림)"""
+    global _store
+    _store = PreprocessedDocumentStore(max_entries=max_entries, max_chars=max_chars)
+
+
+def preprocess_document(text: str, doc_index: Optional[int] = None) -> Dict[str, Any]:
+    """문서의 전처리 결과 ({'hash', 'text', 'sections', 'original_chars'}, 프로세스 공용 저장소 사용)"""
+    return _store.get(text or '', doc_index)
+
+
+def get_preprocess_stats() -> Dict[str, Any]:
+    """전처리 결과 저장소 통계 (hit/miss, 정리로 줄어든 문자 비율, 정리에 쓴 시간)"""
+    return _store.stats()
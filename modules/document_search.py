@@ -1,14 +1,32 @@
 """문서 검색 모듈"""
 from typing import Optional, Tuple, List
+from collections import defaultdict
 from difflib import SequenceMatcher
 from .namuwiki_dataset import normalize_title
+from .title_index import subpage_suffix
+from .single_flight import get_single_flight
+
+# 같은 키워드를 동시에 검색하면 한 번만 검색
+_search_flight = get_single_flight('document_search')
+
+
+def resolve_redirect_indexed(title_to_indices: dict, idx: int) -> int:
+    """
+    리다이렉트 문서면 인덱스 생성 시 해석해 둔 최종 문서 번호 반환 (O(1))
+    
+    메타데이터 테이블이 없거나 해석할 수 없는 리다이렉트면 idx를 그대로 반환
+    """
+    documents = getattr(title_to_indices, 'documents', None)
+    if documents is None:
+        return idx
+    return documents.resolve(idx)
 
 
 def find_document_by_exact_title_indexed(title_to_indices: dict, data, title: str) -> Tuple[Optional[int], Optional[dict]]:
-    """인덱스를 사용한 정확한 제목 검색"""
+    """인덱스를 사용한 정확한 제목 검색 (리다이렉트 문서는 대상 문서로 이동)"""
     normalized_title = normalize_title(title)
     if normalized_title in title_to_indices:
-        idx = title_to_indices[normalized_title][0]
+        idx = resolve_redirect_indexed(title_to_indices, title_to_indices[normalized_title][0])
         return idx, data[idx]
     return None, None
 
@@ -47,9 +65,9 @@ def search_document_by_title_indexed(title_to_indices: dict, data, character_nam
     """인덱스를 사용한 인물명 문서 검색"""
     normalized_name = normalize_title(character_name)
     
-    # 정확히 일치하는 경우
+    # 정확히 일치하는 경우 (리다이렉트 문서는 대상 문서로 이동)
     if normalized_name in title_to_indices:
-        idx = title_to_indices[normalized_name][0]
+        idx = resolve_redirect_indexed(title_to_indices, title_to_indices[normalized_name][0])
         return idx, data[idx]
     
     return None, None
@@ -87,6 +105,27 @@ def is_redirect_or_disambiguation(doc_text: str) -> bool:
     return False
 
 
+def parse_redirect_target(doc_text: str) -> Optional[str]:
+    """
+    리다이렉트 문서의 대상 제목 추출
+    
+    Args:
+        doc_text: 문서 텍스트 (예: "#redirect 나루토")
+    
+    Returns:
+        대상 제목 또는 None (리다이렉트 문서가 아니면)
+    """
+    if not doc_text:
+        return None
+    
+    normalized_text = doc_text.strip()
+    if normalized_text[:9].lower() != '#redirect':
+        return None
+    
+    lines = normalized_text[9:].strip().splitlines()
+    return lines[0].strip() if lines else ''
+
+
 def calculate_title_similarity(keyword: str, title: str) -> float:
     """
     제목 검색에 최적화된 유사도 계산
@@ -118,6 +157,117 @@ def calculate_title_similarity(keyword: str, title: str) -> float:
     return SequenceMatcher(None, normalized_keyword, normalized_title).ratio()
 
 
+def _similarity_upper_bound(shared_count: int, keyword_len: int, title_len: int) -> float:
+    """
+    공유 문자 수로 구한 calculate_title_similarity의 상한
+
+    SequenceMatcher.ratio = 2*M / (len(a)+len(b))이고 일치 문자 수 M은 공유 문자 수를 넘을 수 없다.
+    검색어의 모든 문자를 공유할 때만 포함(접두사) 가중치가 붙을 수 있다.
+    """
+    matched = min(shared_count, title_len)
+    bound = 2.0 * matched / (keyword_len + title_len)
+    if shared_count >= keyword_len:
+        bound = min(1.0, bound * 1.2)
+    return bound
+
+
+def _suffix_key_ids(title_list, normalized_suffix: str):
+    """
+    접미사 인덱스로 좁힐 수 있으면 마지막 '/' 뒤가 같은 키 번호들, 아니면 None
+    (suffix가 "/등장인물"처럼 '/'를 포함해야 함)
+    """
+    suffix_index = getattr(title_list, 'suffix_index', None)
+    subpage = subpage_suffix(normalized_suffix)
+    if suffix_index is None or not subpage:
+        return None
+    return suffix_index.key_ids(subpage)
+
+
+def _entries_with_suffix(title_list, normalized_suffix: str, key_ids) -> List[Tuple[int, str, str]]:
+    entries = []
+    for key_id in key_ids:
+        if title_list.key(key_id).endswith(normalized_suffix):
+            entries.extend(title_list.key_entries(key_id))
+    entries.sort(key=lambda x: x[0])
+    return entries
+
+
+def find_titles_by_suffix(title_list: List[tuple], suffix: str) -> List[Tuple[int, str, str]]:
+    """
+    제목이 suffix로 끝나는 문서 목록 (예: "/등장인물" -> 모든 등장인물 하위 문서)
+    
+    title_list에 접미사 인덱스(suffix_index)가 있으면 해당 접미사를 가진 제목만 확인하고,
+    없으면 전체 제목을 순회합니다.
+    
+    Args:
+        title_list: (idx, original_title, normalized_title) 리스트
+        suffix: 제목 끝에 있어야 할 접미사
+    
+    Returns:
+        문서 순서로 정렬된 [(idx, original_title, normalized_title), ...]
+    """
+    normalized_suffix = normalize_title(suffix)
+    key_ids = _suffix_key_ids(title_list, normalized_suffix)
+    if key_ids is not None:
+        return _entries_with_suffix(title_list, normalized_suffix, key_ids)
+    return [entry for entry in title_list if entry[2].endswith(normalized_suffix)]
+
+
+def _find_candidates_with_char_index(
+    title_list,
+    keyword: str,
+    normalized_suffix: Optional[str],
+    top_k: int,
+    allowed_key_ids: Optional[set] = None,
+) -> List[Tuple[int, str, str, float]]:
+    """
+    문자 역색인으로 후보를 추려 상위 top_k 계산 (전체 순회와 같은 결과)
+
+    공유 문자 수가 많은 키부터 상한이 높은 순으로 정확한 유사도를 계산하고,
+    상한이 현재 top_k번째 유사도보다 낮아지면 나머지는 계산하지 않는다.
+    allowed_key_ids가 주어지면 (접미사 인덱스) 그 키만 대상으로 한다.
+    """
+    char_index = title_list.char_index
+    normalized_keyword = normalize_title(keyword)
+    keyword_len = len(normalized_keyword)
+    
+    keys_by_shared = defaultdict(list)
+    for key_id, shared_count in char_index.shared_counts(normalized_keyword).items():
+        if allowed_key_ids is None or key_id in allowed_key_ids:
+            keys_by_shared[shared_count].append(key_id)
+    
+    candidates = []
+    threshold = -1.0
+    for shared_count in sorted(keys_by_shared, reverse=True):
+        # 이 그룹에서 가능한 최대 상한 (제목 길이 == 공유 문자 수)
+        if len(candidates) >= top_k and _similarity_upper_bound(shared_count, keyword_len, shared_count) < threshold:
+            break
+        
+        bounded = sorted(
+            ((_similarity_upper_bound(shared_count, keyword_len, char_index.key_length(key_id)), key_id)
+             for key_id in keys_by_shared[shared_count]),
+            key=lambda x: (-x[0], x[1]),
+        )
+        for bound, key_id in bounded:
+            if len(candidates) >= top_k and bound < threshold:
+                break
+            normalized_title = title_list.key(key_id)
+            if normalized_suffix and not normalized_title.endswith(normalized_suffix):
+                continue
+            
+            similarity = calculate_title_similarity(keyword, normalized_title)
+            if len(candidates) >= top_k and similarity < threshold:
+                continue
+            for idx, original_title, _ in title_list.key_entries(key_id):
+                candidates.append((idx, original_title, normalized_title, similarity))
+            candidates.sort(key=lambda x: (-x[3], x[0]))
+            del candidates[top_k:]
+            if len(candidates) >= top_k:
+                threshold = candidates[-1][3]
+    
+    return candidates
+
+
 def find_all_candidates_by_keyword(
     title_list: List[tuple], 
     keyword: str, 
@@ -128,6 +278,10 @@ def find_all_candidates_by_keyword(
     """
     keyword와 가장 유사한 후보 문서 수집 (유사도 포함)
     
+    title_list에 문자 역색인(char_index)이 있으면 keyword와 문자를 공유하는 제목만
+    유사도 상한 순으로 계산하고, 없으면 전체 제목을 순회합니다. 결과는 같습니다.
+    suffix가 있으면 접미사 인덱스(suffix_index)로 해당 접미사의 제목만 대상으로 합니다.
+    
     Args:
         title_list: (idx, original_title, normalized_title) 리스트
         keyword: 검색할 키워드
@@ -141,20 +295,29 @@ def find_all_candidates_by_keyword(
     """
     normalized_suffix = normalize_title(suffix) if suffix else None
     
+    suffix_key_ids = _suffix_key_ids(title_list, normalized_suffix) if normalized_suffix else None
+    allowed_key_ids = set(suffix_key_ids) if suffix_key_ids is not None else None
+    
+    if getattr(title_list, 'char_index', None) is not None and normalize_title(keyword):
+        candidates = _find_candidates_with_char_index(
+            title_list, keyword, normalized_suffix, top_k, allowed_key_ids
+        )
+        # 문자를 공유하는 제목이 top_k개 미만이면 (유사도 0인 제목 포함) 순회
+        if len(candidates) >= top_k:
+            return candidates
+    
+    # suffix가 지정되어 있으면 suffix로 끝나는 제목만 (접미사 인덱스가 있으면 해당 접미사의 제목만 확인)
+    entries = find_titles_by_suffix(title_list, suffix) if normalized_suffix else title_list
+    
     candidates = []
     
-    for idx, original_title, normalized_title in title_list:
-        # suffix가 지정되어 있으면 suffix로 끝나는지 확인
-        if normalized_suffix:
-            if not normalized_title.endswith(normalized_suffix):
-                continue
-        
+    for idx, original_title, normalized_title in entries:
         # 전체 제목에 대해 유사도 계산 (keyword가 제목에 포함되지 않아도 허용)
         similarity = calculate_title_similarity(keyword, normalized_title)
         candidates.append((idx, original_title, normalized_title, similarity))
     
-    # 유사도 내림차순으로 정렬 후 상위 top_k만 반환
-    candidates.sort(key=lambda x: x[3], reverse=True)
+    # 유사도 내림차순으로 정렬 후 상위 top_k만 반환 (동점이면 문서 순서)
+    candidates.sort(key=lambda x: (-x[3], x[0]))
     return candidates[:top_k]
 
 
@@ -169,6 +332,8 @@ def find_most_similar_document(
     """
     keyword와 가장 유사한 문서 찾기
     
+    같은 인덱스에서 같은 (정규화된 keyword, suffix)를 동시에 검색하면 한 번만 검색해 결과를 나눠 씁니다.
+    
     Args:
         title_list: (idx, original_title, normalized_title) 리스트
         title_to_indices: 정규화된 제목 -> 인덱스 리스트 딕셔너리
@@ -179,36 +344,54 @@ def find_most_similar_document(
     
     Returns:
         (인덱스, 문서, 매칭된_제목, 유사도) 튜플 또는 (None, None, None, 0.0)
+        (문서는 동시에 검색한 요청끼리 공유하므로 수정하지 말 것)
     """
+    key = (id(title_to_indices), normalize_title(keyword), normalize_title(suffix) if suffix else None)
+    result, _ = _search_flight.do(
+        key, _find_most_similar_document, title_list, title_to_indices, data, keyword, suffix, verbose
+    )
+    return result
+
+
+def _find_most_similar_document(
+    title_list: List[tuple],
+    title_to_indices: dict,
+    data,
+    keyword: str,
+    suffix: str,
+    verbose: bool
+) -> Tuple[Optional[int], Optional[dict], Optional[str], float]:
+    """find_most_similar_document의 실제 검색 (single-flight 없이)"""
     normalized_keyword = normalize_title(keyword)
+    documents = getattr(title_to_indices, 'documents', None)
+    
+    def document_quality(idx: int) -> Tuple[bool, int]:
+        """(리다이렉트/동음이의어 여부, 텍스트 길이) - 메타데이터 테이블이 있으면 본문을 읽지 않음"""
+        if documents is not None:
+            return documents.is_redirect_or_disambiguation(idx), documents.text_length(idx)
+        doc_text = data[idx].get('text', '')
+        return is_redirect_or_disambiguation(doc_text), len(doc_text)
     
     # 1. 정확한 매칭 먼저 확인 (내용 검증 포함)
     if suffix is None:
-        if normalized_keyword in title_to_indices:
-            idx = title_to_indices[normalized_keyword][0]
-            doc = data[idx]
-            doc_text = doc.get('text', '')
-            
-            # 리다이렉트나 동음이의어 문서인지 확인
-            if is_redirect_or_disambiguation(doc_text):
-                # 후보 검색으로 넘어감
-                pass
-            else:
-                return idx, doc, normalized_keyword, 1.0
+        exact_title = normalized_keyword
     else:
-        normalized_suffix = normalize_title(suffix)
-        exact_title = normalized_keyword + normalized_suffix
-        if exact_title in title_to_indices:
-            idx = title_to_indices[exact_title][0]
-            doc = data[idx]
-            doc_text = doc.get('text', '')
-            
-            # 리다이렉트나 동음이의어 문서인지 확인
-            if is_redirect_or_disambiguation(doc_text):
-                # 후보 검색으로 넘어감
-                pass
-            else:
-                return idx, doc, exact_title, 1.0
+        exact_title = normalized_keyword + normalize_title(suffix)
+    
+    if exact_title in title_to_indices:
+        idx = title_to_indices[exact_title][0]
+        is_redirect, _ = document_quality(idx)
+        
+        # 리다이렉트 문서면 해석해 둔 대상 문서로 이동
+        if is_redirect:
+            target_idx = resolve_redirect_indexed(title_to_indices, idx)
+            if target_idx != idx and not document_quality(target_idx)[0]:
+                doc = data[target_idx]
+                return target_idx, doc, normalize_title(doc.get('title', '')), 1.0
+        
+        # 리다이렉트나 동음이의어 문서면 후보 검색으로 넘어감
+        if not is_redirect:
+            return idx, data[idx], exact_title, 1.0
     
     # 2. 모든 후보 수집 (유사도 상위 top_k만 사용)
     candidates = find_all_candidates_by_keyword(
@@ -227,11 +410,8 @@ def find_most_similar_document(
     # - 텍스트 길이도 고려
     scored_candidates = []
     for idx, original_title, normalized_title, similarity in candidates:
-        doc = data[idx]
-        doc_text = doc.get('text', '')
-        
         # 리다이렉트/동음이의어 문서인지 확인
-        is_redirect = is_redirect_or_disambiguation(doc_text)
+        is_redirect, text_len = document_quality(idx)
         
         # 점수 계산: 유사도 + 내용 품질 보너스
         score = similarity
@@ -239,13 +419,13 @@ def find_most_similar_document(
         if not is_redirect:
             # 실제 내용이 있는 문서는 보너스
             # 텍스트 길이에 따라 보너스 (최대 0.1)
-            text_length_bonus = min(0.1, len(doc_text) / 10000.0)
+            text_length_bonus = min(0.1, text_len / 10000.0)
             score += text_length_bonus
         else:
             # 리다이렉트/동음이의어 문서는 감점
             score -= 0.2
         
-        scored_candidates.append((idx, original_title, normalized_title, similarity, score, is_redirect, len(doc_text)))
+        scored_candidates.append((idx, original_title, normalized_title, similarity, score, is_redirect, text_len))
     
     # 점수 순으로 정렬
     scored_candidates.sort(key=lambda x: x[4], reverse=True)  # score 내림차순
@@ -253,4 +433,3 @@ def find_most_similar_document(
     best_idx, best_original_title, best_normalized_title, best_similarity, best_score, is_redirect, text_len = scored_candidates[0]
     
     return best_idx, data[best_idx], best_normalized_title, best_similarity
-
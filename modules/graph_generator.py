@@ -1,26 +1,42 @@
-"""관계 그래프 생성 모듈"""
+"""관계 그래프 생성 모듈
+
+- single: 모든 문서를 프롬프트 하나에 넣어 한 번에 생성
+- map_reduce: 인물을 몇 명씩 묶어 묶음별로 작은 프롬프트를 동시에 보내고(map),
+  돌아온 부분 그래프를 인물 이름 기준으로 합침(reduce). 인물이 많아도 시간은 가장 느린 묶음 하나 정도
+
+응답은 항상 스트리밍으로 받아 인물/관계 객체가 완성되는 대로 전달하고,
+응답이 중간에 끊기거나 끝부분이 깨져도 완성된 객체로 부분 그래프를 만든다.
+"""
+import contextvars
 import json
 import time
-from typing import List, Dict, Any
-from .ai_service import call_ai_api
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from .ai_service import call_ai_api, get_model_input_budget, invalidate_ai_response
+from .context_packer import clean_character_name, pack_documents
+from .json_stream import StreamingJSONItemParser
+from .token_budget import document_token_budget, truncate_to_tokens
 
+# 프롬프트나 응답 처리 방식을 바꾸면 올릴 것 (저장된 관계도를 다시 생성하도록)
+PROMPT_VERSION = 4
 
-def extract_character_relationships_with_ai(keyword: str, all_documents: List[Dict[str, Any]], model: str = "gpt-4o-mini") -> Dict[str, Any]:
-    """
-    AI를 사용하여 모든 문서에서 인물 관계 그래프 추출
-    
-    Args:
-        keyword: 검색 키워드
-        all_documents: 모든 문서 리스트 (각각 title, text, image_src 포함)
-        model: 사용할 AI 모델 (gpt-4o-mini 또는 gpt-5)
-    
-    Returns:
-        관계 그래프 데이터 (JSON 형태)
-    """
-    print("\n🤖 AI에게 관계 그래프 생성 요청 중...")
-    start_time = time.time()
-    
-    # 인물명 -> 이미지 URL 매핑 생성 (fallback용)
+# 프롬프트에 넣을 문서 본문의 토큰 예산 (이미지 목록 제외, 모델의 입력 예산이 더 작으면 그에 맞춤)
+CONTEXT_TOKEN_BUDGET = 5000
+
+GRAPH_EXTRACTION_MODES = ('single', 'map_reduce')
+# map_reduce: 묶음당 인물 수, 동시 요청 수, 묶음당 문서 본문 토큰 예산
+MAP_CHARACTERS_PER_CHUNK = 5
+MAP_MAX_WORKERS = 4
+MAP_CONTEXT_TOKEN_BUDGET = 2500
+
+# 응답을 스트리밍으로 받으며 완성되는 대로 꺼낼 배열 (인물, 관계)
+GRAPH_ITEM_KEYS = ('characters', 'relationships')
+
+SYSTEM_MESSAGE = "당신은 나무위키 문서에서 인물 관계를 분석하는 전문가입니다. JSON 형태로만 응답합니다."
+
+
+def _character_image_urls(all_documents: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """인물명(문서 제목, 괄호/슬래시 제거한 제목) -> 실제 이미지 URL 리스트 (fallback용)"""
     character_to_image_urls = {}
     for doc in all_documents:
         title = doc.get('title', '')
@@ -33,12 +49,17 @@ def extract_character_relationships_with_ai(keyword: str, all_documents: List[Di
             if real_urls:
                 character_to_image_urls[clean_title] = real_urls
                 character_to_image_urls[title] = real_urls
-    
-    # 모든 문서 텍스트와 이미지 목록 합치기 (최적화: 텍스트 길이 제한)
+    return character_to_image_urls
+
+
+def _build_documents_text(all_documents: List[Dict[str, Any]], selected: Dict[int, List[Dict[str, Any]]]) -> str:
+    """고른 문단과 문서별 이미지 목록을 프롬프트용 텍스트로 합침 (고른 문단이 없는 문서는 제외)"""
     combined_text = ""
-    for doc in all_documents:
+    for doc_index, doc in enumerate(all_documents):
+        passages = selected.get(doc_index)
+        if not passages:
+            continue
         title = doc.get('title', 'Unknown')
-        text = doc.get('text', '')[:3000]  # 각 문서당 최대 3000자로 단축 (5000 -> 3000)
         image_urls = doc.get('image_urls', [])
         
         combined_text += f"\n\n=== {title} ===\n"
@@ -66,27 +87,21 @@ def extract_character_relationships_with_ai(keyword: str, all_documents: List[Di
                 combined_text += f"... 외 {len(real_urls) - 3}개 이미지 더 있음\n"
             combined_text += "\n"
         
-        combined_text += text
-    
-    # 인물 문서 제목 추출 (AI에게 명시적으로 전달)
-    character_doc_titles = []
-    for doc in all_documents:
-        if doc.get('type') == 'character':
-            title = doc.get('title', '')
-            if title:
-                character_doc_titles.append(title)
-    
-    # 전체 텍스트가 너무 길면 잘라내기 (15000자로 단축)
-    if len(combined_text) > 15000:
-        combined_text = combined_text[:15000] + "\n\n... (내용이 길어 일부 생략) ..."
-    
-    character_list_text = ""
-    if character_doc_titles:
-        character_list_text = f"\n\n중요: 위 문서들 중 다음 {len(character_doc_titles)}명의 인물들의 문서가 포함되어 있습니다:\n"
-        for i, title in enumerate(character_doc_titles, 1):
-            character_list_text += f"{i}. {title}\n"
-        character_list_text += f"\n이 {len(character_doc_titles)}명의 인물들은 반드시 그래프에 포함되어야 합니다. 또한 문서에서 언급된 다른 주요 인물들도 추가하여 최소 {len(character_doc_titles) + 5}명 이상의 인물을 포함해주세요.\n"
-    
+        previous_order = None
+        previous_heading = ''
+        for passage in passages:
+            if previous_order is not None and passage['order'] != previous_order + 1:
+                combined_text += "\n(...)\n"
+            if passage['heading'] and passage['heading'] != previous_heading:
+                combined_text += f"[{passage['heading']}]\n"
+            combined_text += passage['text'] + "\n"
+            previous_order = passage['order']
+            previous_heading = passage['heading']
+    return combined_text
+
+
+def _build_graph_prompt(keyword: str, combined_text: str, character_list_text: str) -> str:
+    """관계 그래프 요청 프롬프트"""
     prompt = f"""다음은 "{keyword}"에 대한 나무위키 문서들의 내용입니다.
 
 {combined_text}{character_list_text}
@@ -131,82 +146,424 @@ def extract_character_relationships_with_ai(keyword: str, all_documents: List[Di
 }}
 
 설명이나 다른 텍스트는 포함하지 말고 JSON만 응답해주세요."""
+    return prompt
+
 
-    messages = [
-        {"role": "system", "content": "당신은 나무위키 문서에서 인물 관계를 분석하는 전문가입니다. JSON 형태로만 응답합니다."},
-        {"role": "user", "content": prompt}
-    ]
+def _build_graph_messages(
+    keyword: str,
+    all_documents: List[Dict[str, Any]],
+    character_names: List[str],
+    character_list_text: str,
+    model: str,
+    context_token_budget: int,
+    focus_names: Optional[List[str]] = None,
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    문단을 골라 관계 그래프 요청 메시지를 만듦
+
+    지시문이 잘리지 않도록 모델의 입력 예산에서 지시문(인물 목록 포함)을 뺀 나머지에
+    문서 부분(고른 문단 + 이미지 목록)을 맞춘 뒤 프롬프트를 만든다.
+
+    Returns:
+        (messages, pack_stats)
+    """
+    def messages_for(combined_text: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": _build_graph_prompt(keyword, combined_text, character_list_text)}
+        ]
+
+    available = document_token_budget(messages_for(''), model, get_model_input_budget(model))
+    if available is not None:
+        context_token_budget = min(context_token_budget, available)
+    selected, pack_stats = pack_documents(
+        all_documents, character_names, context_token_budget, focus_names=focus_names, model=model
+    )
+    combined_text = _build_documents_text(all_documents, selected)
+    if available is not None:
+        combined_text = truncate_to_tokens(combined_text, available, model)
+    return messages_for(combined_text), pack_stats
+
+
+def _parse_graph_response(response: str) -> Dict[str, Any]:
+    """
+    AI 응답에서 관계 그래프 JSON 파싱 (코드 블록, 앞뒤 설명 제거)
+
+    Raises:
+        json.JSONDecodeError: JSON이 아닌 경우
+    """
+    response = response.strip()
+    
+    # 마크다운 코드 블록 제거
+    if response.startswith("```json"):
+        lines = response.split("\n")
+        response = "\n".join(lines[1:-1]) if len(lines) > 2 else response
+    elif response.startswith("```"):
+        lines = response.split("\n")
+        response = "\n".join(lines[1:-1]) if len(lines) > 2 else response
+    
+    # JSON 객체 찾기 (중괄호로 시작하는 부분)
+    json_start = response.find('{')
+    json_end = response.rfind('}') + 1
+    if json_start != -1 and json_end > json_start:
+        response = response[json_start:json_end]
     
+    return json.loads(response)
+
+
+def _request_graph(
+    messages: List[Dict[str, str]],
+    model: str,
+    use_cache: bool,
+    on_delta: Optional[Callable[[str], None]] = None,
+    on_item: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    관계 그래프 요청 (스트리밍으로 받으며 인물/관계 객체가 완성될 때마다 on_item 호출)
+
+    응답 JSON이 깨졌거나 스트림이 중간에 끊겨도 그때까지 완성된 인물이 있으면
+    그 부분 그래프를 반환한다 (graph_data['partial'] = True).
+
+    Raises:
+        json.JSONDecodeError: 응답을 파싱할 수 없고 완성된 인물도 없는 경우
+        콜백이 던진 예외 (클라이언트 연결 끊김 등)는 부분 그래프로 바꾸지 않고 그대로 전달
+    """
+    parser = StreamingJSONItemParser(GRAPH_ITEM_KEYS)
+    callback_errors = []
+
+    def handle_delta(text: str):
+        try:
+            for key, item in parser.feed(text):
+                if on_item and isinstance(item, dict):
+                    on_item(key, item)
+            if on_delta:
+                on_delta(text)
+        except BaseException as e:
+            callback_errors.append(e)
+            raise
+
+    def partial_graph() -> Dict[str, Any]:
+        print(f"   - 완성된 인물 {len(parser.items['characters'])}명, 관계 {len(parser.items['relationships'])}개로 부분 그래프 사용")
+        return {
+            'characters': [item for item in parser.items['characters'] if isinstance(item, dict)],
+            'relationships': [item for item in parser.items['relationships'] if isinstance(item, dict)],
+            'partial': True,
+        }
+
     try:
-        response = call_ai_api(messages, model=model, temperature=0.5)
-        # JSON 파싱
-        response = response.strip()
-        
-        # 마크다운 코드 블록 제거
-        if response.startswith("```json"):
-            lines = response.split("\n")
-            response = "\n".join(lines[1:-1]) if len(lines) > 2 else response
-        elif response.startswith("```"):
-            lines = response.split("\n")
-            response = "\n".join(lines[1:-1]) if len(lines) > 2 else response
-        
-        # JSON 객체 찾기 (중괄호로 시작하는 부분)
-        json_start = response.find('{')
-        json_end = response.rfind('}') + 1
-        if json_start != -1 and json_end > json_start:
-            response = response[json_start:json_end]
-        
-        graph_data = json.loads(response)
+        response = call_ai_api(messages, model=model, temperature=0.5, use_cache=use_cache, on_delta=handle_delta)
+    except Exception as e:
+        if callback_errors or not parser.items['characters']:
+            raise
+        print(f"⚠️  AI 응답이 중간에 끊겼습니다: {e}")
+        return partial_graph()
+
+    try:
+        return _parse_graph_response(response)
+    except json.JSONDecodeError as e:
+        print(f"⚠️  JSON 파싱 실패: {e}")
+        print(f"응답 내용: {response[:1000]}")
+        # 깨진 응답은 캐시에서 지워 다음에는 새로 요청
+        invalidate_ai_response(messages, model=model, temperature=0.5)
+        if not parser.items['characters']:
+            raise
+        return partial_graph()
+
+
+def _apply_image_fallback(graph_data: Dict[str, Any], character_to_image_urls: Dict[str, List[str]]):
+    """AI가 고른 이미지가 URL이 아니면 비우고, 없으면 인물 문서의 첫 이미지로 채움"""
+    fallback_count = 0
+    for char_node in graph_data.get('characters', []):
+        name = char_node.get('name', '')
+        ai_selected_image = char_node.get('image_src')
         
-        # AI 응답 후 이미지 URL 보정 및 fallback
-        fixed_count = 0
-        fallback_count = 0
-        for char_node in graph_data.get('characters', []):
-            name = char_node.get('name', '')
-            ai_selected_image = char_node.get('image_src')
+        if name:
+            # 1. AI가 선택한 이미지가 파일명 형식이면 null로 설정
+            if ai_selected_image and not ai_selected_image.startswith('http'):
+                char_node['image_src'] = None
             
-            if name:
-                # 1. AI가 선택한 이미지가 파일명 형식이면 null로 설정
-                if ai_selected_image and not ai_selected_image.startswith('http'):
-                    char_node['image_src'] = None
-                
-                # 2. AI가 null이거나 선택하지 못한 경우, 실제 문서에서 가져온 이미지 사용 (fallback)
-                if not char_node.get('image_src') or char_node.get('image_src') == 'null' or char_node.get('image_src') == '':
-                    if name in character_to_image_urls:
-                        image_list = character_to_image_urls[name]
+            # 2. AI가 null이거나 선택하지 못한 경우, 실제 문서에서 가져온 이미지 사용 (fallback)
+            if not char_node.get('image_src') or char_node.get('image_src') == 'null' or char_node.get('image_src') == '':
+                if name in character_to_image_urls:
+                    image_list = character_to_image_urls[name]
+                    # 첫 번째 이미지 선택
+                    char_node['image_src'] = image_list[0] if image_list else None
+                    if image_list:
+                        fallback_count += 1
+                else:
+                    clean_name = name.split('(')[0].split('/')[0].strip()
+                    if clean_name in character_to_image_urls:
+                        image_list = character_to_image_urls[clean_name]
                         # 첫 번째 이미지 선택
                         char_node['image_src'] = image_list[0] if image_list else None
                         if image_list:
                             fallback_count += 1
                     else:
-                        clean_name = name.split('(')[0].split('/')[0].strip()
-                        if clean_name in character_to_image_urls:
-                            image_list = character_to_image_urls[clean_name]
-                            # 첫 번째 이미지 선택
-                            char_node['image_src'] = image_list[0] if image_list else None
-                            if image_list:
-                                fallback_count += 1
-                        else:
-                            char_node['image_src'] = None
-        
-        if fallback_count > 0:
-            print(f"   - 이미지 fallback: {fallback_count}개 인물에 이미지 추가")
-        
-        elapsed_time = time.time() - start_time
-        print(f"✅ AI가 관계 그래프를 생성했습니다. (전체 소요 시간: {elapsed_time:.2f}초)")
-        print(f"   - 인물 수: {len(graph_data.get('characters', []))}")
-        print(f"   - 관계 수: {len(graph_data.get('relationships', []))}")
-        
-        # 이미지가 있는 인물 수 출력
-        characters_with_image = sum(1 for char in graph_data.get('characters', []) if char.get('image_src'))
-        print(f"   - 이미지 있는 인물: {characters_with_image}명")
-        
-        return graph_data
-    except json.JSONDecodeError as e:
-        print(f"⚠️  JSON 파싱 실패: {e}")
-        print(f"응답 내용: {response[:1000]}")
-        raise
+                        char_node['image_src'] = None
+    
+    if fallback_count > 0:
+        print(f"   - 이미지 fallback: {fallback_count}개 인물에 이미지 추가")
+
+
+def _print_graph_summary(graph_data: Dict[str, Any], start_time: float):
+    elapsed_time = time.time() - start_time
+    print(f"✅ AI가 관계 그래프를 생성했습니다. (전체 소요 시간: {elapsed_time:.2f}초)")
+    print(f"   - 인물 수: {len(graph_data.get('characters', []))}")
+    print(f"   - 관계 수: {len(graph_data.get('relationships', []))}")
+    
+    # 이미지가 있는 인물 수 출력
+    characters_with_image = sum(1 for char in graph_data.get('characters', []) if char.get('image_src'))
+    print(f"   - 이미지 있는 인물: {characters_with_image}명")
+
+
+def _character_doc_titles(all_documents: List[Dict[str, Any]]) -> List[str]:
+    """인물 문서 제목 리스트 (AI에게 명시적으로 전달)"""
+    return [doc.get('title', '') for doc in all_documents if doc.get('type') == 'character' and doc.get('title', '')]
+
+
+def _print_pack_stats(pack_stats: Dict[str, Any], label: str = ''):
+    print(f"📦 문맥 패킹{label}: 문단 {pack_stats['selected']}/{pack_stats['passages']}개, "
+          f"약 {pack_stats['tokens']}토큰 (예산 {pack_stats['budget']}), "
+          f"인물 {pack_stats['covered']}/{pack_stats['characters']}명 포함")
+
+
+def _character_list_text(character_doc_titles: List[str]) -> str:
+    """single 모드: 포함된 인물 문서 목록과 인물 수 요구"""
+    character_list_text = ""
+    if character_doc_titles:
+        character_list_text = f"\n\n중요: 위 문서들 중 다음 {len(character_doc_titles)}명의 인물들의 문서가 포함되어 있습니다:\n"
+        for i, title in enumerate(character_doc_titles, 1):
+            character_list_text += f"{i}. {title}\n"
+        character_list_text += f"\n이 {len(character_doc_titles)}명의 인물들은 반드시 그래프에 포함되어야 합니다. 또한 문서에서 언급된 다른 주요 인물들도 추가하여 최소 {len(character_doc_titles) + 5}명 이상의 인물을 포함해주세요.\n"
+    return character_list_text
+
+
+def _chunk_character_list_text(focus_names: List[str], all_names: List[str]) -> str:
+    """map_reduce 모드: 이번 묶음에서 다룰 인물과 관계 상대로 쓸 전체 인물 목록"""
+    text = f"\n\n중요: 이번에는 다음 {len(focus_names)}명의 인물을 중심으로 정리해주세요:\n"
+    for i, name in enumerate(focus_names, 1):
+        text += f"{i}. {name}\n"
+    text += (
+        f"\n이 {len(focus_names)}명은 반드시 그래프에 포함하고, 이 인물들과 다른 인물 사이의 관계를 빠짐없이 포함해주세요. "
+        f"관계 상대가 아래 전체 인물 목록에 있으면 목록의 이름 표기를 그대로 사용해주세요.\n"
+        f"전체 인물 목록: {', '.join(all_names)}\n"
+    )
+    return text
+
+
+def _name_key(name: str) -> str:
+    """인물을 합칠 때 쓰는 키 ('홍 길동(배우)' -> '홍길동')"""
+    return clean_character_name(name).replace(' ', '')
+
+
+def merge_partial_graphs(partials: List[Dict[str, Any]], character_names: List[str]) -> Dict[str, Any]:
+    """
+    묶음별 부분 그래프를 하나로 합침 (같은 입력이면 항상 같은 결과)
+
+    - 인물은 이름 키(괄호/슬래시/공백 제거)로 합치고, 추출된 인물 목록에 있는 이름은 목록의 표기를 사용
+    - 인물 정보는 그 인물을 다룬 묶음의 것을 우선, 없으면 앞 묶음의 것 (비어 있는 값은 뒤 묶음 값으로 채움)
+    - 관계는 (from, to) 기준으로 합치고, from 인물을 다룬 묶음 -> to 인물을 다룬 묶음 -> 앞 묶음 순으로 설명을 선택
+
+    Args:
+        partials: [{'graph': 부분 그래프, 'focus': 묶음의 인물 이름 리스트}, ...] (묶음 순서대로)
+        character_names: 추출된 전체 인물 이름
+
+    Returns:
+        {'characters', 'relationships'}
+    """
+    canonical = {}
+    for name in character_names:
+        canonical.setdefault(_name_key(name), name)
+
+    nodes: Dict[str, Dict[str, Any]] = {}
+    node_rank: Dict[str, int] = {}
+    edges: Dict[tuple, Dict[str, Any]] = {}
+    edge_rank: Dict[tuple, int] = {}
+
+    for chunk_index, partial in enumerate(partials):
+        focus = {_name_key(name) for name in partial['focus']}
+        graph = partial['graph']
+
+        for node in graph.get('characters', []):
+            name = (node.get('name') or '').strip()
+            key = _name_key(name)
+            if not key:
+                continue
+            rank = (0 if key in focus else 1, chunk_index)
+            merged = dict(node, name=canonical.get(key, name))
+            if key not in nodes or rank < node_rank[key]:
+                previous = nodes.get(key, {})
+                nodes[key] = merged
+                node_rank[key] = rank
+                for field, value in previous.items():
+                    if not merged.get(field) and value:
+                        merged[field] = value
+            else:
+                for field, value in merged.items():
+                    if not nodes[key].get(field) and value:
+                        nodes[key][field] = value
+
+        for edge in graph.get('relationships', []):
+            source_key = _name_key(edge.get('from') or '')
+            target_key = _name_key(edge.get('to') or '')
+            if not source_key or not target_key or source_key == target_key:
+                continue
+            rank = (0 if source_key in focus else 1 if target_key in focus else 2, chunk_index)
+            key = (source_key, target_key)
+            if key not in edges or rank < edge_rank[key]:
+                edges[key] = dict(
+                    edge,
+                    **{'from': nodes[source_key]['name'] if source_key in nodes else canonical.get(source_key, edge['from'].strip()),
+                       'to': nodes[target_key]['name'] if target_key in nodes else canonical.get(target_key, edge['to'].strip())}
+                )
+                edge_rank[key] = rank
+
+    # 관계에만 나온 인물도 노드로 추가
+    for source_key, target_key in edges:
+        for key, name in ((source_key, edges[(source_key, target_key)]['from']), (target_key, edges[(source_key, target_key)]['to'])):
+            if key not in nodes:
+                nodes[key] = {'name': name, 'image_src': None, 'description': ''}
+
+    # 추출된 인물 순서 먼저, 나머지는 처음 나온 순서
+    order = {key: i for i, key in enumerate(canonical)}
+    characters = sorted(nodes.items(), key=lambda item: order.get(item[0], len(order)))
+    return {
+        'characters': [node for _, node in characters],
+        'relationships': list(edges.values()),
+    }
+
+
+def extract_character_relationships_map_reduce(
+    keyword: str,
+    all_documents: List[Dict[str, Any]],
+    character_names: List[str],
+    model: str = "gpt-4o-mini",
+    use_cache: bool = True,
+    characters_per_chunk: int = MAP_CHARACTERS_PER_CHUNK,
+    max_workers: int = MAP_MAX_WORKERS,
+    context_token_budget: int = MAP_CONTEXT_TOKEN_BUDGET,
+    on_chunk: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+    on_item: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    인물을 묶음으로 나눠 묶음별 관계 그래프를 동시에 요청하고 합침
+
+    Args:
+        keyword: 검색 키워드
+        all_documents: 모든 문서 리스트
+        character_names: 추출된 인물 이름 (묶음을 나누는 기준)
+        characters_per_chunk: 묶음당 인물 수
+        max_workers: 동시 AI 요청 수
+        context_token_budget: 묶음당 문서 본문 토큰 예산
+        on_chunk: 묶음 하나가 끝날 때마다 (끝난 묶음 수, 전체 묶음 수, 부분 그래프)로 호출 (호출한 스레드에서 실행)
+        on_item: 묶음 응답에서 인물/관계 객체가 완성될 때마다 ('characters' 또는 'relationships', 객체)로 호출
+                 (묶음 작업 스레드에서 호출됨, 합치기 전 값이라 같은 인물/관계가 여러 번 올 수 있음)
+
+    Returns:
+        합친 관계 그래프 데이터
+
+    Raises:
+        모든 묶음이 실패하면 마지막 예외 (일부만 실패하면 나머지로 합침)
+    """
+    print(f"\n🤖 AI에게 관계 그래프 생성 요청 중... (map-reduce, 인물 {len(character_names)}명)")
+    start_time = time.time()
+    character_to_image_urls = _character_image_urls(all_documents)
+    names = list(dict.fromkeys(name for name in character_names if name))
+    chunks = [names[i:i + characters_per_chunk] for i in range(0, len(names), characters_per_chunk)] or [[]]
+
+    def run_chunk(chunk_index: int, focus: List[str]) -> Dict[str, Any]:
+        messages, pack_stats = _build_graph_messages(
+            keyword, all_documents, names, _chunk_character_list_text(focus, names), model,
+            context_token_budget, focus_names=focus,
+        )
+        _print_pack_stats(pack_stats, f" (묶음 {chunk_index + 1}/{len(chunks)})")
+        return _request_graph(messages, model, use_cache, on_item=on_item)
+
+    partials: List[Optional[Dict[str, Any]]] = [None] * len(chunks)
+    last_error = None
+    done = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix='graph-map')
+    try:
+        # 요청별 AI 호출 기록(contextvars)이 작업 스레드에서도 이어지도록 묶음마다 컨텍스트 복사
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_chunk, chunk_index, focus): chunk_index
+            for chunk_index, focus in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            chunk_index = futures[future]
+            done += 1
+            try:
+                graph = future.result()
+            except Exception as e:
+                last_error = e
+                print(f"⚠️  묶음 {chunk_index + 1}/{len(chunks)} 관계 그래프 생성 실패: {e}")
+                continue
+            partials[chunk_index] = {'graph': graph, 'focus': chunks[chunk_index]}
+            if on_chunk:
+                on_chunk(done, len(chunks), graph)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    succeeded = [partial for partial in partials if partial is not None]
+    if not succeeded:
+        print(f"❌ 관계 그래프 생성 실패: {last_error}")
+        raise last_error
+
+    graph_data = merge_partial_graphs(succeeded, names)
+    if any(partial['graph'].get('partial') for partial in succeeded):
+        graph_data['partial'] = True
+    _apply_image_fallback(graph_data, character_to_image_urls)
+    print(f"   - 묶음: {len(succeeded)}/{len(chunks)}개 성공 (동시 요청 {min(max_workers, len(chunks))}개)")
+    _print_graph_summary(graph_data, start_time)
+    return graph_data
+
+
+def extract_character_relationships_with_ai(keyword: str, all_documents: List[Dict[str, Any]], model: str = "gpt-4o-mini", use_cache: bool = True, on_delta: Optional[Callable[[str], None]] = None, character_names: Optional[List[str]] = None, context_token_budget: int = CONTEXT_TOKEN_BUDGET, mode: str = 'single', map_max_workers: int = MAP_MAX_WORKERS, on_chunk: Optional[Callable[[int, int, Dict[str, Any]], None]] = None, on_item: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    AI를 사용하여 모든 문서에서 인물 관계 그래프 추출
+    
+    Args:
+        keyword: 검색 키워드
+        all_documents: 모든 문서 리스트 (각각 title, text, image_src 포함)
+        model: 사용할 AI 모델 (gpt-4o-mini 또는 gpt-5)
+        use_cache: False면 AI 응답 캐시를 사용하지 않음
+        on_delta: AI 응답 조각마다 호출 (single 모드, 응답은 항상 스트리밍으로 받음)
+        character_names: 추출된 인물 이름 (문단 점수에 사용, 없으면 인물 문서 제목)
+        context_token_budget: 문서 본문에 사용할 토큰 예산 (single 모드)
+        mode: 'single' (프롬프트 하나) 또는 'map_reduce' (인물 묶음별 동시 요청 후 합침)
+        map_max_workers: map_reduce 모드의 동시 AI 요청 수
+        on_chunk: map_reduce 모드에서 묶음 하나가 끝날 때마다 호출
+        on_item: 응답에서 인물/관계 객체가 완성될 때마다 ('characters' 또는 'relationships', 객체)로 호출
+    
+    Returns:
+        관계 그래프 데이터 (JSON 형태)
+        - 응답이 중간에 끊기거나 깨져 완성된 부분만 사용했으면 'partial': True
+    """
+    character_doc_titles = _character_doc_titles(all_documents)
+    if mode == 'map_reduce':
+        return extract_character_relationships_map_reduce(
+            keyword, all_documents, character_names or character_doc_titles, model=model, use_cache=use_cache,
+            max_workers=map_max_workers, on_chunk=on_chunk, on_item=on_item,
+        )
+    
+    print("\n🤖 AI에게 관계 그래프 생성 요청 중...")
+    start_time = time.time()
+    character_to_image_urls = _character_image_urls(all_documents)
+    
+    # 문서를 문단으로 나눠 인물 언급이 많은 문단을 토큰 예산만큼 고르기 (모든 인물이 포함되도록)
+    messages, pack_stats = _build_graph_messages(
+        keyword, all_documents, character_names or character_doc_titles,
+        _character_list_text(character_doc_titles), model, context_token_budget,
+    )
+    _print_pack_stats(pack_stats)
+    
+    try:
+        graph_data = _request_graph(messages, model, use_cache, on_delta=on_delta, on_item=on_item)
     except Exception as e:
         print(f"❌ 관계 그래프 생성 실패: {e}")
         raise
-
+    
+    # AI 응답 후 이미지 URL 보정 및 fallback
+    _apply_image_fallback(graph_data, character_to_image_urls)
+    _print_graph_summary(graph_data, start_time)
+    return graph_data
@@ -0,0 +1,284 @@
+"""관계도 생성 파이프라인 모듈
+
+작품명 하나로 서버에서 전체 과정을 실행한다.
+1. 메인 문서 / 등장인물 목록 문서 검색 (한 번만 검색해 인물 추출과 관계도 생성에 같이 사용)
+2. AI로 인물 목록 추출
+3. 인물 문서 동시 크롤링 (실패한 인물은 데이터셋에서 찾기)
+4. AI로 관계 그래프 생성
+
+크롤링한 문서는 서버 안에서만 전달되므로 클라이언트가 문서 본문을 주고받지 않는다.
+"""
+import time
+from typing import Optional, Dict, Any, List, Callable
+
+from .character_extractor import PROMPT_VERSION as CHARACTER_PROMPT_VERSION, extract_character_names_with_ai
+from .document_search import find_document_by_exact_title_indexed, find_most_similar_document
+from .graph_generator import (
+    GRAPH_EXTRACTION_MODES,
+    MAP_MAX_WORKERS,
+    PROMPT_VERSION as GRAPH_PROMPT_VERSION,
+    extract_character_relationships_with_ai,
+)
+from .image_index import document_image_urls
+from .namuwiki_web import crawl_namuwiki_pages
+
+SUPPORTED_MODELS = ('gpt-4o-mini', 'gpt-5')
+MAX_CHARACTERS = 20
+
+# graph_item 이벤트의 kind (응답 JSON의 배열 이름 -> 항목 종류)
+GRAPH_ITEM_KINDS = {'characters': 'character', 'relationships': 'relationship'}
+
+# 파이프라인 결과에 영향을 주는 프롬프트 버전 (저장된 관계도의 키에 사용)
+PIPELINE_PROMPT_VERSION = f"c{CHARACTER_PROMPT_VERSION}-g{GRAPH_PROMPT_VERSION}-n{MAX_CHARACTERS}"
+
+
+def pipeline_prompt_version(graph_mode: str = 'single') -> str:
+    """관계 그래프 생성 방식까지 포함한 프롬프트 버전 (방식마다 결과가 다르므로 따로 저장)"""
+    return PIPELINE_PROMPT_VERSION if graph_mode == 'single' else f"{PIPELINE_PROMPT_VERSION}-{graph_mode}"
+
+
+def normalize_keyword(keyword: str) -> str:
+    """작품명 정규화 (앞뒤 공백 제거, 연속 공백은 하나로) - 같은 작업인지 판단하는 키에 사용"""
+    return ' '.join(keyword.split())
+
+
+class GraphPipelineError(Exception):
+    """파이프라인을 계속할 수 없는 경우 (status_code는 API 응답 코드)"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def validate_model(model: str):
+    """지원하지 않는 모델이면 GraphPipelineError (status_code 400)"""
+    if model not in SUPPORTED_MODELS:
+        raise GraphPipelineError(
+            f"지원하지 않는 모델입니다. {' 또는 '.join(SUPPORTED_MODELS)}만 사용 가능합니다.", 400
+        )
+
+
+def find_source_documents(title_list, title_to_indices, data, keyword: str):
+    """
+    keyword의 메인 문서와 등장인물 목록 문서 검색
+
+    Returns:
+        (main, character_list)
+        - 각각 {'index', 'doc', 'matched_title', 'similarity'} (못 찾으면 doc이 None)
+    """
+    main_idx, main_doc, main_title, main_similarity = find_most_similar_document(
+        title_list, title_to_indices, data, keyword, suffix=None, verbose=False
+    )
+    char_idx, char_doc, char_title, char_similarity = find_most_similar_document(
+        title_list, title_to_indices, data, keyword, suffix="/등장인물", verbose=False
+    )
+    return (
+        {'index': main_idx, 'doc': main_doc, 'matched_title': main_title, 'similarity': main_similarity},
+        {'index': char_idx, 'doc': char_doc, 'matched_title': char_title, 'similarity': char_similarity},
+    )
+
+
+def build_source_document_entries(
+    main_doc: Optional[Dict],
+    char_list_doc: Optional[Dict],
+    main_index: Optional[int] = None,
+    char_list_index: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """메인 문서 / 등장인물 목록 문서를 관계도 생성용 문서 형식으로 변환 (index는 전처리 결과 저장소의 키)"""
+    documents = []
+    if main_doc:
+        main_doc_text = main_doc.get('text', '')
+        documents.append({
+            'title': main_doc.get('title', ''),
+            'text': main_doc_text,
+            'image_urls': document_image_urls(main_doc_text, main_index),
+            'type': 'main',
+            'index': main_index,
+        })
+    else:
+        print("⚠️  메인 문서를 찾을 수 없습니다.")
+
+    if char_list_doc and char_list_doc.get('text'):
+        char_list_doc_text = char_list_doc.get('text', '')
+        documents.append({
+            'title': char_list_doc.get('title', ''),
+            'text': char_list_doc_text,
+            'image_urls': document_image_urls(char_list_doc_text, char_list_index),
+            'type': 'character_list',
+            'index': char_list_index,
+        })
+    return documents
+
+
+def find_missing_character_documents(
+    title_to_indices, data, character_names: List[str], crawled_titles
+) -> List[Dict[str, Any]]:
+    """
+    웹 크롤링에 실패한 인물 문서를 데이터셋에서 찾기
+
+    Args:
+        character_names: 전체 인물 이름 리스트
+        crawled_titles: 이미 문서를 가져온 인물 이름 집합 (크롤링 결과의 h1 제목이 아니라 요청한 이름)
+
+    Returns:
+        데이터셋에서 찾은 문서 리스트 (source='dataset')
+    """
+    missing_characters = [name for name in character_names if name not in crawled_titles]
+    if not missing_characters:
+        return []
+
+    print(f"⚠️  웹 크롤링 실패한 인물 ({len(missing_characters)}명): {missing_characters}")
+    print("데이터셋에서 찾는 중...")
+
+    documents = []
+    for char_name in missing_characters:
+        char_doc_idx, char_doc = find_document_by_exact_title_indexed(title_to_indices, data, char_name)
+        if char_doc_idx is not None and char_doc:
+            char_doc_text = char_doc.get('text', '')
+            documents.append({
+                'title': char_doc.get('title', ''),
+                'text': char_doc_text,
+                'image_urls': document_image_urls(char_doc_text, char_doc_idx),
+                'type': 'character',
+                'source': 'dataset',
+                'index': char_doc_idx,
+            })
+            print(f"✅ 데이터셋에서 찾음: {char_doc.get('title', '')}")
+    return documents
+
+
+def run_graph_pipeline(
+    title_list,
+    title_to_indices,
+    data,
+    keyword: str,
+    model: str = 'gpt-4o-mini',
+    max_characters: int = MAX_CHARACTERS,
+    crawl_max_workers: int = 8,
+    crawl_deadline: float = 25.0,
+    use_cache: bool = True,
+    graph_mode: str = 'single',
+    map_max_workers: int = MAP_MAX_WORKERS,
+    on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    작품명으로 관계도 생성 전체 과정을 실행
+
+    Args:
+        title_list, title_to_indices, data: 로드된 데이터셋과 인덱스
+        keyword: 작품명
+        model: 관계도 생성 모델 (인물 추출은 gpt-4o-mini 고정)
+        max_characters: 최대 인물 수
+        crawl_max_workers, crawl_deadline: 인물 문서 크롤링 동시 요청 수와 제한 시간 (초)
+        use_cache: False면 AI 응답 캐시를 사용하지 않음
+        graph_mode: 관계 그래프 생성 방식 ('single' 또는 'map_reduce')
+        map_max_workers: map_reduce 방식의 동시 AI 요청 수
+        on_event: 진행 상황마다 호출되는 콜백 (이벤트 이름, 데이터). 예외를 던지면 파이프라인을 중단
+            - 'documents': 메인/등장인물 목록 문서를 찾음
+            - 'characters': 인물 목록 추출 완료
+            - 'character_crawled': 인물 문서 하나의 크롤링이 끝남 (크롤링 스레드에서 호출됨)
+            - 'crawled': 문서 수집 완료
+            - 'graph_delta': 관계도 AI 응답 조각 (single 방식, on_event가 있으면 스트리밍으로 요청)
+            - 'graph_item': AI 응답에서 인물/관계 객체 하나가 완성됨 ({'kind': 'character'/'relationship', 'item'})
+            - 'graph_chunk': 인물 묶음 하나의 관계도 완성 (map_reduce 방식)
+
+    Returns:
+        {'graph', 'characters', 'found_characters', 'main_document', 'character_list_document',
+         'crawl', 'total_documents', 'stages'}
+
+    Raises:
+        GraphPipelineError: 문서나 인물을 찾지 못한 경우 (status_code 404)
+    """
+    # 공백만 다른 작품명은 같은 프롬프트가 되도록 (AI 응답 캐시, 동시 요청 합치기)
+    keyword = normalize_keyword(keyword)
+    validate_model(model)
+    if graph_mode not in GRAPH_EXTRACTION_MODES:
+        raise GraphPipelineError(f"지원하지 않는 관계도 생성 방식입니다: {graph_mode}", 400)
+
+    def emit(event: str, payload: Dict[str, Any]):
+        if on_event:
+            on_event(event, payload)
+
+    stages = {}
+    stage_start = time.time()
+
+    # 1. 메인 문서 / 등장인물 목록 문서 검색 (이후 단계에서 다시 검색하지 않음)
+    main, char_list = find_source_documents(title_list, title_to_indices, data, keyword)
+    if main['doc'] is None:
+        raise GraphPipelineError(f"'{keyword}' 관련 문서를 찾을 수 없습니다.", 404)
+    main_doc = main['doc']
+    char_list_doc = char_list['doc'] or {'title': '', 'text': ''}
+    main_document = {'title': main_doc.get('title', ''), 'index': main['index']}
+    character_list_document = {'title': char_list_doc.get('title', ''), 'index': char_list['index']}
+    stages['search'] = round(time.time() - stage_start, 3)
+    emit('documents', {'main_document': main_document, 'character_list_document': character_list_document})
+
+    # 2. 인물 추출
+    stage_start = time.time()
+    character_names = extract_character_names_with_ai(
+        keyword, main_doc.get('text', ''), char_list_doc.get('text', ''),
+        max_characters=max_characters, use_cache=use_cache,
+        main_doc_index=main['index'], character_list_doc_index=char_list['index'],
+    )
+    if not character_names:
+        raise GraphPipelineError('추출된 인물이 없습니다.', 404)
+    character_names = character_names[:max_characters]
+    stages['extract_characters'] = round(time.time() - stage_start, 3)
+    print(f"✅ 추출된 인물 ({len(character_names)}명): {character_names}")
+    emit('characters', {'characters': character_names})
+
+    # 3. 인물 문서 수집 (웹 우선, 실패하면 데이터셋)
+    stage_start = time.time()
+    crawled_documents, statuses = crawl_namuwiki_pages(
+        character_names, max_workers=crawl_max_workers, deadline=crawl_deadline,
+        on_result=(lambda status, doc: emit('character_crawled', status)) if on_event else None,
+    )
+    for doc in crawled_documents:
+        doc['type'] = 'character'
+        doc['source'] = 'web'
+    # 크롤링 성공 여부는 요청한 이름의 상태로 판단 (페이지 제목(h1)은 요청한 이름과 다를 수 있음)
+    crawled_names = {status['title'] for status in statuses if status['status'] == 'ok'}
+    fallback_names = [name for name in character_names if name not in crawled_names]
+    dataset_documents = find_missing_character_documents(title_to_indices, data, fallback_names, crawled_names)
+    stages['collect_documents'] = round(time.time() - stage_start, 3)
+    emit('crawled', {'statuses': statuses, 'dataset_fallbacks': [doc['title'] for doc in dataset_documents]})
+
+    source_documents = build_source_document_entries(main_doc, char_list['doc'], main['index'], char_list['index'])
+    all_documents = source_documents + crawled_documents + dataset_documents
+    found_characters = [doc.get('title', '') for doc in crawled_documents + dataset_documents]
+    print(f"\n✅ 총 {len(all_documents)}개의 문서를 수집했습니다.")
+
+    # 4. 관계 그래프 생성
+    stage_start = time.time()
+    print(f"AI를 사용한 관계 그래프 생성 중... (모델: {model}, 방식: {graph_mode})")
+    graph_data = extract_character_relationships_with_ai(
+        keyword, all_documents, model=model, use_cache=use_cache, character_names=character_names,
+        mode=graph_mode, map_max_workers=map_max_workers,
+        on_delta=(lambda text: emit('graph_delta', {'text': text})) if on_event else None,
+        on_item=(lambda key, item: emit('graph_item', {'kind': GRAPH_ITEM_KINDS[key], 'item': item})) if on_event else None,
+        on_chunk=(lambda done, total, graph: emit('graph_chunk', {
+            'done': done,
+            'total': total,
+            'characters': len(graph.get('characters', [])),
+            'relationships': len(graph.get('relationships', [])),
+        })) if on_event else None,
+    )
+    stages['generate_graph'] = round(time.time() - stage_start, 3)
+    stages['total'] = round(sum(stages.values()), 3)
+
+    return {
+        'graph': graph_data,
+        'characters': character_names,
+        'found_characters': found_characters,
+        'main_document': main_document,
+        'character_list_document': character_list_document,
+        'crawl': {
+            'statuses': statuses,
+            'crawled_count': len(crawled_documents),
+            'dataset_count': len(dataset_documents),
+            # 크롤링도 실패하고 데이터셋에도 없는 인물 수
+            'failed_count': len(fallback_names) - len(dataset_documents),
+        },
+        'total_documents': len(all_documents),
+        'stages': stages,
+    }
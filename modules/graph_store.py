@@ -0,0 +1,125 @@
+"""완성된 관계도 저장소 모듈
+
+(정규화된 작품명, 모델, 데이터셋/인덱스 버전, 프롬프트 버전)을 키로 관계도 생성 결과를
+SQLite에 zlib 압축해 저장한다.
+- 데이터셋이나 프롬프트가 바뀌면 버전이 달라져 이전 결과를 사용하지 않음
+- TTL이 지난 항목은 없는 것으로 취급 (웹 문서 내용이 바뀌므로)
+- 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU)
+"""
+import json
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, List, NamedTuple
+
+from .sqlite_store import SQLiteStore
+
+
+class StoredGraph(NamedTuple):
+    result: Dict[str, Any]
+    created_at: float
+    dataset_version: str
+    prompt_version: str
+
+
+class GraphStore:
+    """관계도 생성 결과 저장소 (스레드 안전, gunicorn 워커끼리 공유)"""
+
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            path: SQLite 파일 경로
+            ttl: 저장한 결과를 사용할 시간 (초)
+            max_bytes: 압축된 결과 기준 최대 저장 크기
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+
+        self._db = SQLiteStore(path)
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS graphs ('
+                ' keyword TEXT NOT NULL, model TEXT NOT NULL, dataset_version TEXT NOT NULL,'
+                ' prompt_version TEXT NOT NULL, data BLOB NOT NULL, created_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL, size INTEGER NOT NULL,'
+                ' PRIMARY KEY (keyword, model, dataset_version, prompt_version))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS graphs_accessed_at ON graphs (accessed_at)')
+            self._db.track_size('graphs')
+
+    def get(self, keyword: str, model: str, dataset_version: str, prompt_version: str) -> Optional[StoredGraph]:
+        """저장된 결과 (없거나 TTL이 지났으면 None)"""
+        key = (keyword, model, dataset_version, prompt_version)
+        now = time.time()
+        with self._lock:
+            conn = self._db.connection()
+            row = conn.execute(
+                'SELECT data, created_at FROM graphs'
+                ' WHERE keyword = ? AND model = ? AND dataset_version = ? AND prompt_version = ?',
+                key,
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            if now - row[1] >= self.ttl:
+                conn.execute(
+                    'DELETE FROM graphs WHERE keyword = ? AND model = ? AND dataset_version = ? AND prompt_version = ?',
+                    key,
+                )
+                self._stats['expired'] += 1
+                return None
+            conn.execute(
+                'UPDATE graphs SET accessed_at = ?'
+                ' WHERE keyword = ? AND model = ? AND dataset_version = ? AND prompt_version = ?',
+                (now,) + key,
+            )
+            self._stats['hits'] += 1
+
+        result = json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        return StoredGraph(result, row[1], dataset_version, prompt_version)
+
+    def put(self, keyword: str, model: str, dataset_version: str, prompt_version: str, result: Dict[str, Any]):
+        """결과 저장 후 크기가 넘으면 LRU 삭제"""
+        data = zlib.compress(json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+        now = time.time()
+        with self._lock:
+            self._db.connection().execute(
+                'INSERT OR REPLACE INTO graphs'
+                ' (keyword, model, dataset_version, prompt_version, data, created_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (keyword, model, dataset_version, prompt_version, data, now, now, len(data)),
+            )
+            self._stats['stores'] += 1
+        evicted = self._db.evict_lru('graphs', self.max_bytes, self._lock)
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += evicted
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """최근에 사용한 순서로 저장된 관계도 목록 (결과 본문 제외)"""
+        with self._lock:
+            rows = self._db.connection().execute(
+                'SELECT keyword, model, dataset_version, prompt_version, created_at, accessed_at, size'
+                ' FROM graphs ORDER BY accessed_at DESC LIMIT ?',
+                (limit,),
+            ).fetchall()
+        columns = ('keyword', 'model', 'dataset_version', 'prompt_version', 'created_at', 'accessed_at', 'size')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """hit/miss 카운터와 현재 저장 크기"""
+        with self._lock:
+            count = self._db.connection().execute('SELECT COUNT(*) FROM graphs').fetchone()[0]
+            total = self._db.total_bytes('graphs')
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses'] + stats['expired']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['entries'] = count
+        stats['bytes'] = total
+        stats['ttl'] = self.ttl
+        stats['max_bytes'] = self.max_bytes
+        return stats
@@ -0,0 +1,325 @@
+"""나무위키 HTML 단일 패스 추출 모듈
+
+BeautifulSoup로 트리 전체를 만든 뒤 get_text / find_parent를 반복하는 대신,
+html.parser 토크나이저 이벤트를 한 번만 훑으면서 제목, 본문 텍스트, 이미지 후보를 함께 모은다.
+
+결과는 namuwiki_web의 BeautifulSoup('html.parser') 경로와 같도록 BeautifulSoup의 트리 규칙을 따른다.
+- 닫는 태그는 가장 가까운 같은 이름의 열린 태그까지 닫음 (없으면 무시)
+- img, br 같은 빈 요소는 바로 닫음
+- script/style/template/rt/rp 안의 문자열은 해당 태그 자신이 아니면 텍스트에서 제외
+- 주석, 선언, 처리 명령은 텍스트에서 제외하지만 문자열 경계가 됨
+"""
+from html.parser import HTMLParser
+from typing import Optional, Dict, List, Tuple
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+
+# BeautifulSoup(html.parser)와 같은 태그 분류
+EMPTY_ELEMENT_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS or HTMLTreeBuilder.empty_element_tags)
+STRING_CONTAINER_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+
+# 나무위키 이미지 서버 도메인 / 제외할 이미지 (로고, 아이콘 등)
+NAMUWIKI_IMAGE_HOSTS = ('namu.wiki', 'namu.la', 'i.namu.wiki')
+EXCLUDED_IMAGE_KEYWORDS = ('logo', 'icon', 'button', 'spacer')
+
+# 이미지 주변 텍스트 최대 길이
+IMAGE_CONTEXT_LENGTH = 200
+
+
+def decode_html(content: bytes) -> str:
+    """BeautifulSoup와 같은 방식으로 인코딩 감지 (BOM, meta charset, utf-8, windows-1252 순)"""
+    if isinstance(content, str):
+        return content
+    return UnicodeDammit(content, is_html=True).unicode_markup or ''
+
+
+def normalize_image_url(src: str) -> Optional[str]:
+    """
+    나무위키 이미지 src를 절대 URL로 변환 (나무위키 이미지가 아니거나 로고/아이콘이면 None)
+
+    Args:
+        src: img 태그의 src (또는 data-src, data-original)
+
+    Returns:
+        절대 URL 또는 None
+    """
+    if not any(host in src for host in NAMUWIKI_IMAGE_HOSTS):
+        return None
+
+    # 상대 경로인 경우 절대 경로로 변환
+    if src.startswith('//'):
+        full_url = 'https:' + src
+    elif src.startswith('http://') or src.startswith('https://'):
+        full_url = src
+    else:
+        full_url = 'https://namu.wiki' + src
+
+    lowered = full_url.lower()
+    if any(exclude in lowered for exclude in EXCLUDED_IMAGE_KEYWORDS):
+        return None
+    return full_url
+
+
+def _numeric_character_reference(name: str) -> Tuple[str, str]:
+    """숫자 문자 참조(&#...;)를 (문자, 뒤에 붙은 일반 텍스트)로 변환 (HTML 명세 규칙)"""
+    base = 10
+    digits = '0123456789'
+    if name[:1] in ('x', 'X'):
+        name = name[1:]
+        base = 16
+        digits = '0123456789abcdef'
+
+    end = 0
+    while end < len(name) and name[end] in digits:
+        end += 1
+    if end == 0:
+        return '', name
+    number = int(name[:end], base)
+    extra = name[end:]
+
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return '\ufffd', extra
+    if 0x80 <= number <= 0x9F:
+        # windows-1252 코드로 잘못 쓴 참조 (&#150; -> '–')
+        try:
+            return bytes([number]).decode('windows-1252'), extra
+        except UnicodeDecodeError:
+            pass
+    return chr(number), extra
+
+
+class _Frame:
+    """열린 태그 하나 (텍스트 수집 범위와 자식 이미지 기록)"""
+    __slots__ = ('name', 'kind', 'start', 'images')
+
+    def __init__(self, name: str, start: int):
+        self.name = name
+        # 이 태그의 get_text()가 모으는 문자열 종류 (None: 일반 텍스트)
+        self.kind = name if name in STRING_CONTAINER_TAGS else None
+        self.start = start
+        self.images = None
+
+
+class NamuwikiPageExtractor(HTMLParser):
+    """
+    나무위키 페이지를 한 번 훑어 제목, 본문(#app) 텍스트, 이미지 후보를 추출
+
+    사용법:
+        extractor = NamuwikiPageExtractor()
+        extractor.feed(html_text)
+        extractor.close()
+        extractor.title, extractor.text, extractor.image_urls
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self._stack: List[_Frame] = []
+        self._open_counts: Dict[str, int] = {}
+        self._containers: List[_Frame] = []
+        # 이미 닫은 빈 요소의 이름별 개수 (뒤따르는 </br> 같은 닫는 태그는 무시)
+        self._already_closed_empty: Dict[str, int] = {}
+        self._pending: List[str] = []
+
+        # 첫 번째 h1
+        self._h1_frame: Optional[_Frame] = None
+        self._h1_done = False
+        self._h1_parts: List[str] = []
+
+        # 첫 번째 id="app" 요소 (본문)
+        self._app_frame: Optional[_Frame] = None
+        self._app_kind: Optional[str] = None
+        self._app_done = False
+        # 본문 안의 (strip된 문자열, 종류) — 본문 텍스트와 이미지 주변 텍스트가 함께 사용
+        self._app_strings: List[Tuple[str, Optional[str]]] = []
+
+        self.found_title = False
+        self.found_content = False
+        self.image_urls: List[Dict[str, str]] = []
+
+    # ---- 결과 ----
+
+    @property
+    def title(self) -> str:
+        """첫 번째 h1의 텍스트 (get_text(strip=True)와 같음)"""
+        return ''.join(self._h1_parts)
+
+    @property
+    def text(self) -> str:
+        """본문 텍스트 (get_text(separator='\\n', strip=True)와 같음)"""
+        return '\n'.join(s for s, k in self._app_strings if k == self._app_kind)
+
+    # ---- 문자열 처리 ----
+
+    def _flush(self, cdata: bool = False):
+        """모아둔 텍스트 조각을 문자열 하나로 확정 (BeautifulSoup.endData에 해당)"""
+        if not self._pending:
+            return
+        stripped = ''.join(self._pending).strip()
+        self._pending = []
+        if not stripped:
+            return
+        # 가장 안쪽의 script/style/template/rt/rp 태그가 문자열 종류를 결정 (CDATA는 항상 일반 텍스트)
+        kind = self._containers[-1].name if self._containers and not cdata else None
+
+        if self._h1_frame is not None and kind is None:
+            self._h1_parts.append(stripped)
+        if self._app_frame is not None:
+            self._app_strings.append((stripped, kind))
+
+    def _joined_prefix(self, frame: _Frame, separator: str, limit: int) -> str:
+        """frame 안의 문자열을 separator로 이어 앞 limit자만 반환 (필요한 만큼만 이어붙임)"""
+        parts = []
+        length = 0
+        for s, k in self._app_strings[frame.start:]:
+            if k != frame.kind:
+                continue
+            if parts:
+                length += len(separator)
+            parts.append(s)
+            length += len(s)
+            if length >= limit:
+                break
+        return separator.join(parts)[:limit]
+
+    # ---- 태그 스택 ----
+
+    def _push(self, name: str) -> _Frame:
+        frame = _Frame(name, len(self._app_strings))
+        self._stack.append(frame)
+        self._open_counts[name] = self._open_counts.get(name, 0) + 1
+        if frame.kind is not None:
+            self._containers.append(frame)
+        return frame
+
+    def _pop(self):
+        frame = self._stack.pop()
+        self._open_counts[frame.name] -= 1
+        if self._containers and self._containers[-1] is frame:
+            self._containers.pop()
+
+        if frame.images:
+            context = self._joined_prefix(frame, ' ', IMAGE_CONTEXT_LENGTH)
+            for image in frame.images:
+                image['context'] = context
+        if frame is self._h1_frame:
+            self._h1_frame = None
+            self._h1_done = True
+        if frame is self._app_frame:
+            self._app_frame = None
+            self._app_done = True
+
+    def _pop_to(self, name: str):
+        """가장 가까운 name 태그까지 닫기 (열려 있지 않으면 무시)"""
+        if not self._open_counts.get(name):
+            return
+        while self._stack:
+            frame_name = self._stack[-1].name
+            self._pop()
+            if frame_name == name:
+                break
+
+    # ---- html.parser 이벤트 ----
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self._flush()
+        frame = self._push(tag)
+
+        if tag == 'h1' and not self._h1_done and self._h1_frame is None:
+            self._h1_frame = frame
+            self.found_title = True
+
+        if self._app_frame is not None:
+            if tag == 'img':
+                self._handle_image(attrs)
+        elif not self._app_done and attrs and dict(attrs).get('id') == 'app':
+            # 같은 속성이 여러 번 나오면 마지막 값을 사용 (BeautifulSoup와 같음)
+            self._app_frame = frame
+            self._app_kind = frame.kind
+            self.found_content = True
+
+        if handle_empty_element and tag in EMPTY_ELEMENT_TAGS:
+            self._pop_to(tag)
+            self._already_closed_empty[tag] = self._already_closed_empty.get(tag, 0) + 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and self._already_closed_empty.get(tag):
+            self._already_closed_empty[tag] -= 1
+            return
+        self._flush()
+        self._pop_to(tag)
+
+    def _handle_image(self, attrs):
+        values = {key: ('' if value is None else value) for key, value in attrs}
+        src = values.get('src') or values.get('data-src') or values.get('data-original')
+        if not src:
+            return
+        full_url = normalize_image_url(src)
+        if full_url is None:
+            return
+
+        image = {'url': full_url, 'alt': values.get('alt', ''), 'context': ''}
+        self.image_urls.append(image)
+        # 주변 텍스트는 부모 태그가 닫힐 때 채움 (img 뒤의 텍스트도 포함)
+        parent = self._stack[-2]
+        if parent.images is None:
+            parent.images = []
+        parent.images.append(image)
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_charref(self, name):
+        character, extra = _numeric_character_reference(name)
+        self._pending.append(character)
+        self._pending.append(extra)
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self._pending.append(character if character is not None else f'&{name}')
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith('CDATA['):
+            self._pending.append(data[len('CDATA['):])
+            self._flush(cdata=True)
+
+    def close(self):
+        super().close()
+        self._flush()
+        while self._stack:
+            self._pop()
+
+
+def extract_namuwiki_page(content) -> Optional[Tuple[Optional[str], str, List[Dict[str, str]]]]:
+    """
+    나무위키 HTML에서 (제목, 본문 텍스트, 이미지 URL 리스트)를 한 번에 추출
+
+    Args:
+        content: HTML (bytes 또는 str)
+
+    Returns:
+        (title, text, image_urls) 또는 None (본문(#app)이 없으면)
+        - title: 첫 번째 h1 텍스트 (h1이 없으면 None)
+        - image_urls: [{'url', 'alt', 'context'}, ...]
+    """
+    extractor = NamuwikiPageExtractor()
+    extractor.feed(decode_html(content))
+    extractor.close()
+
+    if not extractor.found_content:
+        return None
+    return (extractor.title if extractor.found_title else None), extractor.text, extractor.image_urls
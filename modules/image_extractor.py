@@ -1,53 +1,70 @@
 """이미지 추출 모듈"""
 import re
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any
+
+# 나무위키 이미지 URL, [[파일:...]] 링크 (미리 컴파일)
+# 두 패턴을 |로 합치면 re가 고정 접두어('https://', '[[파일:')로 건너뛰지 못해 오히려 느려서 따로 찾는다
+_URL_PATTERN = re.compile(r'https://(?P<host>[^/\s]*namu[^/\s]*)/[^\s\)\]\>\"\'\n\r\t]+')
+_FILE_PATTERN = re.compile(r'\[\[파일:(?P<file>[^\|\]]+)(?:\|[^\]]+)?\]\]')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg')
+# 같은 문서 안에서 먼저 보여줄 이미지 서버 순서 (나머지 나무위키 주소는 그 뒤)
+_HOST_PRIORITY = {'i.namu.wiki': 0, 'w.namu.la': 1}
 
 
 def extract_image_src(text: str) -> Optional[str]:
     """나무위키 문서에서 첫 번째 이미지 파일의 src 추출"""
-    file_pattern = r'\[\[파일:([^\|\]]+)(?:\|[^\]]+)?\]\]'
-    matches = re.findall(file_pattern, text)
-    if matches:
-        return matches[0].strip()
+    match = _FILE_PATTERN.search(text)
+    if match:
+        return match.group('file').strip()
     return None
 
 
-def extract_all_image_urls(text: str) -> List[Dict[str, str]]:
+def _is_image_url(url: str) -> bool:
+    lower = url.lower()
+    # 일반적인 이미지 확장자, 또는 webp 같은 확장자가 URL 중간에 있을 수도 있음
+    return lower.endswith(IMAGE_EXTENSIONS) or '.webp' in lower or '/i/' in url
+
+
+def scan_images(text: str) -> List[Dict[str, Any]]:
     """
-    나무위키 문서 텍스트에서 모든 이미지 URL 추출
-    
+    문서 텍스트에서 이미지 URL과 파일 링크를 찾음 (패턴마다 한 번씩 훑고 중복 제거)
+
     Args:
         text: 나무위키 문서 텍스트
-    
+
     Returns:
-        이미지 URL 리스트 (각각 {'url': URL, 'alt': alt_text} 형태)
+        [{'url', 'alt', 'offset'}, ...] - 이미지 서버 주소(i.namu.wiki, w.namu.la, 그 외 순)를
+        문서 순서대로 먼저, 그 다음 파일 링크('파일:이름')를 문서 순서대로
     """
-    image_urls = []
-    
-    # 1. 실제 이미지 URL 패턴 찾기 (나무위키 이미지 서버)
-    url_patterns = [
-        r'https://i\.namu\.wiki/i/[^\s\)\]\>\"\'\n\r\t]+',
-        r'https://w\.namu\.la/[^\s\)\]\>\"\'\n\r\t]+',
-        r'https://[^/]*namu[^/]*/[^\s\)\]\>\"\'\n\r\t]+',
-    ]
-    
-    for pattern in url_patterns:
-        matches = re.findall(pattern, text)
-        for url in matches:
-            # 일반적인 이미지 확장자 확인
-            if any(url.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']):
-                image_urls.append({'url': url.strip(), 'alt': ''})
-            # 또는 webp 같은 확장자가 URL 중간에 있을 수도 있음
-            elif '.webp' in url.lower() or '/i/' in url:
-                image_urls.append({'url': url.strip(), 'alt': ''})
-    
-    # 2. 파일 링크 형식 찾기 ([[파일:...]])
-    file_pattern = r'\[\[파일:([^\|\]]+)(?:\|[^\]]+)?\]\]'
-    matches = re.findall(file_pattern, text)
-    for match in matches:
-        filename = match.strip()
+    urls = []
+    seen = set()
+    for match in _URL_PATTERN.finditer(text):
+        url = match.group(0).strip()
+        if url in seen or not _is_image_url(url):
+            continue
+        seen.add(url)
+        urls.append((_HOST_PRIORITY.get(match.group('host'), 2), match.start(), url))
+    files = []
+    for match in _FILE_PATTERN.finditer(text):
         # 파일명을 URL로 변환하지 않고 그대로 저장 (AI가 참고용으로 사용)
-        image_urls.append({'url': f'파일:{filename}', 'alt': filename})
-    
-    return image_urls
+        filename = match.group('file').strip()
+        key = f'파일:{filename}'
+        if key in seen:
+            continue
+        seen.add(key)
+        files.append({'url': key, 'alt': filename, 'offset': match.start()})
+    urls.sort()
+    return [{'url': url, 'alt': '', 'offset': offset} for _, offset, url in urls] + files
 
+
+def extract_all_image_urls(text: str) -> List[Dict[str, str]]:
+    """
+    나무위키 문서 텍스트에서 모든 이미지 URL 추출
+
+    Args:
+        text: 나무위키 문서 텍스트
+
+    Returns:
+        이미지 URL 리스트 (각각 {'url': URL, 'alt': alt_text} 형태, 중복 제거)
+    """
+    return [{'url': image['url'], 'alt': image['alt']} for image in scan_images(text)]
@@ -0,0 +1,167 @@
+"""데이터셋 이미지 인덱스 모듈
+
+데이터셋 전체를 한 번 훑어 문서별 이미지 URL/파일 링크와 본문 안 위치(offset)를 SQLite에 저장한다.
+요청마다 문서 본문(수백 KB)을 정규식으로 다시 훑는 대신 문서 인덱스로 조회한다.
+- 선택 사항: IMAGE_INDEX_PATH를 지정했을 때만 만들고 사용 (없으면 기존처럼 본문을 훑음)
+- 데이터셋 버전이 다르면 다시 만듦 (임시 파일에 만든 뒤 교체하므로 만드는 중에도 기존 파일은 그대로)
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+from .image_extractor import extract_all_image_urls, scan_images
+from .sqlite_store import SQLiteStore
+
+
+class ImageIndex:
+    """문서 인덱스 -> 이미지 목록 조회 (읽기 전용, 스레드 안전)"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: build_image_index로 만든 SQLite 파일 경로
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'images': 0}
+        self._db = SQLiteStore(path, read_only=True)
+        with self._lock:
+            rows = self._db.connection().execute('SELECT key, value FROM meta').fetchall()
+        self.meta = dict(rows)
+
+    def get(self, doc_index: int) -> List[Dict[str, Any]]:
+        """
+        문서의 이미지 목록 (image_extractor.scan_images와 같은 순서)
+
+        Returns:
+            [{'url', 'alt', 'offset'}, ...] (이미지가 없으면 빈 리스트)
+        """
+        with self._lock:
+            rows = self._db.connection().execute(
+                'SELECT url, alt, offset FROM images WHERE doc_index = ? ORDER BY position', (doc_index,)
+            ).fetchall()
+            self._stats['lookups'] += 1
+            self._stats['images'] += len(rows)
+        return [{'url': url, 'alt': alt, 'offset': offset} for url, alt, offset in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['documents'] = int(self.meta.get('documents', 0))
+        stats['dataset_version'] = self.meta.get('dataset_version')
+        return stats
+
+
+def build_image_index(data, path: str, dataset_version: str, batch_size: int = 5000) -> ImageIndex:
+    """
+    데이터셋 전체 문서의 이미지를 훑어 인덱스 파일 생성
+
+    Args:
+        data: 데이터셋 데이터 (각 항목에 text)
+        path: 만들 SQLite 파일 경로 (기존 파일은 완성된 뒤 교체)
+        dataset_version: 데이터셋 버전 (열 때 확인)
+        batch_size: 한 번에 넣을 문서 수
+
+    Returns:
+        만든 ImageIndex
+    """
+    print(f"\n이미지 인덱스 생성 중: {path}")
+    start_time = time.time()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute(
+            'CREATE TABLE images ('
+            ' doc_index INTEGER NOT NULL, position INTEGER NOT NULL, offset INTEGER NOT NULL,'
+            ' url TEXT NOT NULL, alt TEXT NOT NULL, PRIMARY KEY (doc_index, position)) WITHOUT ROWID'
+        )
+        rows = []
+        documents = 0
+        image_count = 0
+        for doc_index, item in enumerate(data):
+            images = scan_images(item.get('text') or '')
+            if images:
+                documents += 1
+                image_count += len(images)
+                rows.extend(
+                    (doc_index, position, image['offset'], image['url'], image['alt'])
+                    for position, image in enumerate(images)
+                )
+            if (doc_index + 1) % batch_size == 0:
+                conn.executemany('INSERT INTO images VALUES (?, ?, ?, ?, ?)', rows)
+                rows = []
+        conn.executemany('INSERT INTO images VALUES (?, ?, ?, ?, ?)', rows)
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('dataset_version', dataset_version),
+            ('num_rows', str(len(data))),
+            ('documents', str(documents)),
+            ('images', str(image_count)),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+    elapsed = time.time() - start_time
+    print(f"✅ 이미지 인덱스 생성 완료 (소요 시간: {elapsed:.2f}초, 이미지가 있는 문서 {documents}개, 이미지 {image_count}개)")
+    return ImageIndex(path)
+
+
+def load_image_index(data, path: str, dataset_version: str, rebuild: bool = True) -> Optional[ImageIndex]:
+    """
+    이미지 인덱스 열기 (없거나 데이터셋 버전이 다르면 rebuild=True일 때 새로 만듦)
+
+    Returns:
+        ImageIndex (사용할 수 없으면 None)
+    """
+    if os.path.exists(path):
+        try:
+            index = ImageIndex(path)
+            if index.meta.get('dataset_version') == dataset_version:
+                print(f"✅ 이미지 인덱스 로드 완료: {path} (이미지가 있는 문서 {index.meta.get('documents')}개)")
+                return index
+            print(f"⚠️  이미지 인덱스의 데이터셋 버전이 다릅니다 (인덱스: {index.meta.get('dataset_version')}, 데이터셋: {dataset_version})")
+        except sqlite3.Error as e:
+            print(f"⚠️  이미지 인덱스를 열 수 없습니다: {e}")
+    if not rebuild:
+        return None
+    return build_image_index(data, path, dataset_version)
+
+
+_image_index: Optional[ImageIndex] = None
+
+
+def configure_image_index(index: Optional[ImageIndex]):
+    """document_image_urls가 사용할 이미지 인덱스 설정 (None이면 본문을 훑음)"""
+    global _image_index
+    _image_index = index
+
+
+def get_image_index_stats() -> Optional[Dict[str, Any]]:
+    return _image_index.stats() if _image_index else None
+
+
+def document_image_urls(text: str, doc_index: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    문서의 이미지 URL 리스트 ({'url', 'alt'}, extract_all_image_urls와 같은 형식)
+
+    데이터셋 문서(doc_index가 있음)이고 이미지 인덱스가 설정되어 있으면 조회하고, 아니면 본문을 훑는다.
+    """
+    index = _image_index
+    if index is not None and doc_index is not None:
+        try:
+            return [{'url': image['url'], 'alt': image['alt']} for image in index.get(doc_index)]
+        except sqlite3.Error as e:
+            print(f"⚠️  이미지 인덱스 조회 실패: {e} (본문에서 찾음)")
+    return extract_all_image_urls(text)
@@ -0,0 +1,243 @@
+"""관계도 인물 이미지 프록시 모듈
+
+관계도 노드 이미지를 브라우저가 i.namu.wiki에서 원본 크기로 직접 받는 대신
+서버가 한 번 받아 노드 크기의 썸네일로 줄여 SQLite에 저장하고 /img/<키>로 제공한다.
+- 키: 원본 URL의 해시 (키 -> 원본 URL도 저장해 워커가 달라도 찾을 수 있음)
+- Pillow가 설치되어 있으면 썸네일(WebP)로 줄이고, 없으면 원본을 그대로 저장
+- 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 썸네일부터 삭제 (LRU)
+- 나무위키 이미지 서버 주소만 프록시 (그 외 주소는 그대로 둠)
+"""
+import hashlib
+import io
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
+
+from .single_flight import get_single_flight
+from .sqlite_store import SQLiteStore
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow가 없으면 원본 이미지를 그대로 저장
+    Image = None
+
+PROXY_PATH_PREFIX = '/img/'
+ALLOWED_HOST_SUFFIXES = ('namu.wiki', 'namu.la')
+# 원본 이미지 최대 크기 (넘으면 프록시하지 않고 원본 주소로 보냄)
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_fetch_flight = get_single_flight('image')
+
+
+def image_key(url: str) -> str:
+    """원본 URL -> 프록시 키 (sha256 앞 32자)"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+
+
+def is_proxyable_url(url: Optional[str]) -> bool:
+    """프록시할 수 있는 이미지 주소인지 (https + 나무위키 이미지 서버)"""
+    if not url or not url.startswith('https://'):
+        return False
+    host = (urlparse(url).hostname or '').lower()
+    return any(host == suffix or host.endswith('.' + suffix) for suffix in ALLOWED_HOST_SUFFIXES)
+
+
+def make_thumbnail(data: bytes, size: int) -> Optional[Tuple[bytes, str]]:
+    """
+    이미지를 size x size 안에 들어가도록 줄인 WebP (Pillow가 없거나 읽을 수 없는 형식이면 None)
+
+    Returns:
+        (썸네일 바이트, content type) 또는 None
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((size, size))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            output = io.BytesIO()
+            image.save(output, format='WEBP', quality=80, method=4)
+    except Exception:  # SVG 등 Pillow가 읽을 수 없는 형식
+        return None
+    return output.getvalue(), 'image/webp'
+
+
+class ImageProxyCache:
+    """원본 URL 등록과 썸네일 디스크 캐시 (스레드 안전)"""
+
+    def __init__(self, path: str, max_bytes: int = 128 * 1024 * 1024, thumbnail_size: int = 100, timeout: float = 10):
+        """
+        Args:
+            path: SQLite 파일 경로
+            max_bytes: 저장한 이미지 기준 최대 캐시 크기
+            thumbnail_size: 썸네일 최대 가로/세로 (px, 노드 이미지 50px의 2배)
+            timeout: 원본 이미지 요청 타임아웃 (초)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'fetches': 0, 'fetch_errors': 0, 'evictions': 0,
+                       'source_bytes': 0, 'stored_bytes': 0}
+
+        self._db = SQLiteStore(path)
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute('CREATE TABLE IF NOT EXISTS sources (key TEXT PRIMARY KEY, url TEXT NOT NULL, created_at REAL NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS thumbnails ('
+                ' key TEXT PRIMARY KEY, data BLOB NOT NULL, content_type TEXT NOT NULL,'
+                ' fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS thumbnails_accessed_at ON thumbnails (accessed_at)')
+            self._db.track_size('thumbnails')
+
+    def _thumbnail_key(self, key: str) -> str:
+        # 썸네일 크기를 바꾸면 다시 만들도록
+        return f'{key}:{self.thumbnail_size}'
+
+    def etag(self, key: str) -> str:
+        return f'"{self._thumbnail_key(key)}"'
+
+    def register(self, url: str) -> str:
+        """원본 URL 등록 후 프록시 키 반환"""
+        key = image_key(url)
+        with self._lock:
+            self._db.connection().execute(
+                'INSERT OR IGNORE INTO sources (key, url, created_at) VALUES (?, ?, ?)', (key, url, time.time())
+            )
+        return key
+
+    def source_url(self, key: str) -> Optional[str]:
+        """프록시 키의 원본 URL (등록되지 않은 키면 None)"""
+        with self._lock:
+            row = self._db.connection().execute('SELECT url FROM sources WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """저장된 이미지 (data, content type) 또는 None"""
+        thumbnail_key = self._thumbnail_key(key)
+        with self._lock:
+            conn = self._db.connection()
+            row = conn.execute('SELECT data, content_type FROM thumbnails WHERE key = ?', (thumbnail_key,)).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            conn.execute('UPDATE thumbnails SET accessed_at = ? WHERE key = ?', (time.time(), thumbnail_key))
+            self._stats['hits'] += 1
+        return bytes(row[0]), row[1]
+
+    def put(self, key: str, data: bytes, content_type: str):
+        now = time.time()
+        with self._lock:
+            self._db.connection().execute(
+                'INSERT OR REPLACE INTO thumbnails (key, data, content_type, fetched_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (self._thumbnail_key(key), sqlite3.Binary(data), content_type, now, now, len(data)),
+            )
+        evicted = self._db.evict_lru('thumbnails', self.max_bytes, self._lock)
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += evicted
+
+    def fetch(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """
+        프록시 키의 이미지 (저장된 것이 없으면 원본을 받아 썸네일로 저장)
+
+        같은 키를 동시에 요청하면 원본은 한 번만 받는다.
+
+        Returns:
+            (data, content type), 등록되지 않았거나 원본을 받지 못하면 None
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        result, _ = _fetch_flight.do((self.path, self._thumbnail_key(key)), self._fetch_and_store, key)
+        return result
+
+    def _fetch_and_store(self, key: str) -> Optional[Tuple[bytes, str]]:
+        # 관계도 생성 모듈이 크롤링 모듈(데이터셋 의존)을 불러오지 않도록 여기서 import
+        from .namuwiki_web import get_http_session
+
+        url = self.source_url(key)
+        if url is None:
+            return None
+        start_time = time.time()
+        try:
+            with get_http_session().get(
+                url, headers={'Referer': 'https://namu.wiki/'}, timeout=self.timeout, stream=True
+            ) as response:
+                response.raise_for_status()
+                data = response.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+                content_type = response.headers.get('Content-Type', 'application/octet-stream').split(';')[0]
+            if len(data) > MAX_SOURCE_BYTES:
+                raise ValueError(f'원본 이미지가 너무 큼 ({MAX_SOURCE_BYTES // 1024 // 1024}MB 초과)')
+        except Exception as e:
+            with self._lock:
+                self._stats['fetch_errors'] += 1
+            print(f"  ⚠️  이미지를 가져올 수 없습니다: {url[:80]} ({e})")
+            return None
+
+        thumbnail = make_thumbnail(data, self.thumbnail_size)
+        stored, stored_type = thumbnail if thumbnail and len(thumbnail[0]) < len(data) else (data, content_type)
+        self.put(key, stored, stored_type)
+        with self._lock:
+            self._stats['fetches'] += 1
+            self._stats['source_bytes'] += len(data)
+            self._stats['stored_bytes'] += len(stored)
+        print(f"  🖼️  이미지 캐시 저장: {len(data) / 1024:.1f}KB -> {len(stored) / 1024:.1f}KB ({time.time() - start_time:.2f}초)")
+        return stored, stored_type
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            conn = self._db.connection()
+            entries = conn.execute('SELECT COUNT(*) FROM thumbnails').fetchone()[0]
+            size = self._db.total_bytes('thumbnails')
+            sources = conn.execute('SELECT COUNT(*) FROM sources').fetchone()[0]
+        stats.update(entries=entries, bytes=size, sources=sources, thumbnails=Image is not None)
+        stats['saved_ratio'] = round(1 - stats['stored_bytes'] / stats['source_bytes'], 3) if stats['source_bytes'] else 0.0
+        return stats
+
+
+_image_proxy: Optional[ImageProxyCache] = None
+
+
+def configure_image_proxy(path: Optional[str], max_bytes: int = 128 * 1024 * 1024, thumbnail_size: int = 100):
+    """이미지 프록시 설정 (path가 None이면 사용 안 함, 노드 이미지는 원본 주소 그대로)"""
+    global _image_proxy
+    _image_proxy = ImageProxyCache(path, max_bytes=max_bytes, thumbnail_size=thumbnail_size) if path else None
+
+
+def get_image_proxy() -> Optional[ImageProxyCache]:
+    return _image_proxy
+
+
+def get_image_proxy_stats() -> Optional[Dict[str, Any]]:
+    return _image_proxy.stats() if _image_proxy else None
+
+
+def is_valid_image_key(key: str) -> bool:
+    return bool(_KEY_PATTERN.match(key))
+
+
+def proxy_image_url(url: Optional[str]) -> Optional[str]:
+    """
+    노드 이미지 주소를 프록시 주소(/img/<키>)로 바꿈
+
+    프록시를 사용하지 않거나 나무위키 이미지 서버 주소가 아니면 그대로 반환
+    """
+    proxy = _image_proxy
+    if proxy is None or not is_proxyable_url(url):
+        return url
+    try:
+        return PROXY_PATH_PREFIX + proxy.register(url)
+    except sqlite3.Error as e:
+        print(f"⚠️  이미지 프록시 등록 실패: {e} (원본 주소 사용)")
+        return url
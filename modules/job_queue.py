@@ -0,0 +1,553 @@
+"""백그라운드 작업 큐 모듈
+
+오래 걸리는 관계도 생성을 요청 스레드 밖에서 실행한다.
+- 제출하면 작업 id를 바로 반환하고, 제한된 수의 워커 스레드가 순서대로 실행
+- 같은 키(작품명 + 모델 + 옵션)의 작업이 대기/실행 중이면 새로 만들지 않고 그 작업을 반환 (coalescing)
+- 진행 이벤트와 결과는 저장소(backend)에 기록되어 폴링/구독으로 조회
+- 저장소는 교체 가능: 메모리, SQLite 파일 (재시작해도 대기 작업이 남고, 워커 프로세스끼리 공유)
+- 실행 중인 작업은 진행 이벤트마다 임대 시간(lease)을 갱신하며, 프로세스가 죽어 임대가 끝나면 다른 워커가 다시 실행
+"""
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+from .sqlite_store import SQLiteStore
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# 저장하지 않는 진행 이벤트 (AI 응답 조각은 너무 많음)
+UNRECORDED_EVENTS = ('graph_delta',)
+
+
+def _new_job(key: str, params: Dict[str, Any], now: float) -> Dict[str, Any]:
+    return {
+        'id': uuid.uuid4().hex,
+        'key': key,
+        'params': params,
+        'status': 'queued',
+        'result': None,
+        'error': None,
+        'error_status': None,
+        'submissions': 1,
+        'attempts': 0,
+        'created_at': now,
+        'started_at': None,
+        'finished_at': None,
+        'lease_until': None,
+        'worker': None,
+    }
+
+
+class JobBackend:
+    """작업 저장소 인터페이스 (모든 메서드는 스레드 안전해야 함)"""
+    name = 'backend'
+
+    def submit(self, key: str, params: Dict[str, Any], now: float) -> Tuple[Dict[str, Any], bool]:
+        """같은 키의 대기/실행 중 작업이 있으면 (그 작업, True), 없으면 새로 만들어 (작업, False)"""
+        raise NotImplementedError
+
+    def claim(self, worker: str, lease: float, max_attempts: int, now: float) -> Optional[Dict[str, Any]]:
+        """가장 오래된 대기 작업(또는 임대가 끝난 실행 중 작업)을 실행 상태로 바꿔 반환"""
+        raise NotImplementedError
+
+    def add_event(self, job_id: str, worker: str, event: str, data: Any, lease_until: float):
+        """진행 이벤트 추가 (임대 시간도 갱신). worker가 실행 중인 작업이 아니면 무시"""
+        raise NotImplementedError
+
+    def renew_lease(self, job_id: str, worker: str, lease_until: float):
+        """이벤트를 기록하지 않고 실행 중 작업의 임대 시간만 갱신. worker가 실행 중인 작업이 아니면 무시"""
+        raise NotImplementedError
+
+    def finish(
+        self, job_id: str, worker: str, status: str, result: Any, error: Optional[str],
+        error_status: Optional[int], now: float,
+    ) -> bool:
+        """
+        작업 결과 기록
+
+        임대가 끝나 다른 워커가 다시 가져간 작업이면(worker가 다르거나 이미 끝남) 무시하고 False
+        """
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """after번째 이후의 진행 이벤트 [{'seq', 'event', 'data'}, ...]"""
+        raise NotImplementedError
+
+    def purge(self, finished_before: float) -> int:
+        """finished_before 이전에 끝난 작업 삭제"""
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """상태별 작업 수"""
+        raise NotImplementedError
+
+
+class MemoryJobBackend(JobBackend):
+    """프로세스 메모리 저장소 (재시작하면 사라짐)"""
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+
+    def submit(self, key, params, now):
+        with self._lock:
+            for job in self._jobs.values():
+                if job['key'] == key and job['status'] in ACTIVE_STATUSES:
+                    job['submissions'] += 1
+                    return dict(job), True
+            job = _new_job(key, params, now)
+            self._jobs[job['id']] = job
+            self._events[job['id']] = []
+            return dict(job), False
+
+    def claim(self, worker, lease, max_attempts, now):
+        with self._lock:
+            # dict는 삽입 순서를 유지하므로 먼저 제출된 작업부터
+            for job in self._jobs.values():
+                expired = job['status'] == 'running' and job['lease_until'] < now
+                if job['status'] != 'queued' and not expired:
+                    continue
+                if job['attempts'] >= max_attempts:
+                    job.update(status='failed', error='작업이 반복해서 중단되었습니다.', error_status=500, finished_at=now)
+                    continue
+                job.update(
+                    status='running', worker=worker, started_at=now,
+                    lease_until=now + lease, attempts=job['attempts'] + 1,
+                )
+                # 다시 실행하는 작업은 이전 진행 이벤트를 지움
+                self._events[job['id']] = []
+                return dict(job)
+        return None
+
+    def _running_job(self, job_id, worker) -> Optional[Dict[str, Any]]:
+        """worker가 실행 중인 작업 (self._lock 안에서 호출)"""
+        job = self._jobs.get(job_id)
+        if job is None or job['worker'] != worker or job['status'] != 'running':
+            return None
+        return job
+
+    def add_event(self, job_id, worker, event, data, lease_until):
+        with self._lock:
+            job = self._running_job(job_id, worker)
+            if job is None:
+                return
+            events = self._events[job_id]
+            events.append({'seq': len(events) + 1, 'event': event, 'data': data})
+            job['lease_until'] = lease_until
+
+    def renew_lease(self, job_id, worker, lease_until):
+        with self._lock:
+            job = self._running_job(job_id, worker)
+            if job is not None:
+                job['lease_until'] = lease_until
+
+    def finish(self, job_id, worker, status, result, error, error_status, now):
+        with self._lock:
+            job = self._running_job(job_id, worker)
+            if job is None:
+                return False
+            job.update(status=status, result=result, error=error, error_status=error_status, finished_at=now)
+            return True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def events(self, job_id, after=0):
+        with self._lock:
+            return list(self._events.get(job_id, [])[after:])
+
+    def purge(self, finished_before):
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] is not None and job['finished_at'] < finished_before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+                del self._events[job_id]
+        return len(expired)
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+
+class SQLiteJobBackend(JobBackend):
+    """SQLite 파일 저장소 (재시작해도 유지, gunicorn 워커 프로세스끼리 공유)"""
+    name = 'sqlite'
+
+    _COLUMNS = (
+        'id', 'key', 'params', 'status', 'result', 'error', 'error_status', 'submissions', 'attempts',
+        'created_at', 'started_at', 'finished_at', 'lease_until', 'worker',
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = SQLiteStore(path)
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY, key TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,'
+                ' result BLOB, error TEXT, error_status INTEGER, submissions INTEGER NOT NULL,'
+                ' attempts INTEGER NOT NULL, created_at REAL NOT NULL, started_at REAL, finished_at REAL,'
+                ' lease_until REAL, worker TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS job_events ('
+                ' job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, data TEXT NOT NULL,'
+                ' PRIMARY KEY (job_id, seq))'
+            )
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job = dict(zip(self._COLUMNS, row))
+        job['params'] = json.loads(job['params'])
+        if job['result'] is not None:
+            job['result'] = json.loads(zlib.decompress(job['result']).decode('utf-8'))
+        return job
+
+    def _select(self, conn, where: str, args=()) -> Optional[Dict[str, Any]]:
+        row = conn.execute(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE {where}", args).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def submit(self, key, params, now):
+        with self._lock:
+            conn = self._db.connection()
+            # 다른 프로세스와 동시에 제출해도 같은 키의 작업이 하나만 생기도록 쓰기 잠금
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                job = self._select(
+                    conn, "key = ? AND status IN ('queued', 'running') ORDER BY created_at LIMIT 1", (key,)
+                )
+                if job is not None:
+                    conn.execute('UPDATE jobs SET submissions = submissions + 1 WHERE id = ?', (job['id'],))
+                    conn.execute('COMMIT')
+                    job['submissions'] += 1
+                    return job, True
+                job = _new_job(key, params, now)
+                conn.execute(
+                    f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({', '.join('?' * len(self._COLUMNS))})",
+                    tuple(
+                        json.dumps(job[column], ensure_ascii=False) if column == 'params' else job[column]
+                        for column in self._COLUMNS
+                    ),
+                )
+                conn.execute('COMMIT')
+                return job, False
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def claim(self, worker, lease, max_attempts, now):
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    job = self._select(
+                        conn,
+                        "status = 'queued' OR (status = 'running' AND lease_until < ?) ORDER BY created_at LIMIT 1",
+                        (now,),
+                    )
+                    if job is None:
+                        conn.execute('COMMIT')
+                        return None
+                    if job['attempts'] >= max_attempts:
+                        conn.execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, error_status = 500, finished_at = ? WHERE id = ?",
+                            ('작업이 반복해서 중단되었습니다.', now, job['id']),
+                        )
+                        continue
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, lease_until = ?,"
+                        ' attempts = attempts + 1 WHERE id = ?',
+                        (worker, now, now + lease, job['id']),
+                    )
+                    # 다시 실행하는 작업은 이전 진행 이벤트를 지움
+                    conn.execute('DELETE FROM job_events WHERE job_id = ?', (job['id'],))
+                    conn.execute('COMMIT')
+                    job.update(status='running', worker=worker, started_at=now,
+                               lease_until=now + lease, attempts=job['attempts'] + 1)
+                    return job
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def add_event(self, job_id, worker, event, data, lease_until):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                updated = conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                    (lease_until, job_id, worker),
+                ).rowcount
+                if not updated:
+                    conn.execute('COMMIT')
+                    return
+                seq = conn.execute(
+                    'SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?', (job_id,)
+                ).fetchone()[0]
+                conn.execute(
+                    'INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)',
+                    (job_id, seq, event, payload),
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def renew_lease(self, job_id, worker, lease_until):
+        with self._lock:
+            self._db.connection().execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (lease_until, job_id, worker),
+            )
+
+    def finish(self, job_id, worker, status, result, error, error_status, now):
+        data = None
+        if result is not None:
+            data = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'), 6)
+        with self._lock:
+            updated = self._db.connection().execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, error_status = ?, finished_at = ?'
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, data, error, error_status, now, job_id, worker),
+            ).rowcount
+        return updated > 0
+
+    def get(self, job_id):
+        with self._lock:
+            return self._select(self._db.connection(), 'id = ?', (job_id,))
+
+    def events(self, job_id, after=0):
+        with self._lock:
+            rows = self._db.connection().execute(
+                'SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq',
+                (job_id, after),
+            ).fetchall()
+        return [{'seq': seq, 'event': event, 'data': json.loads(data)} for seq, event, data in rows]
+
+    def purge(self, finished_before):
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'DELETE FROM job_events WHERE job_id IN'
+                    ' (SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?)',
+                    (finished_before,),
+                )
+                deleted = conn.execute(
+                    'DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (finished_before,)
+                ).rowcount
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return deleted
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.connection().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+
+class JobQueue:
+    """
+    제한된 수의 워커 스레드로 작업을 실행하는 큐
+
+    워커는 저장소에서 작업을 가져가므로(claim) 다른 프로세스가 제출한 작업이나
+    재시작 전에 남은 작업도 실행한다.
+    """
+
+    def __init__(
+        self,
+        backend: JobBackend,
+        runner: Callable[[Dict[str, Any], Callable[[str, Any], None]], Any],
+        max_workers: int = 2,
+        lease: float = 600,
+        max_attempts: int = 2,
+        result_ttl: float = 3600,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            backend: 작업 저장소
+            runner: 작업 실행 함수 runner(params, on_event) -> 결과 (JSON으로 저장 가능해야 함)
+                    예외의 status_code 속성이 있으면 error_status로 기록
+            max_workers: 프로세스당 동시에 실행할 작업 수
+            lease: 실행 중 작업의 임대 시간 (초, 진행 이벤트마다 갱신, 지나면 다른 워커가 다시 실행)
+            max_attempts: 중단된 작업을 다시 실행할 최대 횟수
+            result_ttl: 끝난 작업을 보관할 시간 (초)
+            poll_interval: 다른 프로세스가 제출한 작업을 확인하는 간격 (초)
+        """
+        self.backend = backend
+        self.runner = runner
+        self.max_workers = max_workers
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+
+        self._changed = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._workers_pid = None
+        self._busy = 0
+        self._last_purge = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'coalesced': 0, 'completed': 0, 'failed': 0}
+
+    def start(self):
+        """워커 스레드 시작 (프로세스마다 한 번, gunicorn fork 후 워커에서 다시 호출해도 됨)"""
+        with self._start_lock:
+            if self._workers_pid == os.getpid():
+                return
+            self._workers_pid = os.getpid()
+            self._busy = 0
+            # 같은 프로세스의 다른 큐와도 겹치지 않는 워커 이름 (결과 기록 시 작업을 가져간 워커인지 확인)
+            prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            for number in range(self.max_workers):
+                threading.Thread(
+                    target=self._worker_loop, args=(f"{prefix}-{number}",),
+                    name=f'job-worker-{number}', daemon=True,
+                ).start()
+        print(f"🧵 작업 큐 워커 {self.max_workers}개 시작 (저장소: {self.backend.name})")
+
+    def submit(self, key: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        작업 제출
+
+        Returns:
+            (작업, coalesced) - 같은 키의 작업이 대기/실행 중이면 그 작업과 True
+        """
+        self.start()
+        job, coalesced = self.backend.submit(key, params, time.time())
+        self._count('coalesced' if coalesced else 'submitted')
+        if not coalesced:
+            self._notify()
+        return job, coalesced
+
+    def get(self, job_id: str, after: int = 0) -> Optional[Dict[str, Any]]:
+        """작업 상태와 after번째 이후의 진행 이벤트 (없는 작업이면 None)"""
+        job = self.backend.get(job_id)
+        if job is not None:
+            job['events'] = self.backend.events(job_id, after)
+        return job
+
+    def wait(self, job_id: str, after: int = 0, timeout: float = 15) -> Optional[Dict[str, Any]]:
+        """새 진행 이벤트가 생기거나 작업이 끝날 때까지(최대 timeout초) 기다린 뒤 get과 같은 값을 반환"""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id, after)
+            if job is None or job['events'] or job['status'] not in ACTIVE_STATUSES:
+                return job
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return job
+            # 같은 프로세스의 변경은 바로 깨어나고, 다른 프로세스의 변경은 poll_interval마다 확인
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['busy_workers'] = self._busy
+        stats['workers'] = self.max_workers
+        stats['backend'] = self.backend.name
+        stats['jobs'] = self.backend.counts()
+        return stats
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _count(self, name: str, delta: int = 1):
+        with self._stats_lock:
+            self._stats[name] += delta
+
+    def _worker_loop(self, worker: str):
+        while True:
+            try:
+                self._purge_finished()
+                job = self.backend.claim(worker, self.lease, self.max_attempts, time.time())
+            except Exception as e:
+                print(f"⚠️  작업 큐 조회 실패: {e}")
+                job = None
+            if job is None:
+                with self._changed:
+                    self._changed.wait(self.poll_interval)
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]):
+        job_id = job['id']
+        worker = job['worker']
+        print(f"▶️  작업 시작: {job['key']} ({job_id}, {job['attempts']}번째 시도)")
+        with self._stats_lock:
+            self._busy += 1
+
+        renewed_at = [time.time()]
+
+        def on_event(event: str, data: Any):
+            now = time.time()
+            if event in UNRECORDED_EVENTS:
+                # 기록하지 않는 이벤트도 임대 시간은 갱신 (AI 응답 스트리밍이 lease보다 길어도 다른 워커가 다시 실행하지 않도록)
+                # 조각마다 쓰지 않도록 lease의 1/10 간격으로만
+                if now - renewed_at[0] >= self.lease / 10:
+                    renewed_at[0] = now
+                    self.backend.renew_lease(job_id, worker, now + self.lease)
+                return
+            renewed_at[0] = now
+            self.backend.add_event(job_id, worker, event, data, now + self.lease)
+            self._notify()
+
+        try:
+            try:
+                result = self.runner(job['params'], on_event)
+            except Exception as e:
+                recorded = self.backend.finish(
+                    job_id, worker, 'failed', None, str(e), getattr(e, 'status_code', 500), time.time()
+                )
+                if recorded:
+                    self._count('failed')
+                    print(f"❌ 작업 실패: {job['key']} ({job_id}): {e}")
+            else:
+                recorded = self.backend.finish(job_id, worker, 'done', result, None, None, time.time())
+                if recorded:
+                    self._count('completed')
+                    print(f"✅ 작업 완료: {job['key']} ({job_id})")
+            if not recorded:
+                # 임대가 끝나 다른 워커가 다시 가져간 작업 (그 워커의 결과를 덮어쓰지 않음)
+                print(f"⚠️  임대가 끝난 작업의 결과 무시: {job['key']} ({job_id})")
+        finally:
+            with self._stats_lock:
+                self._busy -= 1
+            self._notify()
+
+    def _purge_finished(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        deleted = self.backend.purge(now - self.result_ttl)
+        if deleted:
+            print(f"🧹 끝난 작업 {deleted}개 삭제")
@@ -0,0 +1,106 @@
+"""스트리밍 JSON 점진 파싱 모듈
+
+AI 응답을 조각으로 받으면서 최상위 객체의 지정한 배열(예: characters, relationships) 안의
+객체가 하나 완성될 때마다 바로 꺼낸다. 응답이 중간에 끊기거나 끝부분이 깨져도 그때까지 완성된 객체는 남는다.
+- 첫 '{' 앞의 내용(```json 코드 블록 표시, 설명 문장)은 무시
+- 문자열 안의 괄호, 이스케이프 문자는 구조로 보지 않음
+"""
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+class StreamingJSONItemParser:
+    """
+    최상위 객체의 배열 항목을 완성되는 대로 꺼내는 파서
+
+    사용법:
+        parser = StreamingJSONItemParser(('characters', 'relationships'))
+        for chunk in chunks:
+            for key, item in parser.feed(chunk):
+                ...
+        parser.items  # {'characters': [...], 'relationships': [...]}
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = tuple(keys)
+        self.items: Dict[str, List[Any]] = {key: [] for key in self.keys}
+        self.invalid_items = 0
+
+        self._buffer: List[str] = []  # 현재 항목 텍스트 (항목 안일 때만 모음)
+        self._stack: List[str] = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        # 최상위 객체의 키 추적 (문자열 -> ':' -> 값)
+        self._string_chars: List[str] = []
+        self._last_string = None
+        self._current_key = None
+        self._array_key = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        응답 조각을 넣고 새로 완성된 (배열 키, 항목) 리스트를 반환
+
+        Args:
+            text: 응답 조각
+        """
+        completed = []
+        for ch in text:
+            if not self._started:
+                if ch != '{':
+                    continue
+                self._started = True
+
+            depth = len(self._stack)
+            in_item = self._array_key is not None and depth >= 3
+            if in_item or (self._array_key is not None and depth == 2 and ch == '{'):
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if depth == 1:
+                        self._last_string = ''.join(self._string_chars)
+                elif depth == 1:
+                    self._string_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif ch == ':' and depth == 1:
+                self._current_key = self._last_string
+            elif ch == ',' and depth == 1:
+                self._current_key = None
+            elif ch in '{[':
+                if depth == 1 and ch == '[' and self._current_key in self.items:
+                    self._array_key = self._current_key
+                self._stack.append(ch)
+            elif ch in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                depth = len(self._stack)
+                if self._array_key is not None and depth == 2 and ch == '}':
+                    completed.append((self._array_key, self._finish_item()))
+                elif depth == 1 and ch == ']':
+                    self._array_key = None
+                    self._current_key = None
+
+        completed = [(key, item) for key, item in completed if item is not None]
+        for key, item in completed:
+            self.items[key].append(item)
+        return completed
+
+    def _finish_item(self):
+        text = ''.join(self._buffer)
+        self._buffer = []
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            self.invalid_items += 1
+            return None
@@ -0,0 +1,205 @@
+"""LLM 응답 캐시 모듈
+
+(model, messages, temperature)의 해시를 키로 AI 응답 텍스트를 저장한다.
+- 저장소(backend)는 교체 가능: 메모리 LRU, SQLite 파일, 또는 둘을 겹쳐서 사용
+- TTL이 지난 항목은 없는 것으로 취급
+- 항목 수/크기 제한을 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU)
+"""
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+from .sqlite_store import SQLiteStore
+
+
+def make_cache_key(model: str, messages: List[Dict[str, str]], temperature: Optional[float]) -> str:
+    """
+    요청 내용으로 캐시 키 생성 (같은 모델/메시지/온도면 같은 키)
+
+    Returns:
+        sha256 hex 문자열
+    """
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'temperature': temperature},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheBackend:
+    """캐시 저장소 인터페이스 (값은 (응답 텍스트, 저장 시각))"""
+    name = 'backend'
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def put(self, key: str, value: str, created_at: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """프로세스 메모리 LRU (항목 수와 전체 문자 수로 제한)"""
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 256, max_chars: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._items: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, value, created_at):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._chars -= len(old[0])
+            self._items[key] = (value, created_at)
+            self._chars += len(value)
+            while self._items and (len(self._items) > self.max_entries or self._chars > self.max_chars):
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._chars -= len(evicted)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._chars -= len(old[0])
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'chars': self._chars, 'evictions': self.evictions}
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """SQLite 파일 저장소 (zlib 압축, 압축 크기 기준 LRU, 워커 간 공유)"""
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_bytes: int = 128 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+        self._db = SQLiteStore(path)
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY, data BLOB NOT NULL, created_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL, size INTEGER NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+            self._db.track_size('responses')
+
+    def get(self, key):
+        with self._lock:
+            conn = self._db.connection()
+            row = conn.execute('SELECT data, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        return zlib.decompress(row[0]).decode('utf-8'), row[1]
+
+    def put(self, key, value, created_at):
+        data = zlib.compress(value.encode('utf-8'), 6)
+        with self._lock:
+            self._db.connection().execute(
+                'INSERT OR REPLACE INTO responses (key, data, created_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)',
+                (key, data, created_at, time.time(), len(data)),
+            )
+        evicted = self._db.evict_lru('responses', self.max_bytes, self._lock)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._db.connection().execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def stats(self):
+        with self._lock:
+            count = self._db.connection().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            total = self._db.total_bytes('responses')
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class LLMResponseCache:
+    """
+    여러 저장소를 앞에서부터 차례로 조회하는 응답 캐시 (예: 메모리 -> SQLite)
+    뒤쪽 저장소에서 찾은 항목은 앞쪽 저장소에도 채워 넣는다.
+    """
+
+    def __init__(self, backends: List[CacheBackend], ttl: float = 7 * 24 * 3600):
+        """
+        Args:
+            backends: 조회 순서대로 나열한 저장소 리스트
+            ttl: 응답을 재사용할 시간 (초)
+        """
+        self.backends = backends
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """캐시된 응답 (없거나 TTL이 지났으면 None)"""
+        now = time.time()
+        for position, backend in enumerate(self.backends):
+            item = backend.get(key)
+            if item is None:
+                continue
+            value, created_at = item
+            if now - created_at >= self.ttl:
+                backend.delete(key)
+                continue
+            for front in self.backends[:position]:
+                front.put(key, value, created_at)
+            self._count('hits')
+            return value
+        self._count('misses')
+        return None
+
+    def put(self, key: str, value: str):
+        created_at = time.time()
+        for backend in self.backends:
+            backend.put(key, value, created_at)
+        self._count('stores')
+
+    def delete(self, key: str):
+        for backend in self.backends:
+            backend.delete(key)
+
+    def record_bypass(self):
+        self._count('bypassed')
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """hit/miss 카운터와 저장소별 크기"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['ttl'] = self.ttl
+        stats['backends'] = {backend.name: backend.stats() for backend in self.backends}
+        return stats
@@ -0,0 +1,48 @@
+"""프로세스 메모리 사용량 측정 모듈"""
+import os
+from typing import Dict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_SMAPS_ROLLUP = '/proc/self/smaps_rollup'
+
+
+def get_memory_usage() -> Dict[str, float]:
+    """
+    현재 프로세스의 메모리 사용량 (MB)
+    
+    Returns:
+        {'pid', 'rss', 'pss', 'uss', 'shared'} 딕셔너리
+        - rss: 상주 메모리 전체
+        - pss: 공유 페이지를 공유 프로세스 수로 나눠 더한 비례 메모리
+        - uss: 이 프로세스만 가진 메모리 (워커를 하나 늘릴 때 추가되는 양)
+        - shared: 다른 프로세스와 공유 중인 메모리 (mmap 인덱스, fork로 상속한 페이지 등)
+        /proc/self/smaps_rollup이 없으면 (Linux 외) 최대 RSS만 반환
+    """
+    usage = {'pid': os.getpid()}
+    
+    try:
+        fields = {}
+        with open(_SMAPS_ROLLUP) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])  # kB
+    except OSError:
+        if resource is not None:
+            # Linux는 kB, macOS는 바이트 단위
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            usage['max_rss'] = round(max_rss / 1024 / (1024 if os.uname().sysname == 'Darwin' else 1), 1)
+        return usage
+    
+    def mb(*names: str) -> float:
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+    
+    usage['rss'] = mb('Rss')
+    usage['pss'] = mb('Pss')
+    usage['uss'] = mb('Private_Clean', 'Private_Dirty')
+    usage['shared'] = mb('Shared_Clean', 'Shared_Dirty')
+    return usage
@@ -2,10 +2,19 @@
 from datasets import load_dataset
 import re
 import time
-import pickle
 import os
-from typing import List, Tuple
-from collections import defaultdict
+import tempfile
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from .title_index import (
+    INDEX_FORMAT_VERSION,
+    DocumentTableBuilder,
+    IndexFormatError,
+    TitleIndex,
+    TitleList,
+    open_title_index,
+    write_title_index,
+)
 
 def normalize_title(title: str) -> str:
     """
@@ -25,6 +34,16 @@ def load_namuwiki_dataset(cache_dir: str):
     return dataset
 
 
+def get_dataset_version(data) -> str:
+    """
+    데이터셋/인덱스 버전 문자열 (저장된 관계도가 같은 데이터로 만든 것인지 확인용)
+    
+    인덱스 형식 버전, 문서 수, 데이터셋 fingerprint(있으면)로 만든다.
+    """
+    fingerprint = getattr(data, '_fingerprint', None) or 'unknown'
+    return f"idx{INDEX_FORMAT_VERSION}-{len(data)}-{fingerprint[:16]}"
+
+
 def get_data_from_dataset(dataset):
     """데이터셋에서 실제 데이터 배열 추출"""
     if isinstance(dataset, dict):
@@ -36,60 +55,134 @@ def get_data_from_dataset(dataset):
     return data
 
 
-def build_title_index(data, cache_file: str, force_rebuild: bool = False) -> Tuple[dict, List[tuple]]:
+@contextmanager
+def _index_build_lock(cache_file: str):
+    """
+    여러 프로세스(gunicorn 워커 등)가 동시에 인덱스를 만들지 않도록 하는 파일 잠금
+    fcntl이 없거나 잠금 파일을 만들 수 없으면 잠금 없이 진행
+    """
+    try:
+        import fcntl
+        lock_file = open(f'{cache_file}.lock', 'w')
+    except (ImportError, OSError):
+        yield
+        return
+    
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_cached_title_index(data, cache_file: str) -> Optional[Tuple[TitleIndex, TitleList]]:
+    """캐시된 인덱스를 mmap으로 열기 (없거나 맞지 않으면 None)"""
+    if not os.path.exists(cache_file):
+        return None
+    
+    print(f"\n캐시된 인덱스 로드 중: {cache_file}")
+    load_start = time.time()
+    try:
+        index_file, title_to_indices, title_list = open_title_index(cache_file)
+        if index_file.meta.get('num_rows') not in (None, len(data)):
+            raise IndexFormatError(
+                f"문서 수 불일치 (캐시: {index_file.meta.get('num_rows')}, 데이터셋: {len(data)})"
+            )
+        
+        elapsed = time.time() - load_start
+        print(f"✅ 인덱스 로드 완료 (소요 시간: {elapsed:.2f}초)")
+        print(f"   - 총 제목 수: {len(title_to_indices)}")
+        print(f"   - 총 문서 수: {len(title_list)}")
+        return title_to_indices, title_list
+    except Exception as e:
+        print(f"⚠️  캐시 로드 실패: {e}")
+        print("   인덱스를 새로 생성합니다.")
+        return None
+
+
+def build_title_index(data, cache_file: str, force_rebuild: bool = False) -> Tuple[TitleIndex, TitleList]:
     """
     전체 데이터셋을 한 번 순회하여 제목 인덱스 생성
-    캐시 파일이 있으면 로드, 없으면 생성 후 저장
+    캐시 파일이 있으면 mmap으로 열고, 없으면 생성 후 저장
+    여러 프로세스가 동시에 호출해도 인덱스는 한 프로세스만 생성하고 나머지는 결과를 연다
+
+    Returns:
+        (title_to_indices, title_list)
+        - title_to_indices: 정규화된 제목 -> 인덱스 리스트 (dict처럼 사용)
+        - title_list: (idx, original_title, normalized_title) 시퀀스
     """
     # 캐시 파일이 있고 force_rebuild가 False면 로드 시도
-    if not force_rebuild and os.path.exists(cache_file):
-        print(f"\n캐시된 인덱스 로드 중: {cache_file}")
-        load_start = time.time()
-        try:
-            with open(cache_file, 'rb') as f:
-                cached_data = pickle.load(f)
-                title_to_indices = cached_data['title_to_indices']
-                title_list = cached_data['title_list']
-            
-            elapsed = time.time() - load_start
-            print(f"✅ 인덱스 로드 완료 (소요 시간: {elapsed:.2f}초)")
-            print(f"   - 총 제목 수: {len(title_to_indices)}")
-            print(f"   - 총 문서 수: {len(title_list)}")
-            return title_to_indices, title_list
-        except Exception as e:
-            print(f"⚠️  캐시 로드 실패: {e}")
-            print("   인덱스를 새로 생성합니다.")
+    if not force_rebuild:
+        cached = _load_cached_title_index(data, cache_file)
+        if cached is not None:
+            return cached
     
+    with _index_build_lock(cache_file):
+        # 잠금을 기다리는 동안 다른 프로세스가 인덱스를 만들었으면 그대로 사용
+        if not force_rebuild:
+            cached = _load_cached_title_index(data, cache_file)
+            if cached is not None:
+                return cached
+        return _create_title_index(data, cache_file)
+
+
+def _create_title_index(data, cache_file: str) -> Tuple[TitleIndex, TitleList]:
+    """데이터셋을 순회해 인덱스 파일을 만들고 mmap으로 열기"""
     # 인덱스 생성
     print("\n인덱스 생성 중... (이 과정은 처음 한 번만 느립니다)")
     start_time = time.time()
     
-    title_to_indices = defaultdict(list)
-    title_list = []  # (idx, original_title, normalized_title) 매핑 (부분 검색용)
+    from .document_search import is_redirect_or_disambiguation, parse_redirect_target
+    from .image_extractor import extract_all_image_urls
+    
+    entries = []  # (idx, original_title, normalized_title) 매핑 (부분 검색용)
+    documents = DocumentTableBuilder()  # 문서별 메타데이터 (랭킹 시 본문을 읽지 않기 위함)
     
     for idx, item in enumerate(data):
         if 'title' in item:
             original_title = item['title'].strip()
             normalized_title = normalize_title(original_title)
-            title_to_indices[normalized_title].append(idx)
-            title_list.append((idx, original_title, normalized_title))
+            entries.append((idx, original_title, normalized_title))
+        
+        doc_text = item.get('text') or ''
+        documents.add(
+            redirect_or_disambiguation=is_redirect_or_disambiguation(doc_text),
+            redirect_target=parse_redirect_target(doc_text),
+            text_length=len(doc_text),
+            image_count=len(extract_all_image_urls(doc_text)),
+        )
+    
+    # 리다이렉트 대상 해석 (체인은 최종 문서까지 펼침)
+    first_index = {}
+    for idx, _, normalized_title in entries:
+        first_index.setdefault(normalized_title, idx)
+    
+    def lookup_redirect_target(target: str):
+        target_idx = first_index.get(normalize_title(target))
+        if target_idx is None and '#' in target:
+            # "문서#앵커" 형식이면 앵커 제거
+            target_idx = first_index.get(normalize_title(target.rsplit('#', 1)[0]))
+        return target_idx
+    
+    documents.resolve_redirects(lookup_redirect_target)
+    del first_index
+    
+    # 캐시 파일로 저장 후 mmap으로 다시 열기
+    print(f"\n인덱스를 캐시 파일에 저장 중: {cache_file}")
+    try:
+        write_title_index(cache_file, entries, meta={'num_rows': len(data)}, documents=documents)
+    except OSError as e:
+        # 데이터 폴더에 쓸 수 없으면 임시 폴더에 만들어 mmap으로 사용
+        cache_file = os.path.join(tempfile.gettempdir(), os.path.basename(cache_file))
+        print(f"⚠️  캐시 파일 저장 실패: {e} (임시 경로 사용: {cache_file})")
+        write_title_index(cache_file, entries, meta={'num_rows': len(data)}, documents=documents)
+    del entries, documents
+    index_file, title_to_indices, title_list = open_title_index(cache_file)
     
     elapsed = time.time() - start_time
-    print(f"✅ 인덱스 생성 완료 (소요 시간: {elapsed:.2f}초)")
+    print(f"✅ 인덱스 생성 완료 (소요 시간: {elapsed:.2f}초, 파일 크기: {index_file.size / 1024 / 1024:.1f}MB)")
     print(f"   - 총 제목 수: {len(title_to_indices)}")
     print(f"   - 총 문서 수: {len(title_list)}")
     
-    # 캐시 파일로 저장
-    try:
-        print(f"\n인덱스를 캐시 파일에 저장 중: {cache_file}")
-        with open(cache_file, 'wb') as f:
-            pickle.dump({
-                'title_to_indices': dict(title_to_indices),
-                'title_list': title_list
-            }, f)
-        print(f"✅ 캐시 파일 저장 완료")
-    except Exception as e:
-        print(f"⚠️  캐시 파일 저장 실패: {e} (계속 진행합니다)")
-    
     return title_to_indices, title_list
-
@@ -1,9 +1,108 @@
 """나무위키 웹 크롤링 모듈"""
+import copy
+import os
+import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Callable
 import time
+from .namuwiki_dataset import normalize_title
+from .single_flight import get_single_flight
+from .page_cache import PageCache
+from .html_extractor import extract_namuwiki_page
+
+# 나무위키 주소 (로컬 테스트 서버로 바꿀 수 있음)
+NAMUWIKI_BASE_URL = os.environ.get('NAMUWIKI_BASE_URL', 'https://namu.wiki').rstrip('/')
+
+# 호스트당 동시 요청 수 제한 (서버 부하/차단 방지)
+MAX_CONCURRENCY_PER_HOST = int(os.environ.get('NAMUWIKI_MAX_CONCURRENCY_PER_HOST', '6'))
+
+# HTML 추출 엔진: 'fast' (단일 패스 토크나이저) / 'bs4' (BeautifulSoup 트리, 기존 방식)
+HTML_PARSER_ENGINES = ('fast', 'bs4')
+HTML_PARSER_ENGINE = os.environ.get('NAMUWIKI_HTML_PARSER', 'fast')
+
+DEFAULT_HEADERS = {
+    # User-Agent 설정 (봇 차단 방지)
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+_session = None
+_page_cache: Optional[PageCache] = None
+_session_lock = threading.Lock()
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+# 같은 문서를 동시에 요청하면 한 번만 가져옴
+_fetch_flight = get_single_flight('namuwiki_fetch')
+
+
+def get_http_session() -> requests.Session:
+    """keep-alive 연결을 재사용하는 프로세스 공용 세션"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_CONCURRENCY_PER_HOST, 10))
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+class CrawlDeadlineExceeded(requests.exceptions.Timeout):
+    """요청한 쪽의 제한 시간(deadline)이 지나 가져오지 못함 (같은 문서를 기다리던 요청은 자기 제한 시간으로 다시 시도)"""
+
+
+@contextmanager
+def _host_slot(url: str, timeout: Optional[float] = None):
+    """
+    호스트별 동시 요청 수를 MAX_CONCURRENCY_PER_HOST로 제한
+
+    timeout(초) 안에 자리가 나지 않으면 requests.exceptions.Timeout
+    """
+    host = urllib.parse.urlsplit(url).netloc
+    with _session_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = _host_semaphores[host] = threading.BoundedSemaphore(MAX_CONCURRENCY_PER_HOST)
+    if not semaphore.acquire(timeout=timeout):
+        raise requests.exceptions.Timeout(f'{host} 요청 대기 시간 초과')
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def _remaining(deadline: Optional[float], timeout: float) -> float:
+    """요청 타임아웃 (deadline(time.time() 기준)까지 남은 시간이 더 짧으면 그만큼, 지났으면 Timeout)"""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise requests.exceptions.Timeout('크롤링 제한 시간 초과')
+    return min(timeout, remaining)
+
+
+def _read_content(response: requests.Response, deadline: Optional[float]) -> bytes:
+    """
+    응답 본문 읽기 (읽는 중에 deadline이 지나면 Timeout)
+
+    urllib3 2.x의 read1은 도착한 만큼만 반환하므로 본문을 조금씩 보내는 서버도 deadline에 끊을 수 있다.
+    """
+    if deadline is None:
+        return response.content
+    read1 = getattr(response.raw, 'read1', None)
+    chunks = iter(lambda: read1(64 * 1024, decode_content=True), b'') if read1 else response.iter_content(64 * 1024)
+    content = bytearray()
+    for chunk in chunks:
+        content += chunk
+        if time.time() > deadline:
+            raise requests.exceptions.Timeout('크롤링 제한 시간 초과 (본문 읽는 중)')
+    return bytes(content)
 
 
 def build_namuwiki_url(title: str) -> str:
@@ -18,106 +117,272 @@ def build_namuwiki_url(title: str) -> str:
     """
     # URL 인코딩
     encoded_title = urllib.parse.quote(title, safe='')
-    return f"https://namu.wiki/w/{encoded_title}"
+    return f"{NAMUWIKI_BASE_URL}/w/{encoded_title}"
 
 
-def fetch_namuwiki_page(title: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+def configure_page_cache(path: Optional[str], ttl: float = 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+    """
+    크롤링 결과 디스크 캐시 설정 (path가 None이면 캐시 사용 안 함)
+    
+    Args:
+        path: SQLite 캐시 파일 경로
+        ttl: 재검증 없이 캐시를 사용할 시간 (초)
+        max_bytes: 최대 캐시 크기 (압축 기준, 넘으면 LRU 삭제)
+    """
+    global _page_cache
+    _page_cache = PageCache(path, ttl=ttl, max_bytes=max_bytes) if path else None
+
+
+def get_page_cache_stats() -> Optional[Dict[str, Any]]:
+    """크롤링 캐시 hit/miss 통계 (캐시를 사용하지 않으면 None)"""
+    return _page_cache.stats() if _page_cache else None
+
+
+def parse_namuwiki_html(content: bytes, title: str, url: str, engine: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    나무위키 HTML에서 제목, 본문 텍스트, 이미지 URL 추출
+    
+    Args:
+        content: HTML 응답 본문
+        title: 요청한 문서 제목 (h1이 없을 때 사용)
+        url: 문서 URL
+        engine: 'fast' 또는 'bs4' (None이면 HTML_PARSER_ENGINE). 두 엔진의 결과는 같음
+    
+    Returns:
+        {'title', 'text', 'image_urls', 'image_src', 'url'} 또는 None (본문이 없으면)
+    """
+    engine = engine or HTML_PARSER_ENGINE
+    if engine == 'bs4':
+        return _parse_namuwiki_html_bs4(content, title, url)
+    if engine != 'fast':
+        raise ValueError(f"알 수 없는 HTML 추출 엔진: {engine} (사용 가능: {', '.join(HTML_PARSER_ENGINES)})")
+    
+    extracted = extract_namuwiki_page(content)
+    if extracted is None:
+        print("    ⚠️  본문을 찾을 수 없습니다.")
+        return None
+    page_title, text_content, image_urls = extracted
+    
+    return {
+        'title': page_title if page_title is not None else title,
+        'text': text_content,
+        'image_urls': image_urls,
+        'image_src': image_urls[0]['url'] if image_urls else None,
+        'url': url
+    }
+
+
+def _parse_namuwiki_html_bs4(content: bytes, title: str, url: str) -> Optional[Dict[str, Any]]:
+    """BeautifulSoup 트리로 추출 (기존 방식, 'fast' 엔진 결과 비교용)"""
+    # HTML 파싱
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # 제목 추출 (h1 태그에서 찾기, 클래스명이 해시되어 있으므로 태그만으로 찾기)
+    title_elem = soup.find('h1')
+    if title_elem:
+        page_title = title_elem.get_text(strip=True)
+    else:
+        page_title = title
+    
+    # 본문 텍스트 추출 (id="app" div에서 찾기)
+    content_elem = soup.find(id='app')
+    if not content_elem:
+        print("    ⚠️  본문을 찾을 수 없습니다.")
+        return None
+    
+    # 스크립트와 스타일 제거
+    for script in content_elem(["script", "style"]):
+        script.decompose()
+    
+    # 텍스트 내용 추출
+    text_content = content_elem.get_text(separator='\n', strip=True)
+    
+    # 이미지 URL 추출 (별도로 저장)
+    image_urls = []
+    img_tags = content_elem.find_all('img')
+    for img in img_tags:
+        src = img.get('src') or img.get('data-src') or img.get('data-original')
+        if src:
+            # 나무위키 이미지 서버 URL인지 확인
+            if 'namu.wiki' in src or 'namu.la' in src or 'i.namu.wiki' in src:
+                # 상대 경로인 경우 절대 경로로 변환
+                if src.startswith('//'):
+                    full_url = 'https:' + src
+                elif src.startswith('/'):
+                    full_url = 'https://namu.wiki' + src
+                elif src.startswith('http://') or src.startswith('https://'):
+                    full_url = src
+                else:
+                    full_url = 'https://namu.wiki' + src
+                
+                # 로고나 아이콘 제외
+                if not any(exclude in full_url.lower() for exclude in ['logo', 'icon', 'button', 'spacer']):
+                    alt_text = img.get('alt', '')
+                    # img 태그 주변 텍스트 추출 (위치 정보)
+                    parent = img.find_parent()
+                    context_text = ""
+                    if parent:
+                        # 부모 요소의 텍스트 일부 추출
+                        parent_text = parent.get_text(separator=' ', strip=True)
+                        context_text = parent_text[:200]  # 최대 200자
+                    
+                    image_urls.append({
+                        'url': full_url,
+                        'alt': alt_text,
+                        'context': context_text
+                    })
+    
+    return {
+        'title': page_title,
+        'text': text_content,  # 텍스트만
+        'image_urls': image_urls,  # 이미지 URL 리스트 별도 저장
+        'image_src': image_urls[0]['url'] if image_urls else None,  # 하위 호환성
+        'url': url
+    }
+
+
+def fetch_namuwiki_page(title: str, timeout: float = 10, deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
     """
     나무위키 페이지를 가져와서 파싱
     
+    디스크 캐시가 설정되어 있으면 TTL 안의 결과는 네트워크 없이 반환하고,
+    TTL이 지난 결과는 ETag/Last-Modified로 재검증합니다.
+    요청이 실패하면 (TTL이 지났더라도) 캐시된 결과를 반환합니다.
+    같은 문서(정규화된 제목)를 동시에 요청하면 한 번만 가져와 결과를 나눠 씁니다.
+    먼저 요청한 쪽이 자기 제한 시간에 걸려 못 가져오면, 기다리던 요청은 남은 자기 시간으로 다시 가져옵니다.
+    
     Args:
         title: 문서 제목
         timeout: 요청 타임아웃 (초)
+        deadline: 이 시각(time.time() 기준)까지 끝나지 않으면 포기 (호스트 자리 대기, 연결, 본문 읽기 모두 포함)
     
     Returns:
         {'title': 제목, 'text': 텍스트 내용, 'image_src': 이미지 URL} 또는 None
     """
+    try:
+        doc, _ = _fetch_flight.do(
+            normalize_title(title), _fetch_namuwiki_page, title, timeout, deadline,
+            retry_errors=(CrawlDeadlineExceeded,),
+        )
+    except CrawlDeadlineExceeded:
+        return None
+    # 호출한 쪽에서 type/source 등을 추가하거나 image_urls를 고치므로 문서마다 깊은 복사본을 반환
+    return copy.deepcopy(doc) if doc else None
+
+
+def _fetch_namuwiki_page(title: str, timeout: float, deadline: Optional[float]) -> Optional[Dict[str, Any]]:
+    """fetch_namuwiki_page의 실제 요청 (single-flight 없이)"""
     url = build_namuwiki_url(title)
+    cache = _page_cache
+    cache_key = normalize_title(title)
+    
+    cached = cache.get(cache_key) if cache else None
+    if cached and cached.fresh:
+        print(f"    💾 캐시 사용: {title}")
+        return cached.doc
+    
+    # 캐시가 오래되었으면 조건부 요청으로 재검증
+    headers = {}
+    if cached:
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
     
     try:
-        # User-Agent 설정 (봇 차단 방지)
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
         print(f"    🌐 웹에서 가져오는 중: {url}")
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        
-        # HTML 파싱
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # 제목 추출 (h1 태그에서 찾기, 클래스명이 해시되어 있으므로 태그만으로 찾기)
-        title_elem = soup.find('h1')
-        if title_elem:
-            page_title = title_elem.get_text(strip=True)
-        else:
-            page_title = title
-        
-        # 본문 텍스트 추출 (id="app" div에서 찾기)
-        content_elem = soup.find(id='app')
-        if not content_elem:
-            print(f"    ⚠️  본문을 찾을 수 없습니다.")
-            return None
+        with _host_slot(url, timeout=_remaining(deadline, timeout)):
+            with get_http_session().get(
+                url, headers=headers, timeout=_remaining(deadline, timeout), stream=True
+            ) as response:
+                if response.status_code == 304 and cached:
+                    cache.mark_revalidated(cache_key)
+                    return cached.doc
+                response.raise_for_status()
+                content = _read_content(response, deadline)
         
-        # 스크립트와 스타일 제거
-        for script in content_elem(["script", "style"]):
-            script.decompose()
-        
-        # 텍스트 내용 추출
-        text_content = content_elem.get_text(separator='\n', strip=True)
-        
-        # 이미지 URL 추출 (별도로 저장)
-        image_urls = []
-        img_tags = content_elem.find_all('img')
-        for img in img_tags:
-            src = img.get('src') or img.get('data-src') or img.get('data-original')
-            if src:
-                # 나무위키 이미지 서버 URL인지 확인
-                if 'namu.wiki' in src or 'namu.la' in src or 'i.namu.wiki' in src:
-                    # 상대 경로인 경우 절대 경로로 변환
-                    if src.startswith('//'):
-                        full_url = 'https:' + src
-                    elif src.startswith('/'):
-                        full_url = 'https://namu.wiki' + src
-                    elif src.startswith('http://') or src.startswith('https://'):
-                        full_url = src
-                    else:
-                        full_url = 'https://namu.wiki' + src
-                    
-                    # 로고나 아이콘 제외
-                    if not any(exclude in full_url.lower() for exclude in ['logo', 'icon', 'button', 'spacer']):
-                        alt_text = img.get('alt', '')
-                        # img 태그 주변 텍스트 추출 (위치 정보)
-                        parent = img.find_parent()
-                        context_text = ""
-                        if parent:
-                            # 부모 요소의 텍스트 일부 추출
-                            parent_text = parent.get_text(separator=' ', strip=True)
-                            context_text = parent_text[:200]  # 최대 200자
-                        
-                        image_urls.append({
-                            'url': full_url,
-                            'alt': alt_text,
-                            'context': context_text
-                        })
-        
-        return {
-            'title': page_title,
-            'text': text_content,  # 텍스트만
-            'image_urls': image_urls,  # 이미지 URL 리스트 별도 저장
-            'image_src': image_urls[0]['url'] if image_urls else None,  # 하위 호환성
-            'url': url
-        }
+        doc = parse_namuwiki_html(content, title, url)
+        if doc and cache:
+            cache.put(cache_key, doc, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return doc
         
     except requests.exceptions.RequestException as e:
         print(f"    ❌ 웹 요청 실패: {e}")
+        if cached:
+            print(f"    💾 오래된 캐시 사용: {title}")
+            return cached.doc
+        if deadline is not None and time.time() >= deadline:
+            # 이 요청의 제한 시간 때문에 실패 (시간이 남은 다른 요청은 다시 시도)
+            raise CrawlDeadlineExceeded(str(e)) from e
         return None
     except Exception as e:
         print(f"    ❌ 파싱 실패: {e}")
         return None
 
 
+def crawl_namuwiki_pages(
+    titles: List[str],
+    max_workers: int = 8,
+    deadline: float = 25.0,
+    timeout: float = 10,
+    on_result: Optional[Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    여러 나무위키 페이지를 동시에 크롤링 (공용 keep-alive 세션, 호스트당 동시 요청 제한)
+    
+    Args:
+        titles: 문서 제목 리스트
+        max_workers: 동시에 실행할 최대 요청 수
+        deadline: 전체 제한 시간 (초). 넘으면 끝난 결과만 반환
+        timeout: 요청 하나의 타임아웃 (초, 남은 제한 시간보다 길면 줄임 - 제한 시간이 지나면 진행 중인 요청도 끝남)
+        on_result: 문서 하나가 끝날 때마다 (상태, 문서 또는 None)으로 호출 (크롤링 스레드에서 호출됨)
+    
+    Returns:
+        (documents, statuses)
+        - documents: 성공한 문서 리스트 (titles 순서, fetch_namuwiki_page 결과)
+        - statuses: 제목별 상태 [{'title', 'status': ok/failed/timeout, 'elapsed'}, ...]
+    """
+    if not titles:
+        return [], []
+    
+    start_time = time.time()
+    deadline_at = start_time + deadline
+    
+    def fetch(title: str):
+        if time.time() >= deadline_at:
+            return None, 'timeout', 0.0
+        fetch_start = time.time()
+        doc = fetch_namuwiki_page(title, timeout=timeout, deadline=deadline_at)
+        elapsed = time.time() - fetch_start
+        status = 'ok' if doc else ('timeout' if time.time() >= deadline_at else 'failed')
+        if on_result:
+            try:
+                on_result({'title': title, 'status': status, 'elapsed': round(elapsed, 3)}, doc)
+            except Exception as e:
+                print(f"    ⚠️  크롤링 결과 콜백 실패: {e}")
+        return doc, status, elapsed
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(titles))), thread_name_prefix='namuwiki-crawl')
+    futures = [executor.submit(fetch, title) for title in titles]
+    wait(futures, timeout=deadline)
+    # 제한 시간이 지나면 남은 작업은 취소하고 기다리지 않음
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    documents = []
+    statuses = []
+    for title, future in zip(titles, futures):
+        if future.done() and not future.cancelled():
+            doc, status, elapsed = future.result()
+        else:
+            doc, status, elapsed = None, 'timeout', time.time() - start_time
+        if doc:
+            documents.append(doc)
+        statuses.append({'title': title, 'status': status, 'elapsed': round(elapsed, 3)})
+    
+    print(f"  🌐 크롤링 완료: {len(documents)}/{len(titles)}개 성공 (소요 시간: {time.time() - start_time:.2f}초)")
+    return documents, statuses
+
+
 def fetch_character_documents(character_names: list, delay: float = 0.5) -> list:
     """
     여러 인물의 나무위키 문서를 웹에서 가져오기
@@ -173,7 +438,7 @@ def fetch_and_merge_character_documents(
         - 둘 다 실패하면 해당 인물은 제외
     """
     from .document_search import search_document_by_title_indexed
-    from .image_extractor import extract_all_image_urls
+    from .image_index import document_image_urls
     
     documents = []
     
@@ -189,7 +454,7 @@ def fetch_and_merge_character_documents(
         dataset_image_urls = []
         if dataset_doc:
             dataset_text = dataset_doc.get('text', '')
-            dataset_image_urls = extract_all_image_urls(dataset_text)
+            dataset_image_urls = document_image_urls(dataset_text, dataset_doc_idx)
             print(f"    📚 데이터셋에서 찾음: '{dataset_doc.get('title', '')}' ({len(dataset_text)}자, 이미지 {len(dataset_image_urls)}개)")
         else:
             print(f"    ⚠️  데이터셋에서 찾을 수 없음")
@@ -221,7 +486,8 @@ def fetch_and_merge_character_documents(
                 'text': dataset_text,
                 'image_urls': dataset_image_urls,
                 'type': 'character',
-                'source': 'dataset'
+                'source': 'dataset',
+                'index': dataset_doc_idx,
             }
             print(f"    ✅ 데이터셋 문서 사용: '{dataset_title}' ({len(dataset_text)}자, 이미지 {len(dataset_image_urls)}개)")
         
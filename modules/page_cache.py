@@ -0,0 +1,106 @@
+"""나무위키 크롤링 결과 디스크 캐시 모듈
+
+파싱된 크롤링 결과를 정규화된 제목으로 SQLite에 zlib 압축해 저장한다.
+- TTL 안이면 네트워크 없이 반환 (hit)
+- TTL이 지나면 ETag/Last-Modified로 조건부 요청 (304면 재사용)
+- 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU)
+"""
+import json
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, NamedTuple
+
+from .sqlite_store import SQLiteStore
+
+
+class CachedPage(NamedTuple):
+    doc: Dict[str, Any]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh: bool
+
+
+class PageCache:
+    """크롤링 결과 캐시 (스레드 안전)"""
+
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            path: SQLite 파일 경로
+            ttl: 재검증 없이 사용할 시간 (초)
+            max_bytes: 압축된 본문 기준 최대 캐시 크기
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+
+        self._db = SQLiteStore(path)
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                ' key TEXT PRIMARY KEY, data BLOB NOT NULL, etag TEXT, last_modified TEXT,'
+                ' fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)')
+            self._db.track_size('pages')
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        """캐시 항목 조회 (없으면 None). hit/stale/miss 카운터를 갱신"""
+        now = time.time()
+        with self._lock:
+            conn = self._db.connection()
+            row = conn.execute(
+                'SELECT data, etag, last_modified, fetched_at FROM pages WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            conn.execute('UPDATE pages SET accessed_at = ? WHERE key = ?', (now, key))
+            fresh = now - row[3] < self.ttl
+            self._stats['hits' if fresh else 'stale'] += 1
+
+        doc = json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        return CachedPage(doc, row[1], row[2], fresh)
+
+    def put(self, key: str, doc: Dict[str, Any], etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """캐시 저장 후 크기가 넘으면 LRU 삭제"""
+        data = zlib.compress(json.dumps(doc, ensure_ascii=False).encode('utf-8'), 6)
+        now = time.time()
+        with self._lock:
+            self._db.connection().execute(
+                'INSERT OR REPLACE INTO pages (key, data, etag, last_modified, fetched_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, data, etag, last_modified, now, now, len(data)),
+            )
+            self._stats['stores'] += 1
+        evicted = self._db.evict_lru('pages', self.max_bytes, self._lock)
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += evicted
+
+    def mark_revalidated(self, key: str):
+        """304 응답을 받은 항목의 TTL을 다시 시작"""
+        now = time.time()
+        with self._lock:
+            self._db.connection().execute(
+                'UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?', (now, now, key)
+            )
+            self._stats['revalidated'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """hit/miss 카운터와 현재 캐시 크기"""
+        with self._lock:
+            count = self._db.connection().execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+            total = self._db.total_bytes('pages')
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['entries'] = count
+        stats['bytes'] = total
+        stats['ttl'] = self.ttl
+        stats['max_bytes'] = self.max_bytes
+        return stats
@@ -0,0 +1,116 @@
+"""동시 중복 요청 합치기 (single-flight) 모듈
+
+같은 키의 작업이 이미 실행 중이면 새로 실행하지 않고 그 결과를 기다려 함께 사용한다.
+인기 작품이 한꺼번에 검색될 때 같은 문서 검색, 같은 페이지 크롤링, 같은 AI 요청이
+요청 수만큼 반복되지 않도록 한다. (끝난 결과를 보관하지는 않음 - 캐시는 각 모듈이 담당)
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple, Type
+
+
+class _Flight:
+    """실행 중인 작업 하나 (먼저 온 호출이 실행하고 나머지는 done을 기다림)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """키별 single-flight 그룹 (스레드 안전)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {'calls': 0, 'executions': 0, 'collapsed': 0, 'errors': 0, 'retried': 0}
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[..., Any],
+        *args,
+        retry_errors: Tuple[Type[BaseException], ...] = (),
+        **kwargs,
+    ) -> Tuple[Any, bool]:
+        """
+        같은 키로 실행 중인 작업이 있으면 그 결과를, 없으면 fn(*args, **kwargs)를 실행한 결과를 반환
+
+        Args:
+            key: 같은 작업인지 판단하는 키 (정규화된 인자로 만들 것)
+            fn: 실행할 함수
+            retry_errors: 먼저 실행한 호출이 이 예외로 실패하면 기다리던 호출이 직접 다시 실행
+                          (실행한 쪽의 사정으로 중단된 경우, 예: 클라이언트 연결 끊김)
+
+        Returns:
+            (결과, shared) - shared가 True면 다른 호출의 실행 결과를 함께 받은 것
+            (결과 객체는 공유되므로 수정하지 말 것)
+
+        Raises:
+            먼저 실행한 호출의 예외를 기다리던 호출도 그대로 받음
+        """
+        while True:
+            with self._lock:
+                self._stats['calls'] += 1
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    self._stats['executions'] += 1
+                    leader = True
+                else:
+                    self._stats['collapsed'] += 1
+                    leader = False
+
+            if leader:
+                try:
+                    flight.result = fn(*args, **kwargs)
+                except BaseException as e:
+                    flight.error = e
+                    with self._lock:
+                        self._stats['errors'] += 1
+                    raise
+                finally:
+                    with self._lock:
+                        del self._flights[key]
+                    flight.done.set()
+                return flight.result, False
+
+            flight.done.wait()
+            if flight.error is None:
+                return flight.result, True
+            if not isinstance(flight.error, retry_errors):
+                raise flight.error
+            with self._lock:
+                # 결과를 함께 받지 못했으므로 합친 호출로 세지 않고, 다시 시도할 때 새로 셈
+                self._stats['retried'] += 1
+                self._stats['collapsed'] -= 1
+                self._stats['calls'] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """호출 수, 실제 실행 수, 합쳐진(collapsed) 호출 수, 현재 실행 중인 키 수"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        stats['collapse_rate'] = round(stats['collapsed'] / stats['calls'], 3) if stats['calls'] else 0.0
+        return stats
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """이름별 single-flight 그룹 (없으면 생성)"""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """그룹별 합치기 통계 (/metrics용)"""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,122 @@
+"""SQLite 저장소 공용 모듈
+
+크롤링 캐시, LLM 응답 캐시, 작업 큐, 관계도 저장소, 이미지 인덱스/프록시가 함께 쓰는 SQLite 파일 처리.
+- 프로세스별 연결 (gunicorn preload 후 fork된 워커는 새로 연결), WAL 모드
+- 크기 제한 테이블은 트리거로 전체 크기(size 열의 합)를 기록해 저장할 때마다 SUM으로 훑지 않음
+- 크기를 넘으면 가장 오래 사용하지 않은(accessed_at) 행부터 조금씩 삭제 (LRU)
+"""
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+from typing import Optional
+
+# 크기 제한 테이블의 전체 크기 (테이블 이름 -> size 합)
+_SIZES_TABLE = 'table_sizes'
+
+
+class SQLiteStore:
+    """SQLite 파일 하나에 대한 프로세스별 연결과 크기 기준 LRU 삭제"""
+
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        Args:
+            path: SQLite 파일 경로 (쓰기용이면 폴더가 없을 때 만듦)
+            read_only: 읽기 전용으로 열기 (WAL 설정 안 함)
+        """
+        self.path = path
+        self.read_only = read_only
+        self._conn_pid = None
+        self._conn = None
+        self._connect_lock = threading.Lock()
+        if not read_only:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        프로세스별 연결 (스레드끼리 공유하므로 사용하는 쪽에서 잠금)
+
+        autocommit 모드(isolation_level=None)라 여러 문장을 묶으려면 BEGIN/COMMIT을 직접 실행한다.
+        """
+        if self._conn_pid != os.getpid():
+            with self._connect_lock:
+                if self._conn_pid != os.getpid():
+                    if self.read_only:
+                        conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+                    else:
+                        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+                        conn.execute('PRAGMA journal_mode=WAL')
+                        # INSERT OR REPLACE로 지워지는 행에도 삭제 트리거가 실행되도록 (크기 기록)
+                        conn.execute('PRAGMA recursive_triggers=ON')
+                    self._conn = conn
+                    self._conn_pid = os.getpid()
+        return self._conn
+
+    def track_size(self, table: str):
+        """
+        table의 size 열 합을 트리거로 기록 (테이블을 만든 뒤 한 번 호출)
+
+        이미 있는 파일이면 처음 한 번만 SUM으로 현재 크기를 채운다.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {_SIZES_TABLE} (name TEXT PRIMARY KEY, bytes INTEGER NOT NULL)'
+            )
+            conn.execute(
+                f'INSERT OR IGNORE INTO {_SIZES_TABLE} (name, bytes) SELECT ?, COALESCE(SUM(size), 0) FROM {table}',
+                (table,),
+            )
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_size_insert AFTER INSERT ON {table} BEGIN'
+                f" UPDATE {_SIZES_TABLE} SET bytes = bytes + NEW.size WHERE name = '{table}'; END"
+            )
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_size_delete AFTER DELETE ON {table} BEGIN'
+                f" UPDATE {_SIZES_TABLE} SET bytes = bytes - OLD.size WHERE name = '{table}'; END"
+            )
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_size_update AFTER UPDATE OF size ON {table} BEGIN'
+                f" UPDATE {_SIZES_TABLE} SET bytes = bytes + NEW.size - OLD.size WHERE name = '{table}'; END"
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def total_bytes(self, table: str) -> int:
+        """track_size로 기록 중인 table의 size 합"""
+        row = self.connection().execute(f'SELECT bytes FROM {_SIZES_TABLE} WHERE name = ?', (table,)).fetchone()
+        return row[0] if row else 0
+
+    def evict_lru(self, table: str, max_bytes: int, lock: Optional[threading.Lock] = None, batch: int = 64) -> int:
+        """
+        table의 크기가 max_bytes를 넘으면 accessed_at이 오래된 행부터 삭제
+
+        크기를 넘지 않으면 기록된 합만 읽고 끝난다. lock을 주면 batch개씩 지울 때만 잡아
+        삭제하는 동안에도 다른 스레드가 조회할 수 있다.
+
+        Returns:
+            삭제한 행 수
+        """
+        evicted = 0
+        while True:
+            with lock or nullcontext():
+                conn = self.connection()
+                excess = self.total_bytes(table) - max_bytes
+                if excess <= 0:
+                    return evicted
+                rowids = []
+                rows = conn.execute(f'SELECT rowid, size FROM {table} ORDER BY accessed_at LIMIT ?', (batch,)).fetchall()
+                for rowid, size in rows:
+                    rowids.append(rowid)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                if not rowids:
+                    return evicted
+                conn.execute(f"DELETE FROM {table} WHERE rowid IN ({', '.join('?' * len(rowids))})", rowids)
+                evicted += len(rowids)
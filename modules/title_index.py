@@ -0,0 +1,533 @@
+"""mmap 기반 제목 인덱스 모듈
+
+정규화된 제목을 정렬해 하나의 연속 버퍼에 담고, 오프셋과 문서 번호는 int 배열로 저장한다.
+파일은 mmap으로 열기 때문에 로드 시 Python 객체를 만들지 않고(로드 시간 ≈ 0),
+같은 파일을 여는 여러 프로세스가 페이지 캐시를 공유한다.
+
+파일 구조:
+    MAGIC(8바이트) | 헤더 길이(uint32) | 헤더(JSON) | 8바이트 정렬된 섹션들
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+INDEX_MAGIC = b'NWTIDX\x00\x01'
+INDEX_FORMAT_VERSION = 5
+
+_ALIGN = 8
+_HEADER_LEN = struct.Struct('<I')
+
+# 섹션에 사용하는 배열 타입 (int32 / int64 / byte)
+INT32 = 'i'
+INT64 = 'q'
+BYTE = 'B'
+
+assert array(INT32).itemsize == 4 and array(INT64).itemsize == 8
+
+
+class IndexFormatError(Exception):
+    """인덱스 파일 형식/버전이 맞지 않을 때 발생"""
+
+
+def _padding(length: int) -> int:
+    return (-length) % _ALIGN
+
+
+class IndexWriter:
+    """이름 붙은 섹션(배열/바이트 버퍼)을 모아 하나의 인덱스 파일로 저장"""
+
+    def __init__(self):
+        self._sections: Dict[str, Tuple[str, bytes]] = {}
+
+    def add_array(self, name: str, typecode: str, values: Iterable[int]):
+        arr = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+        self._sections[name] = (typecode, arr.tobytes())
+
+    def add_bytes(self, name: str, data: bytes):
+        self._sections[name] = (BYTE, bytes(data))
+
+    def add_strings(self, name: str, strings: Iterable[str]):
+        """문자열 목록을 '<name>.offsets'(int64) + '<name>.blob'(utf-8) 두 섹션으로 저장"""
+        offsets = array(INT64, [0])
+        blob = bytearray()
+        for s in strings:
+            blob += s.encode('utf-8')
+            offsets.append(len(blob))
+        self.add_array(f'{name}.offsets', INT64, offsets)
+        self.add_bytes(f'{name}.blob', blob)
+
+    def write(self, path: str, meta: Optional[dict] = None):
+        """임시 파일에 기록한 뒤 교체 (다른 프로세스가 읽는 중이어도 안전)"""
+        sections = {}
+        offset = 0
+        for name, (typecode, buf) in self._sections.items():
+            sections[name] = {'offset': offset, 'length': len(buf), 'typecode': typecode}
+            offset += len(buf) + _padding(len(buf))
+
+        header = json.dumps({
+            'version': INDEX_FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'sections': sections,
+            'meta': meta or {},
+        }, ensure_ascii=False).encode('utf-8')
+        prefix_len = len(INDEX_MAGIC) + _HEADER_LEN.size + len(header)
+
+        tmp_path = f'{path}.tmp.{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_MAGIC)
+            f.write(_HEADER_LEN.pack(len(header)))
+            f.write(header)
+            f.write(b'\x00' * _padding(prefix_len))
+            for typecode, buf in self._sections.values():
+                f.write(buf)
+                f.write(b'\x00' * _padding(len(buf)))
+        os.replace(tmp_path, path)
+
+
+class IndexFile:
+    """IndexWriter로 저장한 파일을 읽기 전용 mmap으로 열어 섹션을 memoryview로 제공"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        if bytes(view[:len(INDEX_MAGIC)]) != INDEX_MAGIC:
+            raise IndexFormatError(f'인덱스 파일 형식이 아닙니다: {path}')
+        pos = len(INDEX_MAGIC)
+        (header_len,) = _HEADER_LEN.unpack_from(view, pos)
+        pos += _HEADER_LEN.size
+        header = json.loads(bytes(view[pos:pos + header_len]).decode('utf-8'))
+        pos += header_len
+
+        if header.get('version') != INDEX_FORMAT_VERSION:
+            raise IndexFormatError(
+                f"인덱스 버전 불일치 (파일: {header.get('version')}, 필요: {INDEX_FORMAT_VERSION})"
+            )
+        if header.get('byteorder') != sys.byteorder:
+            raise IndexFormatError('인덱스 바이트 순서가 현재 시스템과 다릅니다.')
+
+        self._view = view
+        self._data_start = pos + _padding(pos)
+        self._sections = header['sections']
+        self.meta = header.get('meta', {})
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def section(self, name: str) -> memoryview:
+        info = self._sections[name]
+        start = self._data_start + info['offset']
+        raw = self._view[start:start + info['length']]
+        return raw if info['typecode'] == BYTE else raw.cast(info['typecode'])
+
+    def strings(self, name: str) -> 'StringTable':
+        return StringTable(self.section(f'{name}.offsets'), self.section(f'{name}.blob'))
+
+    @property
+    def size(self) -> int:
+        return len(self._mmap)
+
+
+class StringTable(Sequence):
+    """오프셋 배열 + utf-8 버퍼로 표현된 문자열 목록"""
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get_bytes(self, i: int) -> bytes:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+    def find(self, value: str) -> int:
+        """utf-8 바이트 순으로 정렬된 테이블에서 이진 탐색 (없으면 -1)"""
+        target = value.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.get_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.get_bytes(lo) == target:
+            return lo
+        return -1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.get_bytes(i).decode('utf-8')
+
+
+class TitleIndex(Mapping):
+    """
+    정규화된 제목 -> 문서 인덱스 리스트 (title_to_indices와 같은 인터페이스)
+
+    키는 utf-8 바이트 기준으로 정렬되어 있어 이진 탐색으로 찾는다.
+    """
+
+    def __init__(self, index_file: IndexFile):
+        self.index_file = index_file
+        self._keys = index_file.strings('keys')
+        self._posting_offsets = index_file.section('postings.offsets')
+        self._postings = index_file.section('postings')
+        # 문서 번호 -> 메타데이터 (랭킹 시 본문을 읽지 않기 위함)
+        self.documents = DocumentTable(index_file) if 'docs.flags' in index_file else None
+
+    def find(self, normalized_title: str) -> int:
+        """키 번호 반환 (없으면 -1)"""
+        return self._keys.find(normalized_title)
+
+    def key(self, key_id: int) -> str:
+        return self._keys[key_id]
+
+    def indices(self, key_id: int) -> List[int]:
+        return self._postings[self._posting_offsets[key_id]:self._posting_offsets[key_id + 1]].tolist()
+
+    def __contains__(self, normalized_title) -> bool:
+        return isinstance(normalized_title, str) and self.find(normalized_title) >= 0
+
+    def __getitem__(self, normalized_title: str) -> List[int]:
+        key_id = self.find(normalized_title) if isinstance(normalized_title, str) else -1
+        if key_id < 0:
+            raise KeyError(normalized_title)
+        return self.indices(key_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class TitleList(Sequence):
+    """(idx, original_title, normalized_title) 시퀀스 (title_list와 같은 인터페이스)"""
+
+    def __init__(self, index_file: IndexFile, title_index: TitleIndex):
+        self._doc_ids = index_file.section('entries.doc_id')
+        self._entry_keys = index_file.section('entries.key')
+        self._originals = index_file.strings('entries.title')
+        self._title_index = title_index
+        # 유사 제목 후보 검색용 문자 역색인 (document_search에서 사용)
+        self.char_index = CharIndex(index_file)
+        # 하위 문서 접미사("/등장인물" 등)별 제목 목록
+        self.suffix_index = SuffixIndex(index_file)
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def key(self, key_id: int) -> str:
+        return self._title_index.key(key_id)
+
+    def key_entries(self, key_id: int) -> List[Tuple[int, str, str]]:
+        """키 번호에 해당하는 (idx, original_title, normalized_title) 목록"""
+        normalized_title = self._title_index.key(key_id)
+        return [
+            (doc_id, self._originals[self.position(doc_id)], normalized_title)
+            for doc_id in self._title_index.indices(key_id)
+        ]
+
+    def position(self, doc_id: int) -> int:
+        """문서 번호 -> title_list 내 위치 (없으면 -1)"""
+        pos = bisect_left(self._doc_ids, doc_id)
+        if pos < len(self._doc_ids) and self._doc_ids[pos] == doc_id:
+            return pos
+        return -1
+
+    def __getitem__(self, i: int) -> Tuple[int, str, str]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._doc_ids[i], self._originals[i], self._title_index.key(self._entry_keys[i])
+
+    def __iter__(self) -> Iterator[Tuple[int, str, str]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class CharIndex:
+    """
+    문자 -> 키 번호 역색인
+
+    전체 제목을 SequenceMatcher로 훑는 대신, 검색어와 문자를 공유하는 제목만 후보로 삼는다.
+    공유 문자 수로 SequenceMatcher.ratio의 상한을 구할 수 있어 정확한 상위 결과를 보장하면서
+    대부분의 후보를 계산 없이 건너뛸 수 있다 (document_search.find_all_candidates_by_keyword).
+    """
+
+    def __init__(self, index_file: IndexFile):
+        self._chars = index_file.strings('chars')
+        self._offsets = index_file.section('chars.postings.offsets')
+        self._postings = index_file.section('chars.postings')
+        self._key_lengths = index_file.section('keys.length')
+
+    def key_ids(self, char: str) -> memoryview:
+        char_id = self._chars.find(char)
+        if char_id < 0:
+            return self._postings[0:0]
+        return self._postings[self._offsets[char_id]:self._offsets[char_id + 1]]
+
+    def key_length(self, key_id: int) -> int:
+        return self._key_lengths[key_id]
+
+    def shared_counts(self, normalized_keyword: str) -> Counter:
+        """
+        키 번호 -> 검색어와 공유하는 문자 수의 상한
+
+        검색어에 두 번 나오는 문자는 2로 센다 (실제 공유 문자 수 이상이 되도록).
+        """
+        shared = Counter()
+        for char, count in Counter(normalized_keyword).items():
+            key_ids = self.key_ids(char)
+            for _ in range(count):
+                shared.update(key_ids)
+        return shared
+
+
+def subpage_suffix(normalized_title: str) -> str:
+    """
+    하위 문서 접미사 (마지막 '/' 뒤, 없으면 빈 문자열)
+    예: "나루토/등장인물" -> "등장인물"
+    """
+    if '/' not in normalized_title:
+        return ''
+    return normalized_title.rsplit('/', 1)[1]
+
+
+class SuffixIndex:
+    """하위 문서 접미사 -> 키 번호 (키 번호 오름차순)"""
+
+    def __init__(self, index_file: IndexFile):
+        self._suffixes = index_file.strings('suffixes')
+        self._offsets = index_file.section('suffixes.postings.offsets')
+        self._postings = index_file.section('suffixes.postings')
+
+    def key_ids(self, suffix: str) -> memoryview:
+        suffix_id = self._suffixes.find(suffix)
+        if suffix_id < 0:
+            return self._postings[0:0]
+        return self._postings[self._offsets[suffix_id]:self._offsets[suffix_id + 1]]
+
+    def __contains__(self, suffix) -> bool:
+        return isinstance(suffix, str) and self._suffixes.find(suffix) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._suffixes)
+
+    def __len__(self) -> int:
+        return len(self._suffixes)
+
+
+# DocumentTable 플래그 비트
+DOC_REDIRECT_OR_DISAMBIGUATION = 0x01
+DOC_REDIRECT = 0x02
+
+# 리다이렉트 체인을 따라가는 최대 깊이 (순환 방지)
+MAX_REDIRECT_DEPTH = 10
+
+
+class DocumentTableBuilder:
+    """인덱스 생성 시 문서별 메타데이터를 열(column) 단위로 모음 (문서 번호 순서로 add)"""
+
+    def __init__(self):
+        self.flags = array(BYTE)
+        self.text_lengths = array(INT32)
+        self.image_counts = array(INT32)
+        self.redirect_targets: List[str] = []
+        self.redirect_to: Optional[array] = None
+
+    def add(self, redirect_or_disambiguation: bool, redirect_target: Optional[str], text_length: int, image_count: int):
+        flags = 0
+        if redirect_or_disambiguation:
+            flags |= DOC_REDIRECT_OR_DISAMBIGUATION
+        if redirect_target is not None:
+            flags |= DOC_REDIRECT
+        self.flags.append(flags)
+        self.text_lengths.append(text_length)
+        self.image_counts.append(image_count)
+        self.redirect_targets.append(redirect_target or '')
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def resolve_redirects(self, lookup: Callable[[str], Optional[int]], max_depth: int = MAX_REDIRECT_DEPTH):
+        """
+        리다이렉트 대상을 문서 번호로 바꾸고 체인을 펼쳐 최종 문서 번호를 계산
+
+        Args:
+            lookup: 리다이렉트 대상 제목 -> 문서 번호 (없으면 None)
+            max_depth: 따라갈 최대 리다이렉트 수 (넘거나 순환하면 해석 실패)
+
+        대상이 없거나, 순환하거나, 체인 끝이 다시 해석할 수 없는 리다이렉트이면 -1
+        """
+        direct = array(INT32, [-1]) * len(self)
+        for idx, target in enumerate(self.redirect_targets):
+            if self.flags[idx] & DOC_REDIRECT:
+                target_idx = lookup(target)
+                if target_idx is not None and target_idx != idx:
+                    direct[idx] = target_idx
+
+        resolved = array(INT32, [-1]) * len(self)
+        for idx in range(len(self)):
+            current = direct[idx]
+            if current < 0:
+                continue
+            depth = 1
+            while direct[current] >= 0 and depth < max_depth:
+                current = direct[current]
+                depth += 1
+            if direct[current] < 0 and not self.flags[current] & DOC_REDIRECT:
+                resolved[idx] = current
+        self.redirect_to = resolved
+
+    def write_to(self, writer: IndexWriter):
+        if self.redirect_to is not None:
+            writer.add_array('docs.redirect_to', INT32, self.redirect_to)
+        writer.add_array('docs.flags', BYTE, self.flags)
+        writer.add_array('docs.text_length', INT32, self.text_lengths)
+        writer.add_array('docs.image_count', INT32, self.image_counts)
+        writer.add_strings('docs.redirect_target', self.redirect_targets)
+
+
+class DocumentTable:
+    """문서 번호 -> 리다이렉트/동음이의어 여부, 본문 길이, 리다이렉트 대상, 이미지 링크 수"""
+
+    def __init__(self, index_file: IndexFile):
+        self._flags = index_file.section('docs.flags')
+        self._text_lengths = index_file.section('docs.text_length')
+        self._image_counts = index_file.section('docs.image_count')
+        self._redirect_targets = index_file.strings('docs.redirect_target')
+        self._redirect_to = index_file.section('docs.redirect_to') if 'docs.redirect_to' in index_file else None
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def is_redirect_or_disambiguation(self, idx: int) -> bool:
+        return bool(self._flags[idx] & DOC_REDIRECT_OR_DISAMBIGUATION)
+
+    def is_redirect(self, idx: int) -> bool:
+        return bool(self._flags[idx] & DOC_REDIRECT)
+
+    def text_length(self, idx: int) -> int:
+        return self._text_lengths[idx]
+
+    def image_count(self, idx: int) -> int:
+        return self._image_counts[idx]
+
+    def redirect_target(self, idx: int) -> Optional[str]:
+        if not self.is_redirect(idx):
+            return None
+        return self._redirect_targets[idx]
+
+    def redirect_to(self, idx: int) -> Optional[int]:
+        """리다이렉트 체인을 따라간 최종 문서 번호 (리다이렉트가 아니거나 해석 실패면 None)"""
+        if self._redirect_to is None:
+            return None
+        target_idx = self._redirect_to[idx]
+        return target_idx if target_idx >= 0 else None
+
+    def resolve(self, idx: int) -> int:
+        """리다이렉트면 최종 문서 번호, 아니면 그대로"""
+        target_idx = self.redirect_to(idx)
+        return idx if target_idx is None else target_idx
+
+
+def write_title_index(
+    path: str,
+    entries: List[Tuple[int, str, str]],
+    meta: Optional[dict] = None,
+    documents: Optional[DocumentTableBuilder] = None,
+):
+    """
+    (idx, original_title, normalized_title) 리스트로 인덱스 파일 생성
+
+    Args:
+        path: 저장할 파일 경로
+        entries: 데이터셋 순서대로의 제목 목록
+        meta: 헤더에 함께 저장할 정보 (문서 수 등)
+        documents: 문서별 메타데이터 (있으면 함께 저장)
+    """
+    keys = sorted({normalized for _, _, normalized in entries}, key=lambda s: s.encode('utf-8'))
+    key_ids = {key: i for i, key in enumerate(keys)}
+
+    postings_by_key: List[List[int]] = [[] for _ in keys]
+    entry_keys = array(INT32)
+    for idx, _, normalized in entries:
+        key_id = key_ids[normalized]
+        postings_by_key[key_id].append(idx)
+        entry_keys.append(key_id)
+
+    posting_offsets = array(INT32, [0])
+    postings = array(INT32)
+    for doc_ids in postings_by_key:
+        postings.extend(doc_ids)
+        posting_offsets.append(len(postings))
+    del postings_by_key
+
+    # 문자 -> 키 번호 역색인 (키 번호 오름차순)
+    keys_by_char = {}
+    for key_id, key in enumerate(keys):
+        for char in set(key):
+            key_list = keys_by_char.get(char)
+            if key_list is None:
+                key_list = keys_by_char[char] = array(INT32)
+            key_list.append(key_id)
+    chars = sorted(keys_by_char, key=lambda s: s.encode('utf-8'))
+    char_offsets = array(INT64, [0])
+    char_postings = array(INT32)
+    for char in chars:
+        char_postings.extend(keys_by_char[char])
+        char_offsets.append(len(char_postings))
+    del keys_by_char
+
+    # 하위 문서 접미사 -> 키 번호
+    keys_by_suffix = {}
+    for key_id, key in enumerate(keys):
+        suffix = subpage_suffix(key)
+        if suffix:
+            keys_by_suffix.setdefault(suffix, array(INT32)).append(key_id)
+    suffixes = sorted(keys_by_suffix, key=lambda s: s.encode('utf-8'))
+    suffix_offsets = array(INT64, [0])
+    suffix_postings = array(INT32)
+    for suffix in suffixes:
+        suffix_postings.extend(keys_by_suffix[suffix])
+        suffix_offsets.append(len(suffix_postings))
+    del keys_by_suffix
+
+    writer = IndexWriter()
+    writer.add_strings('keys', keys)
+    writer.add_array('postings.offsets', INT32, posting_offsets)
+    writer.add_array('postings', INT32, postings)
+    writer.add_array('entries.doc_id', INT32, (idx for idx, _, _ in entries))
+    writer.add_array('entries.key', INT32, entry_keys)
+    writer.add_strings('entries.title', (original for _, original, _ in entries))
+    writer.add_array('keys.length', INT32, (len(key) for key in keys))
+    writer.add_strings('chars', chars)
+    writer.add_array('chars.postings.offsets', INT64, char_offsets)
+    writer.add_array('chars.postings', INT32, char_postings)
+    writer.add_strings('suffixes', suffixes)
+    writer.add_array('suffixes.postings.offsets', INT64, suffix_offsets)
+    writer.add_array('suffixes.postings', INT32, suffix_postings)
+    if documents is not None:
+        documents.write_to(writer)
+    writer.write(path, meta=meta)
+
+
+def open_title_index(path: str) -> Tuple[IndexFile, TitleIndex, TitleList]:
+    """인덱스 파일을 mmap으로 열어 (파일, title_to_indices, title_list) 반환"""
+    index_file = IndexFile(path)
+    title_index = TitleIndex(index_file)
+    return index_file, title_index, TitleList(index_file, title_index)
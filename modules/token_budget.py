@@ -0,0 +1,311 @@
+"""토큰 예산 모듈
+
+- 모델별 토큰 수 추정 (네트워크 없이). 기본은 문자 종류별 비율로 추정하고,
+  register_tokenizer로 실제 토크나이저(예: 로컬에 인코딩 파일이 있는 tiktoken)를 연결할 수 있다.
+- 나무위키 문법 압축: 틀 포함, 표 서식, 각주, 파일/분류 링크, 매크로, 글자 서식, 반복되는 둘러보기 줄을 제거
+  (문서 링크 [[...]]는 인물 이름의 단서라 유지, 문서 전처리(document_preprocessor)에서 문서마다 한 번만 사용)
+- 모델별 입력 토큰 예산: 프롬프트를 만들기 전에 지시문을 뺀 나머지 예산에 맞춰 문서 부분만 자름
+  (보내는 메시지는 바꾸지 않고 토큰 수만 기록)
+"""
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+Tokenizer = Callable[[str], int]
+
+# 메시지 하나에 붙는 형식 토큰 (role, 구분자)과 응답 시작 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+TRUNCATION_MARKER = "\n\n... (내용이 길어 일부 생략) ..."
+
+# 모델 계열별 추정 비율: (ASCII 문자당 토큰, 한글 음절당 토큰, 그 외 문자당 토큰)
+# o200k 계열(gpt-4o, gpt-5)은 한글을 cl100k 계열보다 훨씬 적은 토큰으로 나눔
+_HEURISTIC_RATES = {
+    'o200k': (0.25, 0.7, 1.0),
+    'cl100k': (0.25, 1.3, 1.2),
+}
+_MODEL_FAMILIES = (
+    ('gpt-4o', 'o200k'),
+    ('gpt-5', 'o200k'),
+    ('o1', 'o200k'),
+    ('o3', 'o200k'),
+    ('o4', 'o200k'),
+    ('gpt-4', 'cl100k'),
+    ('gpt-3.5', 'cl100k'),
+)
+DEFAULT_FAMILY = 'o200k'
+
+_HANGUL = re.compile('[가-힣]')
+
+_tokenizers: Dict[str, Tokenizer] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def _heuristic_count(text: str, rates: Tuple[float, float, float]) -> int:
+    ascii_count = len(text.encode('ascii', 'ignore'))
+    hangul_count = len(_HANGUL.findall(text))
+    other_count = len(text) - ascii_count - hangul_count
+    ascii_rate, hangul_rate, other_rate = rates
+    return int(ascii_count * ascii_rate + hangul_count * hangul_rate + other_count * other_rate) + 1
+
+
+def register_tokenizer(model_prefix: str, tokenizer: Optional[Tokenizer]):
+    """
+    모델(이름 앞부분이 model_prefix인 모델)의 토큰 수 계산 함수 등록
+
+    Args:
+        model_prefix: 예: 'gpt-4o' (가장 길게 일치하는 것을 사용)
+        tokenizer: 텍스트 -> 토큰 수 (None이면 등록 해제하고 추정 비율 사용)
+    """
+    with _tokenizers_lock:
+        if tokenizer is None:
+            _tokenizers.pop(model_prefix, None)
+        else:
+            _tokenizers[model_prefix] = tokenizer
+
+
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """모델의 토큰 수 계산 함수 (등록된 토크나이저가 없으면 모델 계열별 추정)"""
+    model = model or ''
+    with _tokenizers_lock:
+        matches = [prefix for prefix in _tokenizers if model.startswith(prefix)]
+        if matches:
+            return _tokenizers[max(matches, key=len)]
+    family = next((family for prefix, family in _MODEL_FAMILIES if model.startswith(prefix)), DEFAULT_FAMILY)
+    rates = _HEURISTIC_RATES[family]
+    return lambda text: _heuristic_count(text, rates)
+
+
+def use_tiktoken() -> bool:
+    """
+    tiktoken이 설치되어 있으면 모델 계열별 인코딩을 토크나이저로 등록
+
+    인코딩 파일을 내려받을 수 없거나(오프라인, 캐시 없음) 설치되지 않았으면 추정 비율을 그대로 사용한다.
+
+    Returns:
+        등록 여부
+    """
+    try:
+        import tiktoken
+        encodings = {family: tiktoken.get_encoding(f'{family}_base') for family in _HEURISTIC_RATES}
+    except Exception as e:  # ImportError, 인코딩 파일 다운로드 실패
+        print(f"⚠️  tiktoken을 사용할 수 없어 토큰 수를 추정합니다: {e}")
+        return False
+    for prefix, family in _MODEL_FAMILIES:
+        encoding = encodings[family]
+        register_tokenizer(prefix, lambda text, encoding=encoding: len(encoding.encode(text, disallowed_special=())))
+    return True
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """텍스트의 토큰 수 (추정)"""
+    return get_tokenizer(model)(text) if text else 0
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    """채팅 메시지 전체의 입력 토큰 수 (형식 토큰 포함, 추정)"""
+    tokenizer = get_tokenizer(model)
+    total = REPLY_OVERHEAD_TOKENS
+    for message in messages:
+        content = message.get('content') or ''
+        total += MESSAGE_OVERHEAD_TOKENS + (tokenizer(content) if content else 0)
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None, marker: str = TRUNCATION_MARKER) -> str:
+    """
+    text가 max_tokens 토큰 이하가 되도록 뒤를 자름 (잘랐으면 marker를 붙임, marker 포함 max_tokens 이하)
+
+    토크나이저와 상관없이 동작하도록 글자 수를 이분 탐색한다.
+    """
+    tokenizer = get_tokenizer(model)
+    if tokenizer(text) <= max_tokens:
+        return text
+    limit = max_tokens - tokenizer(marker)
+    if limit <= 0:
+        return ''
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if tokenizer(text[:middle]) <= limit:
+            low = middle
+        else:
+            high = middle - 1
+    # 줄 중간에서 자르지 않도록 (너무 많이 버리게 되면 그대로)
+    cut = text.rfind('\n', 0, low)
+    if cut < low * 0.9:
+        cut = low
+    return text[:cut].rstrip() + marker
+
+
+# ---- 나무위키 문법 압축 ----
+
+# 한 줄 전체가 의미 없는 줄 (틀 포함, 목차/각주 매크로, 주석, 편집 링크, 접기 버튼)
+_DROP_LINE = re.compile(
+    r'^\s*(?:\[include\(.*\)\]|\[(?:목차|각주|tableofcontents|footnote)\]|##.*|\[편집\]|\[\s*펼치기\s*·\s*접기\s*\])\s*$',
+    re.IGNORECASE,
+)
+# [[파일:...]], [[분류:...]] 링크 (이미지 목록은 따로 전달됨)
+_FILE_LINK = re.compile(r'\[\[(?:파일|File|분류|Category):[^\]]*\]\]', re.IGNORECASE)
+# [[#s-1|문단 링크]] -> 문단 링크 (문서 링크는 인물 이름의 단서라 그대로 둠)
+_ANCHOR_LINK = re.compile(r'\[\[#[^\[\]|]*\|([^\[\]]*)\]\]')
+# [br] 줄바꿈, [age(...)] 같은 매크로
+_BR_MACRO = re.compile(r'\[br\]', re.IGNORECASE)
+_MACRO = re.compile(r'\[(?:include|age|dday|date|datetime|pagecount|youtube|kakaotv|nicovideo|vimeo|navertv|anchor|math)(?:\([^\]]*\))?\]', re.IGNORECASE)
+# [ruby(본문, ruby=읽는 법)] -> 본문 (인물 이름에 자주 쓰여 지우지 않음)
+_RUBY_MACRO = re.compile(r'\[ruby\(\s*([^,()\]]*?)\s*(?:,[^\]]*)?\)\]', re.IGNORECASE)
+# {{{#!wiki style="..."  /  {{{#!folding [ 펼치기 · 접기 ]  /  {{{+1  /  {{{#red  /  }}}
+_WIKI_BLOCK_OPEN = re.compile(r'\{\{\{#!(?:wiki(?:\s+[a-z-]+="[^"\n]*")*|folding[^\n]*)')
+_TEXT_STYLE_OPEN = re.compile(r'\{\{\{(?:[+-][1-5]|#[0-9a-zA-Z,#]+)\s?')
+_BLOCK_CLOSE = re.compile(r'\}\}\}')
+# 표 칸 서식 (<tablewidth=100%>, <bgcolor=#fff>, <-2>, <:>, <|3> ...)
+_CELL_STYLE = re.compile(r'<(?:table[a-z]*|bgcolor|color|width|height|rowbgcolor|rowcolor|colbgcolor|colcolor|nopad|[-|^v]?\d+|[:()])[^<>]*>', re.IGNORECASE)
+# '''굵게''', ''기울임'' (__, ,, 같은 서식 기호는 이미지 주소에도 나올 수 있어 그대로 둠)
+_TEXT_DECORATION = re.compile(r"'''|''")
+# 두 번 이상 나온 줄을 지우는 최소 길이 (반복되는 둘러보기 틀, 내비게이션 줄)
+REPEATED_LINE_MIN_LENGTH = 30
+
+
+def _remove_footnotes(text: str) -> str:
+    """[* 각주 내용] / [*기호 각주 내용] 제거 (안의 [[링크]] 같은 중첩 대괄호 포함)"""
+    if '[*' not in text:
+        return text
+    parts = []
+    i = 0
+    while True:
+        start = text.find('[*', i)
+        if start == -1:
+            parts.append(text[i:])
+            break
+        parts.append(text[i:start])
+        depth = 0
+        j = start
+        while j < len(text):
+            if text[j] == '[':
+                depth += 1
+            elif text[j] == ']':
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        i = j + 1
+    return ''.join(parts)
+
+
+def _compact_table_row(line: str) -> str:
+    """'||<bgcolor=#fff> 이름 || 설명 ||' -> '이름 | 설명' (내용 없는 칸 제거)"""
+    cells = [_CELL_STYLE.sub('', cell).strip() for cell in line.split('||')]
+    return ' | '.join(cell for cell in cells if cell)
+
+
+def compact_wiki_markup(text: str) -> str:
+    """
+    나무위키 문법과 웹 문서의 군더더기를 제거해 토큰을 줄임 (본문 내용과 문단 제목은 유지)
+
+    Args:
+        text: 나무위키 원문 또는 크롤링한 본문 텍스트 (일반 텍스트는 거의 그대로)
+
+    Returns:
+        압축한 텍스트
+    """
+    if not text:
+        return text
+    text = _remove_footnotes(text)
+    text = _FILE_LINK.sub('', text)
+    text = _ANCHOR_LINK.sub(r'\1', text)
+    text = _BR_MACRO.sub('\n', text)
+    text = _RUBY_MACRO.sub(r'\1', text)
+    text = _MACRO.sub('', text)
+    text = _WIKI_BLOCK_OPEN.sub('', text)
+    text = _TEXT_STYLE_OPEN.sub('', text)
+    text = _BLOCK_CLOSE.sub('', text)
+    text = _TEXT_DECORATION.sub('', text)
+
+    lines = []
+    seen = set()
+    blank = False
+    for line in text.split('\n'):
+        line = line.rstrip()
+        if _DROP_LINE.match(line):
+            continue
+        if line.lstrip().startswith('||'):
+            line = _compact_table_row(line)
+        if not line.strip():
+            # 빈 줄은 하나만
+            if lines and not blank:
+                lines.append('')
+            blank = True
+            continue
+        if len(line) >= REPEATED_LINE_MIN_LENGTH:
+            if line in seen:
+                continue
+            seen.add(line)
+        lines.append(line)
+        blank = False
+    return '\n'.join(lines).strip()
+
+
+# ---- 입력 예산 ----
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _model_stats(model: str) -> Dict[str, int]:
+    return _stats.setdefault(model, {'calls': 0, 'tokens': 0, 'over_budget': 0, 'completion_tokens': 0})
+
+
+def document_token_budget(
+    instruction_messages: List[Dict[str, str]], model: str, budget: Optional[int]
+) -> Optional[int]:
+    """
+    문서 부분에 쓸 수 있는 토큰 수 (프롬프트를 만들기 전에 문서를 여기에 맞춰 자름)
+
+    Args:
+        instruction_messages: 문서 자리를 비워 둔 메시지 (시스템 메시지, 지시문, 응답 형식)
+        model: 모델 이름 (토큰 추정에 사용)
+        budget: 입력 토큰 예산 (None이면 제한 없음)
+
+    Returns:
+        budget - 지시문 토큰 (0 이상, budget이 None이면 None)
+    """
+    if budget is None:
+        return None
+    return max(0, budget - count_message_tokens(instruction_messages, model))
+
+
+def measure_messages(
+    messages: List[Dict[str, str]], model: str, budget: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    보낼 메시지의 입력 토큰 수를 세어 통계에 기록 (메시지는 바꾸지 않음)
+
+    Returns:
+        {'tokens', 'budget', 'over_budget'}
+    """
+    tokens = count_message_tokens(messages, model)
+    over_budget = budget is not None and tokens > budget
+    with _stats_lock:
+        stats = _model_stats(model)
+        stats['calls'] += 1
+        stats['tokens'] += tokens
+        stats['over_budget'] += int(over_budget)
+    return {'tokens': tokens, 'budget': budget, 'over_budget': over_budget}
+
+
+def record_completion_tokens(model: str, tokens: int):
+    """응답 토큰 수 기록 (API가 준 값 또는 추정)"""
+    with _stats_lock:
+        _model_stats(model)['completion_tokens'] += tokens
+
+
+def get_token_budget_stats() -> Dict[str, Dict[str, Any]]:
+    """모델별 평균 입력/출력 토큰과 예산을 넘은 호출 수 (/metrics용, 압축으로 줄어든 비율은 get_preprocess_stats)"""
+    with _stats_lock:
+        snapshot = {model: dict(stats) for model, stats in _stats.items()}
+    for stats in snapshot.values():
+        calls = stats['calls'] or 1
+        stats['average_tokens'] = round(stats['tokens'] / calls, 1)
+        stats['average_completion_tokens'] = round(stats['completion_tokens'] / calls, 1)
+    return snapshot
@@ -0,0 +1,136 @@
+"""관계 그래프 생성 방식 벤치마크 ('single' vs 'map_reduce')
+
+OpenAI 대신 로컬 가짜 LLM으로 두 방식의 전체 소요 시간, 입력/출력 토큰, 결과 그래프 크기를 비교합니다.
+가짜 LLM은 입력/출력 토큰 수에 비례해 기다린 뒤, 프롬프트에서 함께 언급된 인물 쌍으로 관계를 만들어 응답합니다.
+
+사용법:
+    python scripts/benchmark_graph_extraction.py --characters 20 --workers 4
+    # GPT-5처럼 느린 모델 흉내 (출력 초당 토큰 수, 입력 1000토큰당 초)
+    python scripts/benchmark_graph_extraction.py --output-tps 40 --input-seconds-per-1k 0.5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import graph_generator  # noqa: E402
+from modules.context_packer import estimate_tokens  # noqa: E402
+
+
+def make_documents(character_count, sections, seed):
+    """메인/등장인물 목록/인물 문서 형태의 가짜 문서 (웹 문서처럼 번호 줄 + 제목 + [편집])"""
+    rng = random.Random(seed)
+    names = [f"인물{chr(0xAC00 + i * 37)}{chr(0xAC00 + i * 53)}" for i in range(character_count)]
+
+    def paragraph(length, mentioned):
+        people = rng.sample(names, mentioned)
+        sentences = [f"{person}은(는) 사건을 겪으며 다른 인물과 갈등한다." for person in people]
+        return ' '.join(sentences) + ' 설명 문장이 이어진다.' * length
+
+    def document(title, doc_type):
+        lines = [title, '[목차]'] + [f"{i}.\n섹션{i}" for i in range(1, sections + 1)]
+        lines.append(f"1.\n개요\n[편집]\n{title}은 작품의 주요 인물이다. " + paragraph(5, 2))
+        for i in range(2, sections + 1):
+            lines.append(f"{i}.\n섹션{i}\n[편집]\n" + paragraph(rng.randint(5, 20), rng.randint(0, 3)))
+        return {
+            'title': title,
+            'text': '\n'.join(lines),
+            'type': doc_type,
+            'image_urls': [{'url': f'https://i.namu.wiki/i/{title}.webp', 'alt': title}],
+        }
+
+    documents = [document('작품', 'main'), document('작품/등장인물', 'character_list')]
+    documents += [document(name, 'character') for name in names]
+    return documents, names
+
+
+class MockLLM:
+    """call_ai_api 대신 사용하는 가짜 LLM (토큰 수에 비례한 지연 + 함께 언급된 인물 쌍으로 만든 그래프)"""
+
+    def __init__(self, names, output_tps, input_seconds_per_1k):
+        self.names = names
+        self.output_tps = output_tps
+        self.input_seconds_per_1k = input_seconds_per_1k
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def __call__(self, messages, model, temperature=0.5, use_cache=True, on_delta=None, **kwargs):
+        prompt = messages[-1]['content']
+        # 문서 부분과 인물 목록 요구 부분 ('중요: ...')
+        body, _, instructions = prompt.partition('\n\n위 문서들을 분석하여')[0].partition('\n\n중요:')
+        mentioned = [name for name in self.names if name in body]
+        if '이번에는 다음' in instructions:
+            focus_text = instructions.partition('전체 인물 목록')[0]
+            focus = [name for name in self.names if name in focus_text]
+        else:
+            focus = mentioned
+
+        relationships = []
+        for line in body.split('\n'):
+            present = [name for name in mentioned if name in line]
+            for source in present:
+                if source not in focus:
+                    continue
+                for target in present:
+                    if target != source:
+                        relationships.append({'from': source, 'to': target, 'relation': '함께 사건을 겪은 관계'})
+        graph = {
+            'characters': [{'name': name, 'image_src': None, 'description': f'{name}의 설명'} for name in mentioned],
+            'relationships': list({(r['from'], r['to']): r for r in relationships}.values()),
+        }
+        response = json.dumps(graph, ensure_ascii=False)
+
+        input_tokens = sum(estimate_tokens(message['content'], model) for message in messages)
+        output_tokens = estimate_tokens(response, model)
+        time.sleep(input_tokens / 1000 * self.input_seconds_per_1k + output_tokens / self.output_tps)
+        with self._lock:
+            self.calls.append((input_tokens, output_tokens))
+        return response
+
+
+def benchmark(mode, documents, names, args):
+    llm = MockLLM(names, args.output_tps, args.input_seconds_per_1k)
+    graph_generator.call_ai_api = llm
+    start = time.perf_counter()
+    graph = graph_generator.extract_character_relationships_with_ai(
+        '작품', documents, character_names=names, mode=mode, map_max_workers=args.workers, use_cache=False,
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        'elapsed': elapsed,
+        'calls': len(llm.calls),
+        'input_tokens': sum(tokens for tokens, _ in llm.calls),
+        'output_tokens': sum(tokens for _, tokens in llm.calls),
+        'characters': len(graph['characters']),
+        'relationships': len(graph['relationships']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--characters', type=int, default=20, help='인물 수')
+    parser.add_argument('--sections', type=int, default=14, help='문서당 섹션 수')
+    parser.add_argument('--workers', type=int, default=graph_generator.MAP_MAX_WORKERS, help='map_reduce 동시 요청 수')
+    parser.add_argument('--output-tps', type=float, default=400, help='가짜 LLM 출력 속도 (초당 토큰)')
+    parser.add_argument('--input-seconds-per-1k', type=float, default=0.05, help='가짜 LLM 입력 1000토큰당 처리 시간 (초)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    documents, names = make_documents(args.characters, args.sections, args.seed)
+    results = {mode: benchmark(mode, documents, names, args) for mode in graph_generator.GRAPH_EXTRACTION_MODES}
+
+    print()
+    print(f"{'방식':<12} {'시간(초)':>9} {'호출':>5} {'입력 토큰':>10} {'출력 토큰':>10} {'인물':>5} {'관계':>5}")
+    for mode, result in results.items():
+        print(f"{mode:<12} {result['elapsed']:>9.2f} {result['calls']:>5} {result['input_tokens']:>10} "
+              f"{result['output_tokens']:>10} {result['characters']:>5} {result['relationships']:>5}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""나무위키 HTML 추출 엔진 벤치마크 ('fast' vs 'bs4')
+
+저장된 나무위키 페이지(HTML 파일)로 두 엔진의 결과가 같은지 확인하고 페이지당 처리 시간을 비교합니다.
+
+사용법:
+    # 비교할 페이지 저장 (fixtures/html/<제목>.html)
+    python scripts/benchmark_html_parser.py --save 손오공 베지터 --fixtures fixtures/html
+
+    # 벤치마크
+    python scripts/benchmark_html_parser.py --fixtures fixtures/html --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.namuwiki_web import (  # noqa: E402
+    HTML_PARSER_ENGINES,
+    build_namuwiki_url,
+    get_http_session,
+    parse_namuwiki_html,
+)
+
+
+def save_fixtures(titles, fixtures_dir):
+    """나무위키 페이지 원본 HTML을 fixtures_dir에 저장"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    for title in titles:
+        url = build_namuwiki_url(title)
+        response = get_http_session().get(url, timeout=10)
+        response.raise_for_status()
+        path = os.path.join(fixtures_dir, f"{title.replace('/', '_')}.html")
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        print(f"💾 저장: {path} ({len(response.content) / 1024:.0f}KB)")
+
+
+def load_fixtures(fixtures_dir):
+    pages = []
+    for name in sorted(os.listdir(fixtures_dir)):
+        if name.endswith('.html'):
+            with open(os.path.join(fixtures_dir, name), 'rb') as f:
+                pages.append((name[:-len('.html')], f.read()))
+    return pages
+
+
+def benchmark(pages, repeat):
+    """엔진별 페이지당 평균 시간(ms)을 출력하고 결과가 다른 페이지 수를 반환"""
+    mismatches = 0
+    totals = {engine: 0.0 for engine in HTML_PARSER_ENGINES}
+    
+    print(f"{'페이지':<30} {'크기':>8} " + ' '.join(f'{engine:>10}' for engine in HTML_PARSER_ENGINES))
+    for title, content in pages:
+        results = {}
+        timings = {}
+        for engine in HTML_PARSER_ENGINES:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                results[engine] = parse_namuwiki_html(content, title, build_namuwiki_url(title), engine=engine)
+            timings[engine] = (time.perf_counter() - start) / repeat * 1000
+            totals[engine] += timings[engine]
+        
+        same = all(results[engine] == results['bs4'] for engine in HTML_PARSER_ENGINES)
+        if not same:
+            mismatches += 1
+        print(
+            f"{title[:30]:<30} {len(content) / 1024:>6.0f}KB "
+            + ' '.join(f'{timings[engine]:>8.1f}ms' for engine in HTML_PARSER_ENGINES)
+            + ('' if same else '  ❌ 결과 다름')
+        )
+    
+    if pages:
+        print(
+            "\n평균: " + ', '.join(f'{engine} {totals[engine] / len(pages):.1f}ms' for engine in HTML_PARSER_ENGINES)
+            + f" (fast가 {totals['bs4'] / max(totals['fast'], 1e-9):.1f}배 빠름)"
+        )
+    print(f"결과가 다른 페이지: {mismatches}/{len(pages)}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default='fixtures/html', help='저장된 HTML 페이지 폴더')
+    parser.add_argument('--repeat', type=int, default=3, help='페이지당 반복 횟수')
+    parser.add_argument('--save', nargs='+', metavar='TITLE', help='나무위키에서 페이지를 받아 fixtures에 저장')
+    args = parser.parse_args()
+    
+    if args.save:
+        save_fixtures(args.save, args.fixtures)
+    
+    pages = load_fixtures(args.fixtures) if os.path.isdir(args.fixtures) else []
+    if not pages:
+        print(f"⚠️  {args.fixtures}에 HTML 파일이 없습니다. --save로 먼저 저장하세요.")
+        return 1
+    return 1 if benchmark(pages, args.repeat) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
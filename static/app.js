@@ -86,77 +86,22 @@ async function handleGenerate() {
     if (graphSection) hideSection(graphSection);
     
     try {
-        // 1. 인물 추출
-        if (loadingText) {
-            loadingText.textContent = '인물 추출 중...';
-        }
-        
-        const extractResponse = await fetch('/api/extract-characters', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ keyword }),
-        });
-        
-        const extractData = await extractResponse.json();
-        
-        if (!extractResponse.ok) {
-            throw new Error(extractData.error || '인물 추출에 실패했습니다.');
-        }
-        
-        currentCharacters = extractData.characters;
-        console.log(`인물 추출 완료: ${currentCharacters.length}명`);
-        
-        // 2. 문서 크롤링
-        if (loadingText) {
-            loadingText.textContent = `문서 크롤링 중... (${currentCharacters.length}개)`;
-        }
-        
-        const crawlResponse = await fetch('/api/crawl-documents', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ character_names: currentCharacters }),
-        });
-        
-        const crawlData = await crawlResponse.json();
-        
-        if (!crawlResponse.ok) {
-            throw new Error(crawlData.error || '문서 크롤링에 실패했습니다.');
-        }
-        
-        console.log(`크롤링 완료: ${crawlData.crawled_count}개 성공, ${crawlData.failed_count}개 실패`);
-        
-        // 3. 관계도 생성
-        if (loadingText) {
-            loadingText.textContent = '관계도 생성 중...';
-        }
-        
+        // 1~3. 인물 추출 + 문서 크롤링 + 관계도 생성 (서버 작업 큐에서 실행, 진행 상황은 폴링)
         // 선택된 모델 가져오기
         const modelSelect = document.getElementById('model-select');
         const selectedModel = modelSelect?.value || 'gpt-4o-mini';
         
-        const graphResponse = await fetch('/api/generate-graph', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                keyword: currentKeyword,
-                character_names: currentCharacters,
-                character_documents: crawlData.documents,
-                model: selectedModel,
-            }),
-        });
-        
-        const graphData = await graphResponse.json();
+        // 체크하면 서버에 저장된 관계도를 쓰지 않고 새로 생성
+        const refresh = document.getElementById('refresh-checkbox')?.checked || false;
         
-        if (!graphResponse.ok) {
-            throw new Error(graphData.error || '관계도 생성에 실패했습니다.');
+        const graphData = await runGraphJob(currentKeyword, selectedModel, refresh);
+        if (graphData.stored) {
+            console.log('서버에 저장된 관계도를 불러왔습니다:', new Date(graphData.stored.created_at * 1000));
         }
         
+        currentCharacters = graphData.characters;
+        console.log(`크롤링 완료: ${graphData.crawl.crawled_count}개 성공, ${graphData.crawl.failed_count}개 실패`);
+        console.log('단계별 소요 시간:', graphData.stages);
         console.log('API 응답:', graphData);
         console.log('그래프 데이터:', graphData.graph);
         
@@ -166,6 +111,9 @@ async function handleGenerate() {
             throw new Error('그래프 데이터 형식이 올바르지 않습니다.');
         }
         
+        if (graphData.graph.partial) {
+            console.warn('AI 응답이 중간에 끊겨 완성된 부분만 표시합니다.');
+        }
         visualizeGraph(graphData.graph);
         
         // 5. 로컬스토리지에 저장
@@ -181,6 +129,130 @@ async function handleGenerate() {
     }
 }
 
+// 작업 상태 폴링 간격 (ms)
+const JOB_POLL_INTERVAL = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// 관계도 생성 진행 이벤트 처리 (인물 목록이 나오면 관계가 완성되기 전에 노드부터 그림)
+function createProgressHandler(keyword) {
+    let crawledCount = 0;
+    // AI 응답에서 완성된 인물/관계를 받는 대로 그리는 중간 그래프
+    const liveGraph = { characters: [], relationships: [] };
+    const liveRelationKeys = new Set();
+    let liveGraphChanged = false;
+    
+    const handleEvent = (event, data) => {
+        switch (event) {
+            case 'documents':
+                console.log('메인 문서:', data.main_document.title);
+                if (loadingText) loadingText.textContent = '인물 추출 중...';
+                break;
+            case 'characters':
+                currentCharacters = data.characters;
+                liveGraph.characters = currentCharacters.map((name) => ({ name }));
+                console.log(`인물 추출 완료: ${currentCharacters.length}명`);
+                if (graphSection) showSection(graphSection);
+                visualizeGraph({ characters: currentCharacters, relationships: [] });
+                showGraphView(keyword);
+                if (loadingText) loadingText.textContent = `문서 수집 중... (0/${currentCharacters.length})`;
+                break;
+            case 'character_crawled':
+                crawledCount += 1;
+                if (loadingText) loadingText.textContent = `문서 수집 중... (${crawledCount}/${currentCharacters.length})`;
+                break;
+            case 'crawled':
+                if (loadingText) loadingText.textContent = '관계도 생성 중...';
+                break;
+            case 'graph_item':
+                if (data.kind === 'character') {
+                    const index = liveGraph.characters.findIndex((char) => char.name === data.item.name);
+                    if (index === -1) {
+                        liveGraph.characters.push(data.item);
+                    } else {
+                        liveGraph.characters[index] = { ...liveGraph.characters[index], ...data.item };
+                    }
+                } else {
+                    const relationKey = `${data.item.from}->${data.item.to}`;
+                    if (liveRelationKeys.has(relationKey)) break;
+                    liveRelationKeys.add(relationKey);
+                    liveGraph.relationships.push(data.item);
+                    if (loadingText) loadingText.textContent = `관계도 생성 중... (관계 ${liveGraph.relationships.length}개)`;
+                }
+                liveGraphChanged = true;
+                break;
+            case 'graph_chunk':
+                if (loadingText) loadingText.textContent = `관계도 생성 중... (${data.done}/${data.total})`;
+                break;
+        }
+    };
+    
+    // 폴링 응답 하나의 이벤트를 모두 반영한 뒤 중간 그래프를 한 번만 다시 그림
+    handleEvent.flush = () => {
+        if (!liveGraphChanged) return;
+        liveGraphChanged = false;
+        visualizeGraph(liveGraph);
+    };
+    return handleEvent;
+}
+
+// 관계도 생성 작업을 제출하고 끝날 때까지 폴링 (서버 요청 스레드를 붙잡지 않음)
+async function runGraphJob(keyword, model, refresh = false) {
+    if (loadingText) loadingText.textContent = '작업 대기 중...';
+    
+    const submitResponse = await fetch('/api/jobs', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ keyword, model, refresh }),
+    });
+    const submitData = await submitResponse.json();
+    
+    if (!submitResponse.ok) {
+        throw new Error(submitData.error || '관계도 생성 요청에 실패했습니다.');
+    }
+    // 이미 만든 관계도는 작업 없이 바로 반환됨
+    if (submitData.status === 'done') {
+        return submitData.result;
+    }
+    if (submitData.coalesced) {
+        console.log('같은 작품의 진행 중인 작업에 합류했습니다:', submitData.job_id);
+    }
+    
+    const handleEvent = createProgressHandler(keyword);
+    let lastSeq = 0;
+    
+    while (true) {
+        const jobResponse = await fetch(`${submitData.poll_url}?after=${lastSeq}`);
+        const job = await jobResponse.json();
+        
+        if (!jobResponse.ok) {
+            throw new Error(job.error || '작업 상태를 가져오지 못했습니다.');
+        }
+        
+        job.events.forEach((item) => {
+            lastSeq = item.seq;
+            handleEvent(item.event, item.data);
+        });
+        
+        if (job.status === 'done') {
+            return job.result;
+        }
+        handleEvent.flush();
+        
+        if (job.status === 'failed') {
+            throw new Error(job.error || '관계도 생성에 실패했습니다.');
+        }
+        await sleep(JOB_POLL_INTERVAL);
+    }
+}
+
+// 노드 이미지가 있는지 (원본 URL 또는 서버 이미지 프록시 주소 /img/<키>)
+function hasNodeImage(d) {
+    return Boolean(d.image_src) && (d.image_src.startsWith('http') || d.image_src.startsWith('/img/'));
+}
+
 // 그래프 시각화
 function visualizeGraph(graphData) {
     console.log('그래프 데이터:', graphData);
@@ -394,7 +466,7 @@ function visualizeGraph(graphData) {
     node.each(function(d) {
         const nodeGroup = d3.select(this);
         
-        if (d.image_src && d.image_src.startsWith('http')) {
+        if (hasNodeImage(d)) {
             // 이미지 노드 - 원형 배경
             nodeGroup.append('circle')
                 .attr('r', 25)
@@ -424,7 +496,7 @@ function visualizeGraph(graphData) {
         // 노드 레이블
         nodeGroup.append('text')
             .text(d => d.label)
-            .attr('dy', d.image_src && d.image_src.startsWith('http') ? 40 : 35)
+            .attr('dy', hasNodeImage(d) ? 40 : 35)
             .attr('text-anchor', 'middle')
             .style('font-size', '12px')
             .style('fill', '#333')
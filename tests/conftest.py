@@ -0,0 +1,5 @@
+"""테스트 공용 설정 (저장소 루트를 import 경로에 추가해 modules 패키지를 불러옴)"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,131 @@
+"""call_ai_api: 프로세스 공용 OpenAI 클라이언트(연결 풀)를 재사용하고 fork 후에는 새로 만드는지 확인"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules import ai_service
+
+
+class StubOpenAI(ThreadingHTTPServer):
+    """/v1/chat/completions 흉내 서버 (요청 수와 클라이언트 연결(포트) 수 기록)"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubOpenAIHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.client_ports = set()
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.client_ports.add(self.client_address[1])
+        body = json.dumps({
+            'id': 'chatcmpl-test',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': payload['model'],
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': f"응답: {payload['messages'][-1]['content']}"},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 5, 'completion_tokens': 3, 'total_tokens': 8},
+        }, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    server = StubOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setattr(ai_service, 'OPENAI_BASE_URL', f'http://127.0.0.1:{server.server_address[1]}/v1')
+    monkeypatch.setattr(ai_service, '_llm_cache', None)
+    monkeypatch.setattr(ai_service, '_client', None)
+    monkeypatch.setattr(ai_service, '_client_pid', None)
+    yield server
+    ai_service.close_openai_client()
+    server.shutdown()
+    server.server_close()
+
+
+def _ask(text):
+    return ai_service.call_ai_api([{'role': 'user', 'content': text}], model='gpt-4o-mini')
+
+
+def test_one_client_serves_repeated_calls(stub_openai):
+    assert _ask('첫 질문') == '응답: 첫 질문'
+    client = ai_service.get_openai_client()
+    for i in range(4):
+        assert _ask(f'질문 {i}') == f'응답: 질문 {i}'
+
+    assert ai_service.get_openai_client() is client
+    assert stub_openai.requests == 5
+    # 같은 keep-alive 연결로 모든 요청을 보냄
+    assert len(stub_openai.client_ports) == 1
+    assert ai_service.get_ai_client_stats()['pool']['open_connections'] == 1
+
+
+def test_client_rebuilt_after_fork(stub_openai, monkeypatch):
+    _ask('부모 프로세스')
+    parent_client = ai_service.get_openai_client()
+    parent_pid = ai_service.os.getpid()
+
+    # fork된 워커처럼 pid가 바뀌면 부모의 연결 풀을 쓰지 않고 새 클라이언트를 만듦
+    monkeypatch.setattr(ai_service.os, 'getpid', lambda: parent_pid + 1)
+    assert _ask('자식 프로세스') == '응답: 자식 프로세스'
+    child_client = ai_service.get_openai_client()
+
+    assert child_client is not parent_client
+    assert ai_service.get_openai_client() is child_client
+    assert len(stub_openai.client_ports) == 2
+
+
+class _FailingStream:
+    """조각 하나를 보낸 뒤 temperature 오류를 내는 스트림"""
+
+    def __init__(self):
+        self.response = type('Response', (), {'close': lambda self: None})()
+
+    def __iter__(self):
+        delta = type('Delta', (), {'content': '{"characters": ['})()
+        choice = type('Choice', (), {'delta': delta})()
+        yield type('Chunk', (), {'choices': [choice], 'usage': None})()
+        raise RuntimeError("Unsupported value: 'temperature'")
+
+
+def test_streaming_not_retried_after_delta(monkeypatch):
+    calls = []
+
+    def create(**params):
+        calls.append(params)
+        return _FailingStream()
+
+    completions = type('Completions', (), {'create': staticmethod(create)})()
+    client = type('Client', (), {'chat': type('Chat', (), {'completions': completions})()})()
+    monkeypatch.setattr(ai_service, 'get_openai_client', lambda: client)
+
+    deltas = []
+    with pytest.raises(RuntimeError):
+        ai_service._request_chat_completion(
+            [{'role': 'user', 'content': '질문'}], 'gpt-5', 0.3, on_delta=deltas.append
+        )
+    # 이미 전달한 조각이 다시 오지 않도록 temperature 없이 재요청하지 않음
+    assert len(calls) == 1
+    assert deltas == ['{"characters": [']
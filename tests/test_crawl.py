@@ -0,0 +1,212 @@
+"""crawl_namuwiki_pages: 로컬 HTTP 서버로 호스트당 동시 요청 제한, 제한 시간, keep-alive 세션 재사용, 페이지 캐시 재검증 확인"""
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules import namuwiki_web
+from modules.page_cache import PageCache
+
+PAGE = '<html><body><h1>{title}</h1><div id="app"><p>{title} 본문입니다.</p></div></body></html>'
+LAST_MODIFIED = 'Sat, 17 Oct 2026 00:00:00 GMT'
+
+
+class StubNamuwiki(ThreadingHTTPServer):
+    """요청 수, 동시 요청 수 최댓값, 클라이언트 연결(포트) 수를 기록하는 나무위키 흉내 서버"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+        self.client_ports = set()
+        self.delays = {}  # 제목 -> 응답 전 대기 시간 (초)
+        self.trickle = set()  # 본문을 조금씩 보내는 제목 (3초 동안 0.1초마다)
+        self.default_delay = 0.0
+        self.conditional_headers = []  # 요청별 (If-None-Match, If-Modified-Since)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        title = urllib.parse.unquote(self.path[len('/w/'):])
+        with server.lock:
+            server.requests += 1
+            server.client_ports.add(self.client_address[1])
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.conditional_headers.append((self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')))
+        etag = f'"{urllib.parse.quote(title)}-v1"'
+        try:
+            time.sleep(server.delays.get(title, server.default_delay))
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            body = PAGE.format(title=title).encode('utf-8')
+            padding = b' ' * 30 if title in server.trickle else b''
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body) + len(padding)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+            for byte in padding:
+                self.wfile.flush()
+                time.sleep(0.1)
+                self.wfile.write(bytes([byte]))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    server = StubNamuwiki()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(namuwiki_web, 'NAMUWIKI_BASE_URL', f'http://127.0.0.1:{server.server_address[1]}')
+    monkeypatch.setattr(namuwiki_web, '_page_cache', None)
+    monkeypatch.setattr(namuwiki_web, '_session', None)
+    monkeypatch.setattr(namuwiki_web, '_host_semaphores', {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _crawl_threads():
+    return [t for t in threading.enumerate() if t.name.startswith('namuwiki-crawl')]
+
+
+@pytest.mark.parametrize('limit, min_rounds, max_rounds', [(1, 6, 7.5), (2, 3, 4.5), (6, 1, 2.5)])
+def test_per_host_concurrency_limit(stub_server, monkeypatch, limit, min_rounds, max_rounds):
+    delay = 0.2
+    monkeypatch.setattr(namuwiki_web, 'MAX_CONCURRENCY_PER_HOST', limit)
+    stub_server.default_delay = delay
+    titles = [f'인물{i}' for i in range(6)]
+
+    start = time.time()
+    documents, statuses = namuwiki_web.crawl_namuwiki_pages(titles, max_workers=6, deadline=10)
+    elapsed = time.time() - start
+
+    assert [doc['title'] for doc in documents] == titles
+    assert all(status['status'] == 'ok' for status in statuses)
+    assert stub_server.max_active == limit
+    # 느린 페이지 6개를 limit개씩 처리하므로 전체 시간은 6 / limit번의 응답 대기 시간
+    assert min_rounds * delay <= elapsed < max_rounds * delay
+
+
+def test_deadline_cuts_off_slow_pages(stub_server):
+    stub_server.delays['느린 문서'] = 3.0
+    stub_server.trickle.add('느린 본문')  # 읽기 타임아웃에 걸리지 않을 만큼씩 3초 동안 보냄
+    start = time.time()
+
+    documents, statuses = namuwiki_web.crawl_namuwiki_pages(
+        ['빠른 문서', '느린 문서', '느린 본문'], max_workers=3, deadline=0.5
+    )
+
+    assert time.time() - start < 1.5
+    assert [doc['title'] for doc in documents] == ['빠른 문서']
+    assert [s['status'] for s in statuses] == ['ok', 'timeout', 'timeout']
+    # 진행 중이던 요청도 제한 시간이 지나면 끝나 크롤링 스레드가 남지 않음
+    for _ in range(20):
+        if not _crawl_threads():
+            break
+        time.sleep(0.1)
+    assert not _crawl_threads()
+
+
+def test_session_reused_across_crawls(stub_server):
+    titles = [f'문서{i}' for i in range(4)]
+
+    namuwiki_web.crawl_namuwiki_pages(titles[:2], max_workers=1, deadline=10)
+    session = namuwiki_web.get_http_session()
+    namuwiki_web.crawl_namuwiki_pages(titles[2:], max_workers=1, deadline=10)
+
+    assert namuwiki_web.get_http_session() is session
+    assert stub_server.requests == 4
+    # 순차 요청 4개가 keep-alive 연결 하나로 처리됨
+    assert len(stub_server.client_ports) == 1
+
+
+def test_shared_fetch_returns_independent_copies(monkeypatch):
+    release = threading.Event()
+    fetched = {'title': '문서', 'text': '본문', 'image_urls': ['https://i.namu.wiki/a.webp']}
+
+    def slow_fetch(title, timeout, deadline):
+        release.wait(5)
+        return fetched
+
+    monkeypatch.setattr(namuwiki_web, '_fetch_namuwiki_page', slow_fetch)
+    docs = []
+    threads = [threading.Thread(target=lambda: docs.append(namuwiki_web.fetch_namuwiki_page('문서'))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    # 같은 결과를 나눠 받아도 한 쪽에서 image_urls를 고치면 다른 쪽에는 영향이 없음
+    docs[0]['image_urls'].append('https://i.namu.wiki/b.webp')
+    assert docs[1]['image_urls'] == ['https://i.namu.wiki/a.webp']
+    assert fetched['image_urls'] == ['https://i.namu.wiki/a.webp']
+
+
+def test_waiter_with_time_left_refetches_after_leader_deadline(stub_server):
+    stub_server.delays['공유 문서'] = 0.6
+    results = {}
+
+    def fetch(name, deadline):
+        results[name] = namuwiki_web.fetch_namuwiki_page('공유 문서', timeout=5, deadline=time.time() + deadline)
+
+    # 제한 시간이 짧은 요청이 먼저 가져오기 시작하고, 시간이 넉넉한 요청이 그 결과를 기다림
+    leader = threading.Thread(target=fetch, args=('short', 0.3))
+    leader.start()
+    time.sleep(0.1)
+    waiter = threading.Thread(target=fetch, args=('long', 5))
+    waiter.start()
+    leader.join()
+    waiter.join()
+
+    assert results['short'] is None
+    assert results['long'] is not None and results['long']['title'] == '공유 문서'
+    assert stub_server.requests == 2
+
+
+def test_fresh_cache_hit_skips_request(stub_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(namuwiki_web, '_page_cache', PageCache(str(tmp_path / 'pages.db'), ttl=3600))
+
+    first = namuwiki_web.fetch_namuwiki_page('캐시 문서')
+    second = namuwiki_web.fetch_namuwiki_page('캐시 문서')
+
+    assert second == first
+    assert stub_server.requests == 1
+
+
+def test_stale_cache_hit_revalidates_with_conditional_request(stub_server, monkeypatch, tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.db'), ttl=0)  # 저장하자마자 오래된 항목이 됨
+    monkeypatch.setattr(namuwiki_web, '_page_cache', cache)
+
+    first = namuwiki_web.fetch_namuwiki_page('캐시 문서')
+    second = namuwiki_web.fetch_namuwiki_page('캐시 문서')
+
+    assert second == first
+    assert stub_server.requests == 2
+    # 두 번째 요청은 저장된 ETag/Last-Modified로 보낸 조건부 요청이고 304 응답으로 캐시를 재사용
+    assert stub_server.conditional_headers == [(None, None), (f'"{urllib.parse.quote("캐시 문서")}-v1"', LAST_MODIFIED)]
+    stats = cache.stats()
+    assert (stats['stale'], stats['revalidated'], stats['stores']) == (1, 1, 1)
@@ -0,0 +1,144 @@
+"""문자 역색인으로 후보를 추린 제목 검색이 전체 순회(SequenceMatcher) 결과와 같은지 확인"""
+from difflib import SequenceMatcher
+
+import pytest
+
+from modules.document_search import (
+    _find_candidates_with_char_index,
+    find_all_candidates_by_keyword,
+    find_most_similar_document,
+    find_titles_by_suffix,
+)
+from modules.namuwiki_dataset import build_title_index, normalize_title
+
+BODY = '본문 ' * 60
+
+TITLES = [
+    ('원피스', BODY),
+    ('원피스/등장인물', BODY),
+    ('원피스 필름 레드', BODY),
+    ('원피스(애니메이션)', BODY),
+    ('원피스 에피소드 오브 알라바스타', BODY),
+    ('ONE PIECE', '#redirect 원피스'),
+    ('나루토', BODY),
+    ('나루토/등장인물', BODY),
+    ('나루토 질풍전', BODY),
+    ('NARUTO', '#redirect 나루토'),
+    ('우즈마키 나루토', BODY),
+    ('귀멸의 칼날', BODY),
+    ('귀멸의 칼날/등장인물', BODY),
+    ('귀멸의 칼날/설정', BODY),
+    ('귀칼', '#redirect 귀멸의 칼날'),
+    ('카마도 탄지로', BODY),
+    ('진격의 거인', BODY),
+    ('진격의 거인/등장인물', BODY),
+    ('진격의 거인/줄거리', BODY),
+    ('진격의 거인(애니메이션)', BODY),
+    ('주술회전', BODY),
+    ('주술회전/등장인물', BODY),
+    ('체인소 맨/등장인물', BODY),
+    ('체인소 맨', BODY),
+    ('스파이 패밀리/등장인물', BODY),
+    ('스파이 패밀리', BODY),
+    ('SPY×FAMILY', '#redirect 스파이 패밀리'),
+    ('블루 록', BODY),
+    ('블루 아카이브/등장인물', BODY),
+    ('블리치', BODY),
+    ('블리치/등장인물', BODY),
+    ('유희왕 5D\'s', BODY),
+    ('유희왕 5D\'s/등장인물', BODY),
+    ('최강의 원피스 팬', BODY),
+]
+
+KEYWORDS = ['원피스', '원피스 등장인물', 'one piece', '나루토', 'naruto', '귀칼', '귀멸', '진격의거인',
+            '주술 회전', '체인소맨', '스파이패밀리', '블루', '유희왕 5ds', '탄지로', '없는제목']
+SUFFIX_KEYWORDS = ['원피스', '나루토', '귀멸의 칼날', '진격', '블루', '유희왕 5D\'s', '체인소']
+
+
+def brute_force_ranking(keyword, suffix=None, top_k=5):
+    """전체 제목을 SequenceMatcher로 훑은 상위 top_k (calculate_title_similarity와 같은 가중치)"""
+    normalized_keyword = normalize_title(keyword)
+    normalized_suffix = normalize_title(suffix) if suffix else None
+    ranking = []
+    for idx, (title, _) in enumerate(TITLES):
+        normalized = normalize_title(title)
+        if normalized_suffix and not normalized.endswith(normalized_suffix):
+            continue
+        if normalized_keyword == normalized:
+            similarity = 1.0
+        else:
+            similarity = SequenceMatcher(None, normalized_keyword, normalized).ratio()
+            if normalized.startswith(normalized_keyword):
+                similarity = min(1.0, similarity * 1.2)
+        ranking.append((idx, similarity))
+    ranking.sort(key=lambda x: (-x[1], x[0]))
+    return ranking[:top_k]
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    data = [{'title': title, 'text': text} for title, text in TITLES]
+    cache_file = str(tmp_path_factory.mktemp('index') / 'title_index.idx')
+    title_to_indices, title_list = build_title_index(data, cache_file)
+    return data, title_to_indices, title_list
+
+
+def _ranking(candidates):
+    return [(idx, round(similarity, 9)) for idx, _, _, similarity in candidates]
+
+
+def _rounded(ranking):
+    return [(idx, round(similarity, 9)) for idx, similarity in ranking]
+
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_char_index_top5_matches_brute_force(index, keyword):
+    _, _, title_list = index
+    expected = _rounded(brute_force_ranking(keyword))
+    # 역색인은 문자를 공유하는 제목만 보므로 5개가 안 되면 나머지는 유사도 0 (전체 순회로 채움)
+    pruned = _ranking(_find_candidates_with_char_index(title_list, keyword, None, 5))
+    assert pruned == expected[:len(pruned)]
+    assert all(similarity == 0 for _, similarity in expected[len(pruned):])
+    assert _ranking(find_all_candidates_by_keyword(title_list, keyword)) == expected
+
+
+@pytest.mark.parametrize('keyword', SUFFIX_KEYWORDS)
+def test_suffixed_top5_matches_brute_force(index, keyword):
+    _, _, title_list = index
+    expected = _rounded(brute_force_ranking(keyword, '/등장인물'))
+    assert _ranking(find_all_candidates_by_keyword(title_list, keyword, '/등장인물')) == expected
+
+
+@pytest.mark.parametrize('suffix', ['등장인물', '설정', '줄거리', '없는접미사'])
+def test_titles_by_suffix_matches_brute_force(index, suffix):
+    _, _, title_list = index
+    expected = [idx for idx, (title, _) in enumerate(TITLES) if title.endswith('/' + suffix)]
+    # 접미사 인덱스로 찾은 결과와 인덱스 없는 리스트를 순회한 결과가 모두 같음
+    assert [idx for idx, _, _ in find_titles_by_suffix(title_list, '/' + suffix)] == expected
+    assert [idx for idx, _, _ in find_titles_by_suffix(list(title_list), '/' + suffix)] == expected
+
+
+@pytest.mark.parametrize('keyword', KEYWORDS + SUFFIX_KEYWORDS)
+def test_most_similar_document_matches_plain_list(index, keyword):
+    """인덱스로 찾은 문서가 인덱스 없는 리스트/딕셔너리로 찾은 문서와 같음 (리다이렉트 제목 제외)"""
+    data, title_to_indices, title_list = index
+    plain_list = list(title_list)
+    plain_dict = {}
+    for idx, _, normalized in plain_list:
+        plain_dict.setdefault(normalized, []).append(idx)
+    if normalize_title(keyword) in plain_dict and data[plain_dict[normalize_title(keyword)][0]]['text'].startswith('#redirect'):
+        pytest.skip('리다이렉트 제목은 인덱스에서만 대상 문서로 이동')
+
+    indexed = find_most_similar_document(title_list, title_to_indices, data, keyword, verbose=False)
+    plain = find_most_similar_document(plain_list, plain_dict, data, keyword, verbose=False)
+    assert indexed[0] == plain[0]
+    assert indexed[3] == pytest.approx(plain[3])
+
+
+@pytest.mark.parametrize('keyword, target', [('ONE PIECE', '원피스'), ('naruto', '나루토'), ('귀칼', '귀멸의 칼날'),
+                                             ('spy×family', '스파이 패밀리')])
+def test_redirect_title_resolves_to_target(index, keyword, target):
+    data, title_to_indices, title_list = index
+    idx, doc, _, similarity = find_most_similar_document(title_list, title_to_indices, data, keyword, verbose=False)
+    assert doc['title'] == target
+    assert similarity == 1.0
@@ -0,0 +1,134 @@
+"""map_reduce 관계도: 묶음별 부분 그래프를 합친 결과가 single 방식(프롬프트 하나)의 인물과 관계를 모두 포함하는지 확인"""
+import pytest
+
+from modules import graph_generator, image_proxy
+from scripts.benchmark_graph_extraction import MockLLM, make_documents
+
+
+def _nodes_and_edges(graph):
+    return {node['name'] for node in graph['characters']}, {(edge['from'], edge['to']) for edge in graph['relationships']}
+
+
+@pytest.fixture
+def fixture_documents():
+    # 문서 전체가 두 방식의 문맥 예산 안에 들어가는 크기 (두 방식이 같은 문단을 보도록)
+    return make_documents(character_count=6, sections=3, seed=1)
+
+
+def _extract(monkeypatch, documents, names, mode):
+    monkeypatch.setattr(graph_generator, 'call_ai_api', MockLLM(names, output_tps=1e9, input_seconds_per_1k=0))
+    return graph_generator.extract_character_relationships_with_ai(
+        '작품', documents, character_names=names, mode=mode, use_cache=False,
+    )
+
+
+def test_map_reduce_keeps_single_call_graph(monkeypatch, fixture_documents):
+    documents, names = fixture_documents
+    baseline_nodes, baseline_edges = _nodes_and_edges(_extract(monkeypatch, documents, names, 'single'))
+    nodes, edges = _nodes_and_edges(_extract(monkeypatch, documents, names, 'map_reduce'))
+
+    assert baseline_edges
+    assert baseline_nodes <= nodes
+    assert baseline_edges <= edges
+
+
+def test_merge_keeps_every_node_and_edge():
+    names = ['카마도 탄지로', '카마도 네즈코', '아가츠마 젠이츠', '하시비라 이노스케']
+    baseline = {
+        'characters': [{'name': name, 'image_src': None, 'description': f'{name} 설명'} for name in names],
+        'relationships': [
+            {'from': source, 'to': target, 'relation': f'{source}-{target}'}
+            for source in names for target in names if source != target
+        ],
+    }
+    # 묶음마다 자기 인물의 노드와 그 인물이 끼는 관계만 응답 (다른 묶음 인물은 표기를 조금 바꿔서)
+    partials = []
+    for focus in (names[:2], names[2:]):
+        partials.append({
+            'focus': focus,
+            'graph': {
+                'characters': [node for node in baseline['characters'] if node['name'] in focus],
+                'relationships': [
+                    dict(edge, **{key: edge[key] if edge[key] in focus else edge[key].replace(' ', '')
+                                  for key in ('from', 'to')})
+                    for edge in baseline['relationships'] if edge['from'] in focus or edge['to'] in focus
+                ],
+            },
+        })
+
+    merged = graph_generator.merge_partial_graphs(partials, names)
+
+    assert _nodes_and_edges(merged) == _nodes_and_edges(baseline)
+    # 관계 설명은 from 인물을 다룬 묶음의 것
+    assert {edge['relation'] for edge in merged['relationships']} == {edge['relation'] for edge in baseline['relationships']}
+
+
+def test_generated_graph_keeps_source_image_urls(monkeypatch, tmp_path, fixture_documents):
+    # 프록시를 사용해도 생성 결과(저장되는 관계도)에는 원본 주소를 남김 (/img/ 주소는 응답할 때 app.py에서 만듦)
+    monkeypatch.setattr(image_proxy, '_image_proxy', image_proxy.ImageProxyCache(str(tmp_path / 'images.sqlite')))
+    documents, names = fixture_documents
+    graph = _extract(monkeypatch, documents, names, 'single')
+
+    images = [node['image_src'] for node in graph['characters'] if node.get('image_src')]
+    assert images
+    assert all(url.startswith('https://i.namu.wiki/') for url in images)
+    assert image_proxy.proxy_image_url(images[0]).startswith(image_proxy.PROXY_PATH_PREFIX)
+
+
+def _streaming_llm(chunks, error=None):
+    """chunks를 응답 조각으로 보낸 뒤 error를 던지는(없으면 전체 응답을 반환하는) 가짜 call_ai_api"""
+    def call(messages, model, temperature=0.5, use_cache=True, on_delta=None, **kwargs):
+        for chunk in chunks:
+            on_delta(chunk)
+        if error is not None:
+            raise error
+        return ''.join(chunks)
+    return call
+
+
+CUT_RESPONSE = [
+    '{"characters": [{"name": "카마도 탄지로", "image_src": null, "description": "주인공"}, ',
+    '{"name": "카마도 네즈코", "image_src": null, "descr',
+]
+
+
+def test_request_graph_returns_partial_graph_when_stream_breaks(monkeypatch):
+    monkeypatch.setattr(graph_generator, 'call_ai_api', _streaming_llm(CUT_RESPONSE, ConnectionError('끊김')))
+    items = []
+
+    graph = graph_generator._request_graph([], 'gpt-4o-mini', False, on_item=lambda key, item: items.append(item['name']))
+
+    assert graph == {
+        'characters': [{'name': '카마도 탄지로', 'image_src': None, 'description': '주인공'}],
+        'relationships': [],
+        'partial': True,
+    }
+    assert items == ['카마도 탄지로']
+
+
+def test_request_graph_returns_partial_graph_for_malformed_json(monkeypatch):
+    # 스트림은 끝났지만 마지막 부분이 깨진 응답
+    monkeypatch.setattr(graph_generator, 'call_ai_api', _streaming_llm(CUT_RESPONSE + ['"}]}}']))
+
+    graph = graph_generator._request_graph([], 'gpt-4o-mini', False)
+
+    assert graph['partial'] is True
+    assert [node['name'] for node in graph['characters']] == ['카마도 탄지로']
+
+
+def test_request_graph_reraises_callback_errors(monkeypatch):
+    monkeypatch.setattr(graph_generator, 'call_ai_api', _streaming_llm(CUT_RESPONSE, ConnectionError('끊김')))
+
+    def on_delta(text):
+        raise ConnectionAbortedError('클라이언트 연결이 끊어졌습니다.')
+
+    # 콜백 예외(클라이언트 연결 끊김)는 부분 그래프로 바꾸지 않음
+    with pytest.raises(ConnectionAbortedError):
+        graph_generator._request_graph([], 'gpt-4o-mini', False, on_delta=on_delta)
+
+
+def test_request_graph_raises_without_completed_items(monkeypatch):
+    monkeypatch.setattr(graph_generator, 'call_ai_api', _streaming_llm(['{"characters": [{"na'], ConnectionError('끊김')))
+
+    with pytest.raises(ConnectionError):
+        graph_generator._request_graph([], 'gpt-4o-mini', False)
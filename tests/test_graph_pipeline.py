@@ -0,0 +1,49 @@
+"""run_graph_pipeline: 크롤링에 실패한 인물만 데이터셋에서 찾고, 찾지 못한 인물 수를 요청한 이름 기준으로 세는지 확인"""
+from modules import graph_pipeline
+
+# 크롤링한 페이지의 h1 제목은 요청한 이름과 다를 수 있음 (리다이렉트, 동음이의어 문서)
+CRAWLED = {'탄지로': '카마도 탄지로', '젠이츠': '아가츠마 젠이츠'}
+DATASET = {'탄지로': '카마도 탄지로', '네즈코': '카마도 네즈코'}
+
+
+def _fake_crawl(names, max_workers, deadline, on_result=None):
+    documents, statuses = [], []
+    for name in names:
+        ok = name in CRAWLED
+        statuses.append({'title': name, 'status': 'ok' if ok else 'failed', 'elapsed': 0.0})
+        if ok:
+            documents.append({'title': CRAWLED[name], 'text': f'{name} 본문', 'image_urls': []})
+    return documents, statuses
+
+
+def _fake_exact_title(title_to_indices, data, title):
+    if title not in DATASET:
+        return None, None
+    return 0, {'title': DATASET[title], 'text': f'{title} 데이터셋 본문'}
+
+
+def test_dataset_fallback_uses_crawl_statuses(monkeypatch):
+    names = ['탄지로', '네즈코', '젠이츠', '이노스케']
+    main = {'index': 0, 'doc': {'title': '귀멸의 칼날', 'text': '본문'}, 'matched_title': '귀멸의 칼날', 'similarity': 1.0}
+    no_list = {'index': None, 'doc': None, 'matched_title': None, 'similarity': 0.0}
+    monkeypatch.setattr(graph_pipeline, 'find_source_documents', lambda *args: (main, no_list))
+    monkeypatch.setattr(graph_pipeline, 'extract_character_names_with_ai', lambda *args, **kwargs: list(names))
+    monkeypatch.setattr(graph_pipeline, 'crawl_namuwiki_pages', _fake_crawl)
+    monkeypatch.setattr(graph_pipeline, 'find_document_by_exact_title_indexed', _fake_exact_title)
+    monkeypatch.setattr(graph_pipeline, 'document_image_urls', lambda text, index=None: [])
+    monkeypatch.setattr(
+        graph_pipeline, 'extract_character_relationships_with_ai',
+        lambda *args, **kwargs: {'characters': [], 'relationships': []},
+    )
+    events = {}
+
+    result = graph_pipeline.run_graph_pipeline(
+        None, {}, [], '귀멸의 칼날', on_event=lambda event, payload: events.setdefault(event, payload),
+    )
+
+    # h1 제목이 요청한 이름과 달라도 크롤링에 성공한 '탄지로'는 데이터셋에서 다시 찾지 않음
+    assert events['crawled']['dataset_fallbacks'] == ['카마도 네즈코']
+    assert result['crawl']['crawled_count'] == 2
+    assert result['crawl']['dataset_count'] == 1
+    # 크롤링도 실패하고 데이터셋에도 없는 인물은 '이노스케' 하나
+    assert result['crawl']['failed_count'] == 1
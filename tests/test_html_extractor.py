@@ -0,0 +1,37 @@
+"""단일 패스 HTML 추출('fast')이 BeautifulSoup 트리 추출('bs4')과 같은 결과를 내는지 저장된 페이지로 확인"""
+import os
+
+import pytest
+
+from modules.namuwiki_web import build_namuwiki_url, parse_namuwiki_html
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
+FIXTURES = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith('.html'))
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_fast_engine_matches_bs4(name):
+    content = _load(name)
+    title = name[:-len('.html')]
+    url = build_namuwiki_url(title)
+    assert parse_namuwiki_html(content, title, url, engine='fast') == parse_namuwiki_html(content, title, url, engine='bs4')
+
+
+def test_character_page_fields():
+    doc = parse_namuwiki_html(_load('character_page.html'), '카마도 탄지로', 'https://namu.wiki/w/x', engine='fast')
+    assert doc['title'] == '카마도 탄지로[편집]'
+    assert '여동생' in doc['text'] and '본문 안 스크립트' not in doc['text']
+    assert [image['url'] for image in doc['image_urls']] == [
+        'https://i.namu.wiki/i/tanjiro_main.webp',
+        'https://i.namu.wiki/i/zenitsu.png',
+    ]
+    assert doc['image_src'] == 'https://i.namu.wiki/i/tanjiro_main.webp'
+
+
+def test_page_without_content():
+    assert parse_namuwiki_html(_load('no_content.html'), '없는 문서', 'https://namu.wiki/w/x', engine='fast') is None
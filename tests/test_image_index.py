@@ -0,0 +1,84 @@
+"""scan_images 중복 제거와 순서, 이미지 인덱스 생성/로드/재생성과 본문 스캔 결과 일치 확인"""
+import pytest
+
+from modules import image_index
+from modules.image_extractor import extract_all_image_urls, scan_images
+
+TEXT = (
+    '[[파일:탄지로.png|width=100]] 소개 https://namu.wiki/i/abc 와 https://w.namu.la/s/def.webp '
+    '(https://i.namu.wiki/i/ghi.png) 같은 이미지 https://i.namu.wiki/i/ghi.png '
+    '다시 [[파일:탄지로.png]] 문서 링크 https://namu.wiki/w/카마도 [[파일:네즈코.jpg]]'
+)
+
+
+def test_scan_images_dedups_and_orders_by_host_then_files():
+    images = scan_images(TEXT)
+
+    # 이미지 서버 순(i.namu.wiki -> w.namu.la -> 그 외), 그 다음 파일 링크. 같은 URL/파일은 한 번만
+    assert [image['url'] for image in images] == [
+        'https://i.namu.wiki/i/ghi.png',
+        'https://w.namu.la/s/def.webp',
+        'https://namu.wiki/i/abc',
+        '파일:탄지로.png',
+        '파일:네즈코.jpg',
+    ]
+    # offset은 처음 나온 위치
+    for image in images[:3]:
+        assert image['offset'] == TEXT.index(image['url'])
+    assert images[3]['offset'] == TEXT.index('[[파일:탄지로.png')
+    assert [image['alt'] for image in images] == ['', '', '', '탄지로.png', '네즈코.jpg']
+
+
+def test_scan_images_without_images():
+    assert scan_images('이미지 없는 문서 https://namu.wiki/w/문서') == []
+
+
+@pytest.fixture
+def dataset():
+    return [
+        {'title': '탄지로', 'text': TEXT},
+        {'title': '빈 문서', 'text': '본문만 있음'},
+        {'title': '네즈코', 'text': '[[파일:네즈코.jpg]] https://i.namu.wiki/i/nezuko.webp'},
+        {'title': '없는 본문', 'text': None},
+    ]
+
+
+def test_build_and_load_image_index(dataset, tmp_path, monkeypatch):
+    path = str(tmp_path / 'images.db')
+    built = image_index.build_image_index(dataset, path, 'v1', batch_size=2)
+
+    assert built.meta['dataset_version'] == 'v1'
+    assert built.meta['documents'] == '2'
+    for doc_index, item in enumerate(dataset):
+        assert built.get(doc_index) == scan_images(item['text'] or '')
+
+    # 버전이 같으면 다시 만들지 않고 그대로 엶
+    monkeypatch.setattr(image_index, 'build_image_index', lambda *args, **kwargs: pytest.fail('rebuilt'))
+    loaded = image_index.load_image_index(dataset, path, 'v1')
+    assert loaded.get(2) == built.get(2)
+
+
+def test_load_image_index_rebuilds_on_version_mismatch(dataset, tmp_path):
+    path = str(tmp_path / 'images.db')
+    image_index.build_image_index(dataset, path, 'v1')
+    changed = dataset[:1] + [{'title': '빈 문서', 'text': 'https://i.namu.wiki/i/new.png'}]
+
+    assert image_index.load_image_index(changed, path, 'v2', rebuild=False) is None
+    loaded = image_index.load_image_index(changed, path, 'v2')
+
+    assert loaded.meta['dataset_version'] == 'v2'
+    assert [image['url'] for image in loaded.get(1)] == ['https://i.namu.wiki/i/new.png']
+    assert loaded.get(2) == []
+
+
+def test_document_image_urls_from_index_matches_text_scan(dataset, tmp_path, monkeypatch):
+    index = image_index.build_image_index(dataset, str(tmp_path / 'images.db'), 'v1')
+    monkeypatch.setattr(image_index, '_image_index', index)
+
+    for doc_index, item in enumerate(dataset):
+        text = item['text'] or ''
+        assert image_index.document_image_urls(text, doc_index) == extract_all_image_urls(text)
+    assert index.stats()['lookups'] == len(dataset)
+    # 데이터셋 문서가 아니면(doc_index 없음) 본문을 훑음
+    assert image_index.document_image_urls(TEXT) == extract_all_image_urls(TEXT)
+    assert index.stats()['lookups'] == len(dataset)
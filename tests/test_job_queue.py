@@ -0,0 +1,113 @@
+"""JobQueue: 같은 키의 동시 제출을 한 작업으로 합치고 한 번만 실행하는지, 실행 중 임대 시간을 갱신하는지,
+임대가 끝난 워커의 기록을 무시하는지 확인"""
+import threading
+import time
+
+import pytest
+
+from modules.job_queue import JobQueue, MemoryJobBackend, SQLiteJobBackend
+
+
+def _wait_done(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'작업이 끝나지 않음: {job}')
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend_factory(request, tmp_path):
+    if request.param == 'memory':
+        backend = MemoryJobBackend()
+        return lambda: backend
+    # 파일을 공유하는 SQLite 저장소는 워커 프로세스마다 따로 만드는 것처럼
+    return lambda: SQLiteJobBackend(str(tmp_path / 'jobs.sqlite'))
+
+
+def test_concurrent_submissions_coalesce_and_run_once(backend_factory):
+    release = threading.Event()
+    runs = []
+    runs_lock = threading.Lock()
+
+    def runner(params, on_event):
+        with runs_lock:
+            runs.append(params['keyword'])
+        release.wait(10)
+        return {'keyword': params['keyword']}
+
+    queues = [JobQueue(backend_factory(), runner, max_workers=2, poll_interval=0.05) for _ in range(2)]
+    results = []
+    results_lock = threading.Lock()
+
+    def submit(number):
+        job, coalesced = queues[number % 2].submit('gpt-4o-mini::귀멸의 칼날', {'keyword': '귀멸의 칼날'})
+        with results_lock:
+            results.append((job['id'], coalesced))
+
+    threads = [threading.Thread(target=submit, args=(number,)) for number in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    job_ids = {job_id for job_id, _ in results}
+    assert len(job_ids) == 1
+    assert sum(not coalesced for _, coalesced in results) == 1
+
+    time.sleep(0.3)  # 다른 워커들이 같은 작업을 가져갈 기회
+    release.set()
+    job = _wait_done(queues[0], job_ids.pop())
+    assert job['status'] == 'done'
+    assert job['result'] == {'keyword': '귀멸의 칼날'}
+    assert job['submissions'] == 16
+    assert job['attempts'] == 1
+    assert runs == ['귀멸의 칼날']
+
+
+def test_unrecorded_events_renew_lease(backend_factory):
+    runs = []
+
+    def runner(params, on_event):
+        runs.append(params)
+        # lease보다 오래 AI 응답 조각(graph_delta)만 보냄
+        end = time.time() + 1.5
+        while time.time() < end:
+            on_event('graph_delta', {'text': '...'})
+            time.sleep(0.02)
+        return {'ok': True}
+
+    first = JobQueue(backend_factory(), runner, max_workers=1, lease=0.5, poll_interval=0.05)
+    job, _ = first.submit('gpt-5::진격의 거인', {'keyword': '진격의 거인'})
+    # 임대가 끝난 작업을 가져갈 수 있는 다른 워커 (다른 프로세스 역할)
+    JobQueue(backend_factory(), runner, max_workers=1, lease=0.5, poll_interval=0.05).start()
+
+    job = _wait_done(first, job['id'])
+    assert job['status'] == 'done'
+    assert job['attempts'] == 1
+    assert job['events'] == []
+    assert len(runs) == 1
+
+
+def test_stale_worker_cannot_finish_or_renew(backend_factory):
+    backend = backend_factory()
+    job, _ = backend.submit('gpt-4o-mini::주술회전', {'keyword': '주술회전'}, 0.0)
+    assert backend.claim('stale', lease=1, max_attempts=2, now=1.0)['id'] == job['id']
+    # 임대가 끝나 다른 워커가 다시 가져감
+    assert backend.claim('current', lease=10, max_attempts=2, now=5.0)['id'] == job['id']
+
+    backend.renew_lease(job['id'], 'stale', 100.0)
+    backend.add_event(job['id'], 'stale', 'characters', {'characters': ['이타도리']}, 100.0)
+    assert backend.finish(job['id'], 'stale', 'done', {'from': 'stale'}, None, None, 6.0) is False
+
+    job = backend.get(job['id'])
+    assert (job['status'], job['worker'], job['lease_until'], job['result']) == ('running', 'current', 15.0, None)
+    assert backend.events(job['id']) == []
+
+    assert backend.finish(job['id'], 'current', 'done', {'from': 'current'}, None, None, 7.0) is True
+    assert backend.get(job['id'])['result'] == {'from': 'current'}
+    # 이미 끝난 작업은 같은 워커라도 다시 기록하지 않음
+    assert backend.finish(job['id'], 'current', 'failed', None, '중복', 500, 8.0) is False
+    assert backend.get(job['id'])['status'] == 'done'
@@ -0,0 +1,65 @@
+"""StreamingJSONItemParser: 임의 위치에서 나뉜 응답 조각으로도 완성된 항목을 꺼내는지 확인"""
+import json
+import random
+
+import pytest
+
+from modules.json_stream import StreamingJSONItemParser
+
+GRAPH = {
+    'characters': [
+        {'name': '카마도 탄지로', 'image_src': None, 'description': '괄호 {와 [가 들어간 "설명" \\ 끝}'},
+        {'name': '카마도 네즈코', 'image_src': 'https://i.namu.wiki/i/a.webp', 'description': '중첩 {"키": [1, 2]}'},
+    ],
+    'relationships': [
+        {'from': '카마도 탄지로', 'to': '카마도 네즈코', 'relation': '여동생을 지키는 "오빠" 관계', 'tags': ['가족', {'a': 1}]},
+    ],
+}
+RESPONSE = '```json\n' + json.dumps(GRAPH, ensure_ascii=False, indent=2) + '\n```'
+
+
+def _feed(text, cuts):
+    parser = StreamingJSONItemParser(('characters', 'relationships'))
+    completed = []
+    start = 0
+    for cut in list(cuts) + [len(text)]:
+        completed += parser.feed(text[start:cut])
+        start = cut
+    return parser, completed
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_items_complete_across_arbitrary_chunks(seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(RESPONSE)), rng.randint(1, 40)))
+
+    parser, completed = _feed(RESPONSE, cuts)
+
+    assert parser.items == GRAPH
+    assert completed == [('characters', item) for item in GRAPH['characters']] + [
+        ('relationships', item) for item in GRAPH['relationships']
+    ]
+    assert parser.invalid_items == 0
+
+
+def test_one_character_at_a_time():
+    parser, _ = _feed(RESPONSE, range(1, len(RESPONSE)))
+    assert parser.items == GRAPH
+
+
+def test_stream_cut_mid_object_keeps_completed_items():
+    # 두 번째 인물의 설명 문자열 안 (괄호가 열린 상태)에서 끊김
+    cut = RESPONSE.index('중첩 {\\"키') + len('중첩 {\\"키')
+
+    parser, _ = _feed(RESPONSE[:cut], [cut // 2])
+
+    assert parser.items == {'characters': [GRAPH['characters'][0]], 'relationships': []}
+
+
+def test_broken_item_is_skipped():
+    text = '{"characters": [{"name": "가"}, {"name": "나" "x"}, {"name": "다"}], "relationships": []}'
+
+    parser, _ = _feed(text, [])
+
+    assert parser.items['characters'] == [{'name': '가'}, {'name': '다'}]
+    assert parser.invalid_items == 1
@@ -0,0 +1,74 @@
+"""SQLiteStore: 트리거로 기록하는 전체 크기와 LRU 삭제, 프로세스별 연결 확인"""
+import threading
+
+from modules import sqlite_store
+from modules.page_cache import PageCache
+from modules.sqlite_store import SQLiteStore
+
+
+def _make_table(store):
+    store.connection().execute(
+        'CREATE TABLE items (key TEXT PRIMARY KEY, accessed_at REAL NOT NULL, size INTEGER NOT NULL)'
+    )
+    store.track_size('items')
+
+
+def _sum(store):
+    return store.connection().execute('SELECT COALESCE(SUM(size), 0) FROM items').fetchone()[0]
+
+
+def test_total_bytes_follows_insert_replace_update_delete(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'sub' / 'store.sqlite'))
+    _make_table(store)
+    conn = store.connection()
+    conn.execute("INSERT INTO items VALUES ('a', 1, 100)")
+    conn.execute("INSERT INTO items VALUES ('b', 2, 50)")
+    conn.execute("INSERT OR REPLACE INTO items VALUES ('a', 3, 30)")
+    conn.execute("UPDATE items SET size = 70 WHERE key = 'b'")
+    assert store.total_bytes('items') == _sum(store) == 100
+    conn.execute("DELETE FROM items WHERE key = 'a'")
+    assert store.total_bytes('items') == _sum(store) == 70
+
+
+def test_existing_rows_counted_once(tmp_path):
+    path = str(tmp_path / 'store.sqlite')
+    store = SQLiteStore(path)
+    store.connection().execute('CREATE TABLE items (key TEXT PRIMARY KEY, accessed_at REAL NOT NULL, size INTEGER NOT NULL)')
+    store.connection().execute("INSERT INTO items VALUES ('a', 1, 40)")
+    store.track_size('items')
+    store.track_size('items')
+    assert SQLiteStore(path).total_bytes('items') == 40
+
+
+def test_evict_lru_deletes_oldest_until_under_limit(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'store.sqlite'))
+    _make_table(store)
+    conn = store.connection()
+    for i in range(10):
+        conn.execute('INSERT INTO items VALUES (?, ?, ?)', (f'k{i}', 10 - i, 10))
+
+    assert store.evict_lru('items', 1000) == 0
+    assert store.evict_lru('items', 65, threading.Lock(), batch=2) == 4
+    keys = {row[0] for row in conn.execute('SELECT key FROM items')}
+    # accessed_at이 작은(오래된) k9, k8, k7, k6이 삭제됨
+    assert keys == {f'k{i}' for i in range(6)}
+    assert store.total_bytes('items') == _sum(store) == 60
+
+
+def test_connection_reopened_after_fork(tmp_path, monkeypatch):
+    store = SQLiteStore(str(tmp_path / 'store.sqlite'))
+    first = store.connection()
+    assert store.connection() is first
+    monkeypatch.setattr(sqlite_store.os, 'getpid', lambda: -1)
+    assert store.connection() is not first
+
+
+def test_page_cache_evicts_with_running_total(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.sqlite'), max_bytes=600)
+    for i in range(20):
+        cache.put(f'문서{i}', {'title': f'문서{i}', 'text': f'본문 {i} ' * 40})
+    stats = cache.stats()
+    assert 0 < stats['bytes'] <= 600
+    assert stats['evictions'] == 20 - stats['entries']
+    assert cache.get('문서19') is not None
+    assert cache.get('문서0') is None
@@ -0,0 +1,50 @@
+"""token_budget: 나무위키 문법 압축과 입력 예산에 맞춘 문서 자르기 확인"""
+from modules import ai_service
+from modules.character_extractor import _build_messages
+from modules.token_budget import (
+    compact_wiki_markup,
+    count_message_tokens,
+    document_token_budget,
+    truncate_to_tokens,
+)
+
+
+def test_ruby_macro_keeps_base_text():
+    text = "[ruby(竈門炭治郎, ruby=かまど たんじろう)]는 [ruby(주인공,ruby=しゅじんこう)]이다. [age(2000-01-01)]세"
+    assert compact_wiki_markup(text) == "竈門炭治郎는 주인공이다. 세"
+
+
+def test_compaction_removes_markup():
+    text = "'''굵게'''[* 각주 [[링크]]] [[파일:a.png]]본문[br]다음 줄\n[목차]\n||<bgcolor=#fff> 이름 || 설명 ||"
+    assert compact_wiki_markup(text) == "굵게 본문\n다음 줄\n이름 | 설명"
+
+
+def test_document_fitted_before_instructions():
+    model = 'gpt-4o-mini'
+    budget = 400
+    document = '탄지로는 네즈코의 오빠이다.\n' * 200
+    instructions = _build_messages('귀멸의 칼날', '', '', 20)
+
+    available = document_token_budget(instructions, model, budget)
+    assert 0 < available < budget
+    fitted = truncate_to_tokens(document, available // 2, model)
+    messages = _build_messages('귀멸의 칼날', fitted, fitted, 20)
+
+    # 문서만 잘리고 지시문(JSON 형식 안내)은 그대로 들어감
+    assert count_message_tokens(messages, model) <= budget
+    assert messages[1]['content'].endswith('설명이나 다른 텍스트는 포함하지 마세요.')
+    assert document_token_budget(instructions, model, None) is None
+
+
+def test_cache_key_uses_messages_as_sent(monkeypatch):
+    deleted = []
+
+    class Cache:
+        def delete(self, key):
+            deleted.append(key)
+
+    monkeypatch.setattr(ai_service, '_llm_cache', Cache())
+    messages = [{'role': 'user', 'content': "'''굵게''' [ruby(본문, ruby=읽는 법)]"}]
+    ai_service.invalidate_ai_response(messages, model='gpt-4o-mini')
+    # 다시 압축하지 않고 받은 메시지 그대로 키를 만듦
+    assert deleted == [ai_service.make_cache_key('gpt-4o-mini', messages, None)]